@@ -12,5 +12,27 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cedepe.settings')
+# Sob ASGI o Django recomenda desligar as conexões persistentes
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.urls import reverse  # noqa: E402
+
+# Este processo (Procfile: tempo_real) só serve o stream do mapa. O resto do site
+# roda no processo WSGI (web): sob ASGI o Django junta em memória o conteúdo de
+# StreamingHttpResponse/FileResponse com iteradores síncronos (exportações CSV,
+# relatórios em PDF) antes de enviar.
+ROTAS_ASGI = {reverse('eventos_mapa')}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] not in ROTAS_ASGI:
+        await send({
+            'type': 'http.response.start',
+            'status': 404,
+            'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+        })
+        await send({'type': 'http.response.body', 'body': 'Este processo serve apenas o mapa em tempo real.'.encode()})
+        return
+    await django_application(scope, receive, send)
@@ -0,0 +1,99 @@
+# condicional.py
+"""
+GET condicional (ETag / Last-Modified / 304) para as APIs de leitura.
+
+A versão de uma resposta é calculada com uma agregação barata sobre o
+queryset já filtrado: quantidade de linhas (para perceber exclusões) e o
+maior atualizado_em de cada tabela que aparece no payload. Se o cliente
+manda If-None-Match / If-Modified-Since iguais, a resposta é 304 sem
+executar a listagem nem serializar nada.
+
+Atualizações em massa (QuerySet.update) precisam gravar atualizado_em, como
+já fazem as de reservas/alocacao.py; senão a versão não muda.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def versao_consultas(*consultas, extra=None):
+    """
+    (última modificação, etag) de uma ou mais consultas. Cada item de
+    `consultas` é (queryset, campos), onde campos são nomes de campos de data
+    (lookups com '__' valem) ou expressões de agregação. Uma consulta por item.
+    `extra` entra no etag (por exemplo, a URL e o formato da resposta).
+    """
+    resumos = []
+    datas = []
+    for queryset, campos in consultas:
+        agregados = {'total': Count('pk')}
+        agregados.update({
+            f'max_{i}': Max(campo) if isinstance(campo, str) else campo for i, campo in enumerate(campos)
+        })
+        resumo = queryset.order_by().aggregate(**agregados)
+        resumos.append(sorted(resumo.items()))
+        datas += [valor for chave, valor in resumo.items() if chave != 'total' and valor]
+    assinatura = repr((resumos, extra)).encode()
+    return max(datas) if datas else None, hashlib.md5(assinatura, usedforsecurity=False).hexdigest()
+
+
+class NaoModificado(Exception):
+    """ Interrompe a view do DRF com a resposta 304 pronta. """
+
+    def __init__(self, resposta):
+        self.resposta = resposta
+
+
+class RespostaCondicionalMixin:
+    """
+    Mixin para ViewSets e APIViews do DRF. Em GET/HEAD calcula a versão
+    depois da autenticação e das permissões, responde 304 quando o cliente já
+    tem essa versão e, nos 200, envia ETag e Last-Modified.
+
+    `campos_versao`: campos de data das tabelas presentes no payload, a partir
+    do modelo do queryset (ex.: ['atualizado_em', 'evento__atualizado_em']).
+    Views sem queryset (APIView) sobrescrevem `get_queryset_versao`.
+    """
+    campos_versao = ['atualizado_em']
+
+    def get_queryset_versao(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def versao_resposta(self, request):
+        # O mesmo queryset gera payloads diferentes por página, filtro e formato (JSON ou navegável)
+        extra = (request.get_full_path(), getattr(request, 'accepted_media_type', None))
+        return versao_consultas((self.get_queryset_versao(), self.campos_versao), extra=extra)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._versao_resposta = None
+        if request.method in ('GET', 'HEAD'):
+            self._versao_resposta = ultima, etag = self.versao_resposta(request)
+            resposta = get_conditional_response(
+                request,
+                etag=quote_etag(etag),
+                last_modified=int(ultima.timestamp()) if ultima else None,
+            )
+            if resposta is not None:
+                raise NaoModificado(resposta)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NaoModificado):
+            return exc.resposta
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        versao = getattr(self, '_versao_resposta', None)
+        if versao and response.status_code in (200, 304):
+            ultima, etag = versao
+            response.headers.setdefault('ETag', quote_etag(etag))
+            if ultima:
+                response.headers.setdefault('Last-Modified', http_date(ultima.timestamp()))
+        return response
@@ -0,0 +1,88 @@
+# exportacao.py
+"""
+Exportação de listagens em CSV, em streaming.
+
+As views montam um queryset com `.values_list()` (joins resolvidos no SQL) e
+percorrem com `.iterator()`; as linhas são convertidas em CSV e enviadas em
+blocos por um StreamingHttpResponse. Nada é acumulado em memória, então o
+consumo é o mesmo para cem ou um milhão de linhas. Com ?gzip=1 os blocos são
+comprimidos à medida que saem.
+
+O CSV usa ';' e UTF-8 com BOM, o formato que o Excel em português abre
+direto. Textos que começam como fórmula (=, +, -, @) saem com um apóstrofo
+na frente, para a planilha não executá-los.
+"""
+import csv
+import zlib
+from datetime import date, datetime
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+# Linhas lidas do banco por vez e linhas por bloco enviado ao cliente
+TAMANHO_LOTE_EXPORTACAO = 2000
+LINHAS_POR_BLOCO = 500
+
+# Início de célula que o Excel/LibreOffice interpretam como fórmula
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Eco:
+    """ "Arquivo" do csv.writer que devolve a linha em vez de gravá-la. """
+
+    def write(self, valor):
+        return valor
+
+
+def _celula(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime('%d/%m/%Y %H:%M')
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def linhas_csv(cabecalho, linhas):
+    """ Gera o CSV em blocos de bytes de LINHAS_POR_BLOCO linhas. """
+    escritor = csv.writer(_Eco(), delimiter=';')
+    yield ('\ufeff' + escritor.writerow(cabecalho)).encode('utf-8')
+    bloco = []
+    for linha in linhas:
+        bloco.append(escritor.writerow([_celula(valor) for valor in linha]))
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            yield ''.join(bloco).encode('utf-8')
+            bloco = []
+    if bloco:
+        yield ''.join(bloco).encode('utf-8')
+
+
+def comprimir_gzip(blocos):
+    """ Comprime um gerador de bytes em formato gzip, bloco a bloco. """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for bloco in blocos:
+        dados = compressor.compress(bloco)
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+
+def resposta_csv(request, nome_arquivo, cabecalho, linhas):
+    """
+    StreamingHttpResponse com o CSV de `linhas` (iterável de tuplas).
+    ?gzip=1 entrega o arquivo comprimido (.csv.gz).
+    """
+    conteudo = linhas_csv(cabecalho, linhas)
+    nome = f"{nome_arquivo}_{timezone.localdate():%Y%m%d}.csv"
+    if request.GET.get('gzip') in ('1', 'true', 'sim'):
+        response = StreamingHttpResponse(comprimir_gzip(conteudo), content_type='application/gzip')
+        nome += '.gz'
+    else:
+        response = StreamingHttpResponse(conteudo, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nome}"'
+    return response
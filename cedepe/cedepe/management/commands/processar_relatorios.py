@@ -0,0 +1,47 @@
+# processar_relatorios.py
+"""
+Worker da fila de relatórios em PDF (processo `worker` do Procfile).
+
+    python manage.py processar_relatorios             # roda continuamente
+    python manage.py processar_relatorios --uma-vez   # esvazia a fila e sai
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from cedepe.relatorios import executar, reabrir_abandonados, reservar_proximo
+
+
+class Command(BaseCommand):
+    help = "Gera os relatórios em PDF pedidos pelas páginas de relatório."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help="Processa os pedidos pendentes e termina.",
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help="Segundos de espera quando a fila está vazia (padrão: 2).",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            reabrir_abandonados()
+            job = reservar_proximo()
+            if job is None:
+                if options['uma_vez']:
+                    return
+                time.sleep(options['intervalo'])
+                continue
+
+            inicio = time.monotonic()
+            executar(job)
+            duracao = time.monotonic() - inicio
+            estilo = self.style.SUCCESS if job.status == 'CONCLUIDO' else self.style.ERROR
+            self.stdout.write(estilo(f"Relatório #{job.pk} ({job}) em {duracao:.1f} s"))
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cedepe', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='relatoriojob',
+            name='arquivo',
+        ),
+        migrations.AddField(
+            model_name='relatoriojob',
+            name='conteudo',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
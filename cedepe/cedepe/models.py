@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db import models
+
+
+class RelatorioJob(models.Model):
+    """ Pedido de geração de relatório em PDF, processado pelo comando processar_relatorios. """
+    TIPOS = (
+        ('RESERVAS', 'Reservas'),
+        ('OCUPACOES', 'Ocupações'),
+        ('EVENTOS', 'Eventos'),
+    )
+    STATUS = (
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDO', 'Concluído'),
+        ('ERRO', 'Erro'),
+    )
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    data_inicio = models.DateField()
+    data_fim = models.DateField()
+    # Resumo dos dados do período no momento do pedido (ver cedepe/relatorios.py)
+    versao_dados = models.CharField(max_length=32)
+    status = models.CharField(max_length=11, choices=STATUS, default='PENDENTE')
+    # PDF gerado. Fica no banco porque o worker e o site rodam em processos
+    # (contêineres) diferentes, sem disco compartilhado.
+    conteudo = models.BinaryField(null=True, blank=True, editable=False)
+    erro = models.TextField(blank=True)
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Busca de um relatório já gerado para o mesmo tipo, período e versão
+            models.Index(
+                fields=['tipo', 'data_inicio', 'data_fim', 'versao_dados'],
+                name='relatorio_cache_idx',
+            ),
+            # Fila do worker
+            models.Index(fields=['status', 'criado_em'], name='relatorio_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.data_inicio:%d/%m/%Y} a {self.data_fim:%d/%m/%Y} ({self.get_status_display()})"
@@ -0,0 +1,301 @@
+# paginacao.py
+"""
+Paginação por chave (keyset) e contagens baratas, compartilhadas pelas APIs
+(DRF) e pelas páginas gerenciar_* de reservas e eventos.
+
+Em vez de OFFSET, cada página pede "os próximos N registros depois do último
+visto", usando uma ordenação estável que termina na chave primária, por
+exemplo ('-criado_em', 'id'). O custo da página 1000 é o mesmo da página 1.
+O cursor é opaco para o cliente (base64 de JSON).
+
+Só dá para paginar por colunas do próprio modelo que não aceitam NULL: a
+comparação "depois de" não ordena NULL nem segue relações. Uma chave
+estrangeira é ordenada pela coluna (cama -> cama_id); outras ordenações
+levantam OrdenacaoInvalida (400 nas APIs).
+"""
+import base64
+import hashlib
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework import exceptions
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Acima deste número de linhas, a contagem de uma tabela sem filtro é estimada
+LIMIAR_CONTAGEM_ESTIMADA = 10000
+TEMPO_CACHE_CONTAGEM = 60
+
+
+def contagem_rapida(queryset):
+    """
+    Contagem barata de um queryset:
+
+    - tabela inteira no PostgreSQL: usa a estimativa do catálogo (pg_class.reltuples)
+      quando a tabela é grande, evitando o COUNT(*) sequencial;
+    - demais casos: COUNT(*) exato guardado em cache por alguns segundos.
+    """
+    query = queryset.query
+    conexao = connections[queryset.db]
+    if conexao.vendor == 'postgresql' and not query.where and not query.distinct:
+        with conexao.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            linha = cursor.fetchone()
+        if linha and linha[0] >= LIMIAR_CONTAGEM_ESTIMADA:
+            return linha[0]
+
+    sql, params = query.sql_with_params()
+    chave = 'contagem:%s' % hashlib.md5(repr((sql, params)).encode(), usedforsecurity=False).hexdigest()
+    total = cache.get(chave)
+    if total is None:
+        total = queryset.count()
+        cache.set(chave, total, TEMPO_CACHE_CONTAGEM)
+    return total
+
+
+class PaginadorContagemRapida(Paginator):
+    """ Paginator tradicional (números de página) que usa contagem_rapida no lugar do COUNT(*). """
+
+    @cached_property
+    def count(self):
+        return contagem_rapida(self.object_list)
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class OrdenacaoInvalida(ValueError):
+    """ Ordenação que a paginação por chave não consegue seguir. """
+
+
+class PaginaKeyset:
+    """ Uma página de resultados; expõe os cursores das páginas vizinhas. """
+
+    def __init__(self, object_list, cursor_proximo, cursor_anterior, paginador):
+        self.object_list = object_list
+        self.cursor_proximo = cursor_proximo
+        self.cursor_anterior = cursor_anterior
+        self.paginador = paginador
+
+    @property
+    def has_next(self):
+        return self.cursor_proximo is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Pagina `queryset` pela ordenação `ordenacao` (ex.: ['-criado_em', 'id']).
+    Se a ordenação não terminar na chave primária, ela é acrescentada para
+    que a posição seja única.
+    """
+
+    def __init__(self, queryset, por_pagina, ordenacao=None):
+        ordenacao = [
+            self._normalizar(queryset.model, expressao)
+            for expressao in ordenacao or queryset.query.order_by or ['-pk']
+        ]
+        if ordenacao[-1].lstrip('-') not in ('pk', 'id'):
+            ordenacao.append('-pk' if ordenacao[-1].startswith('-') else 'pk')
+        self.ordenacao = ordenacao
+        self.queryset = queryset.order_by(*ordenacao)
+        self.por_pagina = por_pagina
+
+    @cached_property
+    def count(self):
+        return contagem_rapida(self.queryset)
+
+    @staticmethod
+    def _normalizar(modelo, expressao):
+        """ Troca a chave estrangeira pela coluna ('-cama' -> '-cama_id'); levanta OrdenacaoInvalida. """
+        sinal, nome = ('-', expressao[1:]) if expressao.startswith('-') else ('', expressao)
+        if nome == 'pk':
+            return expressao
+        try:
+            campo = modelo._meta.get_field(nome)
+        except FieldDoesNotExist:
+            campo = None
+        if campo is None or not campo.concrete:
+            raise OrdenacaoInvalida(f"Não é possível paginar ordenando por '{nome}'.")
+        if campo.null:
+            raise OrdenacaoInvalida(f"Não é possível paginar ordenando por '{nome}': o campo aceita valores nulos.")
+        return sinal + campo.attname
+
+    def _campos(self):
+        return [campo.lstrip('-') for campo in self.ordenacao]
+
+    def _valores(self, obj):
+        return [_serializar(getattr(obj, campo)) for campo in self._campos()]
+
+    def _converter(self, campo, valor):
+        try:
+            field = self.queryset.model._meta.pk if campo == 'pk' else self.queryset.model._meta.get_field(campo)
+        except FieldDoesNotExist:
+            return valor
+        return field.to_python(valor)
+
+    def codificar(self, direcao, obj):
+        dados = json.dumps([direcao, self._valores(obj)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+    def decodificar(self, cursor):
+        """ Retorna (direcao, valores) ou None se o cursor for inválido. """
+        try:
+            dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direcao, valores = json.loads(dados)
+            if direcao not in ('>', '<') or len(valores) != len(self.ordenacao):
+                return None
+            return direcao, [self._converter(c, v) for c, v in zip(self._campos(), valores)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _depois_de(self, valores, para_tras=False):
+        """
+        Condição "(c1, c2, ...) vem depois de (v1, v2, ...)" na ordenação,
+        expandida em ORs para funcionar com direções mistas.
+        """
+        condicao = Q()
+        iguais = {}
+        for expressao, valor in zip(self.ordenacao, valores):
+            campo = expressao.lstrip('-')
+            decrescente = expressao.startswith('-') != para_tras
+            condicao |= Q(**iguais, **{f"{campo}__{'lt' if decrescente else 'gt'}": valor})
+            iguais[campo] = valor
+        return condicao
+
+    def page(self, cursor=None):
+        posicao = self.decodificar(cursor) if cursor else None
+        para_tras = bool(posicao) and posicao[0] == '<'
+
+        queryset = self.queryset
+        if posicao:
+            queryset = queryset.filter(self._depois_de(posicao[1], para_tras=para_tras))
+        if para_tras:
+            queryset = queryset.reverse()
+
+        itens = list(queryset[:self.por_pagina + 1])
+        ha_mais = len(itens) > self.por_pagina
+        itens = itens[:self.por_pagina]
+        if para_tras:
+            itens.reverse()
+
+        if not itens:
+            return PaginaKeyset([], None, None, self)
+
+        if para_tras:
+            proximo = self.codificar('>', itens[-1])
+            anterior = self.codificar('<', itens[0]) if ha_mais else None
+        else:
+            proximo = self.codificar('>', itens[-1]) if ha_mais else None
+            anterior = self.codificar('<', itens[0]) if posicao else None
+        return PaginaKeyset(itens, proximo, anterior, self)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação padrão das APIs (REST_FRAMEWORK['DEFAULT_PAGINATION_CLASS']).
+
+    A ordenação vem do ?ordering= (OrderingFilter), de `keyset_ordering` na
+    view ou, por padrão, de ('-criado_em', 'id') quando o modelo tem criado_em.
+    Um ?ordering= que o OrderingFilter descartou ou que a paginação não
+    consegue seguir (OrdenacaoInvalida) responde 400, em vez de paginar por
+    outra ordenação.
+    Resposta: {"count": <estimado/em cache>, "next", "previous", "results"}.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 200
+
+    def get_ordering(self, queryset, view):
+        ordenacao_atual = queryset.query.order_by
+        if ordenacao_atual and all(isinstance(campo, str) for campo in ordenacao_atual):
+            return list(ordenacao_atual)
+        ordenacao = getattr(view, 'keyset_ordering', None)
+        if ordenacao:
+            return list(ordenacao)
+        try:
+            queryset.model._meta.get_field('criado_em')
+            return ['-criado_em', 'id']
+        except FieldDoesNotExist:
+            return ['-pk']
+
+    def get_page_size(self, request):
+        try:
+            tamanho = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(tamanho, self.max_page_size))
+
+    def ordenacao_descartada(self, queryset, request, view):
+        """ Termos do ?ordering= que o OrderingFilter da view não aplicou ao queryset. """
+        filtro = next((f for f in getattr(view, 'filter_backends', ()) if issubclass(f, OrderingFilter)), None)
+        if filtro is None:
+            return []
+        termos = [termo.strip() for termo in request.query_params.get(filtro.ordering_param, '').split(',')]
+        aplicados = set(queryset.query.order_by)
+        return [termo for termo in termos if termo and termo not in aplicados]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        descartada = self.ordenacao_descartada(queryset, request, view)
+        try:
+            if descartada:
+                raise OrdenacaoInvalida(f"Ordenação não permitida: {', '.join(descartada)}.")
+            self.paginador = KeysetPaginator(queryset, self.get_page_size(request), self.get_ordering(queryset, view))
+        except OrdenacaoInvalida as e:
+            raise exceptions.ValidationError({OrderingFilter.ordering_param: [str(e)]})
+        self.pagina = self.paginador.page(request.query_params.get(self.cursor_query_param))
+        return list(self.pagina)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.paginador.count,
+            'next': self._link(self.pagina.cursor_proximo),
+            'previous': self._link(self.pagina.cursor_anterior),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
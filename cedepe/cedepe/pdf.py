@@ -0,0 +1,155 @@
+# pdf.py
+"""
+Geração de PDFs longos em memória constante.
+
+O canvas do ReportLab guarda todas as páginas no PDFDocument até o save(),
+o que faz um relatório anual ocupar dezenas de MB. CanvasStreaming é o
+mesmo canvas, com um documento (DocumentoStreaming) que grava cada página e
+o seu conteúdo no arquivo assim que o showPage() termina. O desenho e a
+formatação dos objetos continuam sendo os do ReportLab; em memória ficam a
+página atual, as fontes e dois vetores de inteiros (offsets para a tabela
+xref e números das páginas para a árvore de páginas).
+
+Como a página já foi gravada, ela não pode ser alterada depois do
+showPage(): links para páginas seguintes, "página X de Y" e imagens
+reaproveitadas entre páginas não funcionam. Criptografia também não.
+
+O arquivo temporário fica em memória enquanto for pequeno e vai para o
+disco acima de TAMANHO_MAXIMO_EM_MEMORIA.
+"""
+import tempfile
+from array import array
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfgen import canvas
+
+# Acima deste tamanho o arquivo temporário vai para o disco
+TAMANHO_MAXIMO_EM_MEMORIA = 1024 * 1024
+
+# Linhas da tabela xref e referências da árvore de páginas escritas por vez
+LOTE_ESCRITA = 1000
+
+
+def arquivo_temporario():
+    return tempfile.SpooledTemporaryFile(max_size=TAMANHO_MAXIMO_EM_MEMORIA, suffix='.pdf')
+
+
+class ArquivoPDF(pdfdoc.PDFFile):
+    """ PDFFile que escreve direto no arquivo em vez de acumular o documento. """
+
+    def __init__(self, arquivo, pdf_version):
+        self.arquivo = arquivo
+        super().__init__(pdf_version)
+
+    def add(self, s):
+        s = pdfdoc.pdfdocEnc(s)
+        posicao = self.offset
+        self.offset = posicao + len(s)
+        self.arquivo.write(s)
+        return posicao
+
+
+class ReferenciasPaginas(pdfdoc.PDFObject):
+    """ Kids da árvore de páginas, formatado a partir dos números das páginas gravadas. """
+
+    def __init__(self, numeros):
+        self.numeros = numeros
+
+    def format(self, document):
+        dados = bytearray(b'[')
+        for inicio in range(0, len(self.numeros), LOTE_ESCRITA):
+            dados += b''.join(b'%d 0 R ' % numero for numero in self.numeros[inicio:inicio + LOTE_ESCRITA])
+        dados += b']'
+        return bytes(dados)
+
+
+class PaginasStreaming(pdfdoc.PDFPages):
+    """ Árvore de páginas que guarda só o número do objeto de cada página. """
+
+    def __init__(self):
+        super().__init__()
+        self.numeros = array('q')
+
+    def addPage(self, page):
+        # A página é gravada logo em seguida; o número é guardado por DocumentoStreaming
+        pass
+
+    def check_format(self, document):
+        self.Kids = ReferenciasPaginas(self.numeros)
+        self.Count = len(self.numeros)
+
+
+class DocumentoStreaming(pdfdoc.PDFDocument):
+    """
+    PDFDocument que grava cada objeto assim que a página que o criou termina.
+    Ficam para o save() só os objetos que mudam até o fim: a árvore de páginas,
+    o dicionário de fontes, o catálogo e as informações do documento.
+    """
+
+    def __init__(self, arquivo, **kwargs):
+        super().__init__(**kwargs)
+        self.Pages = self.Catalog.Pages = PaginasStreaming()
+        self.Reference(self.Pages)
+        self.no_final = {pdfdoc.BasicFonts, self.Pages.__InternalName__}
+        self.saida = ArquivoPDF(arquivo, self._pdfVersion)
+        self.offsets = array('q', [0])
+        self.ultimo_gravado = 0
+
+    def _gravar(self, nome):
+        numero = self.idToObjectNumberAndVersion[nome][0]
+        objeto = self.idToObject[nome]
+        if numero >= len(self.offsets):
+            self.offsets.extend([0] * (numero + 1 - len(self.offsets)))
+        self.offsets[numero] = self.saida.add(pdfdoc.PDFIndirectObject(nome, objeto).format(self))
+        if isinstance(objeto, (pdfdoc.PDFPage, pdfdoc.PDFStream)):
+            # Ninguém mais se refere a eles pelo nome: a árvore de páginas usa o número
+            del self.idToObject[nome], self.idToObjectNumberAndVersion[nome], self.numberToId[numero]
+        return numero
+
+    def _gravar_novos(self):
+        # Formatar um objeto pode registrar outros (a página registra o stream do conteúdo)
+        while self.ultimo_gravado < self.objectcounter:
+            self.ultimo_gravado += 1
+            nome = self.numberToId[self.ultimo_gravado]
+            if nome not in self.no_final:
+                self._gravar(nome)
+
+    def addPage(self, page):
+        super().addPage(page)
+        self.Pages.numeros.append(self.idToObjectNumberAndVersion[page.__InternalName__][0])
+        self._gravar_novos()
+
+    def format(self):
+        for nome in self.no_final:
+            self._gravar(nome)
+        self._gravar_novos()
+
+        total = self.objectcounter + 1
+        inicio_xref = self.saida.add(b'xref\n0 %d\n0000000000 65535 f \n' % total)
+        for inicio in range(1, total, LOTE_ESCRITA):
+            self.saida.add(b''.join(
+                b'%010d 00000 n \n' % offset for offset in self.offsets[inicio:min(inicio + LOTE_ESCRITA, total)]
+            ))
+        self.saida.add(pdfdoc.PDFTrailer(
+            startxref=inicio_xref,
+            Size=total,
+            Root=self.Reference(self.Catalog),
+            Info=self.Reference(self.info),
+            ID=self.ID(),
+        ).format(self))
+        # Tudo já foi escrito no arquivo
+        return b''
+
+
+class CanvasStreaming(canvas.Canvas):
+    """ reportlab.pdfgen.canvas.Canvas que grava página a página em `arquivo` (ver DocumentoStreaming). """
+
+    def __init__(self, arquivo, pagesize=A4, **kwargs):
+        super().__init__(arquivo, pagesize=pagesize, **kwargs)
+        self._doc = DocumentoStreaming(
+            arquivo, compression=self._doc.compression, invariant=self._doc.invariant,
+            pdfVersion=self._doc._pdfVersion,
+        )
+        # O preâmbulo registra a fonte inicial no documento
+        self._make_preamble()
@@ -0,0 +1,178 @@
+# relatorios.py
+"""
+Fila de relatórios em PDF.
+
+As páginas de relatório não geram mais o PDF dentro da requisição: o
+formulário cria um RelatorioJob e a página consulta o andamento até o link
+de download aparecer. O comando `processar_relatorios` (processo worker do
+Procfile) gera os PDFs e os grava no próprio job (campo conteudo).
+
+Cada pedido guarda a "versão dos dados" do período (quantidade de linhas e
+maior atualizado_em). Um novo pedido para o mesmo tipo, período e versão
+reaproveita o arquivo já gerado, sem renderizar de novo.
+"""
+import hashlib
+import traceback
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from cedepe.models import RelatorioJob
+from cedepe.pdf import arquivo_temporario
+
+# tipo -> (função que escreve o PDF, função que calcula a versão dos dados)
+# Ambas recebem (data_inicio, data_fim) como datetime; a primeira recebe antes o arquivo.
+TIPOS_RELATORIO = {
+    'RESERVAS': ('reservas.views.gerar_pdf_reservas', 'reservas.views.versao_reservas'),
+    'OCUPACOES': ('reservas.views.gerar_pdf_ocupacoes', 'reservas.views.versao_ocupacoes'),
+    'EVENTOS': ('eventos.views.gerar_pdf_eventos', 'eventos.views.versao_eventos'),
+}
+
+# Um job em PROCESSANDO há mais tempo que isso é considerado abandonado (worker reiniciado)
+TEMPO_MAXIMO_PROCESSAMENTO = timedelta(minutes=30)
+
+
+def versao_dados(queryset, *campos_data):
+    """ Resumo (md5) da quantidade de linhas e do maior valor de cada campo de data do queryset. """
+    agregados = {'total': Count('pk')}
+    agregados.update({f'max_{i}': Max(campo) for i, campo in enumerate(campos_data)})
+    resumo = queryset.order_by().aggregate(**agregados)
+    return hashlib.md5(repr(sorted(resumo.items())).encode(), usedforsecurity=False).hexdigest()
+
+
+def periodo_do_formulario(dados):
+    """
+    Lê o período dos formulários de relatório (tipo_filtro 'mes' ou 'periodo').
+    Retorna (data_inicio, data_fim) como datetime ou levanta ValueError.
+    """
+    tipo_filtro = dados.get('tipo_filtro')
+    try:
+        if tipo_filtro == 'mes':
+            mes = int(dados.get('mes'))
+            ano = int(dados.get('ano'))
+            data_inicio = datetime(ano, mes, 1)
+            data_fim = datetime(ano + (1 if mes == 12 else 0), (mes % 12) + 1, 1)
+        elif tipo_filtro == 'periodo':
+            data_inicio = datetime.strptime(dados.get('data_inicio') or '', '%Y-%m-%d')
+            data_fim = datetime.strptime(dados.get('data_fim') or '', '%Y-%m-%d')
+        else:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError("Informe um mês/ano ou um intervalo de datas válido.")
+    if data_fim < data_inicio:
+        raise ValueError("A data final não pode ser anterior à data inicial.")
+    return data_inicio, data_fim
+
+
+def _como_datetime(data):
+    return datetime.combine(data, time.min)
+
+
+def solicitar_relatorio(tipo, data_inicio, data_fim, usuario=None):
+    """
+    Retorna o job do relatório pedido: um já concluído (ou em andamento) com a
+    mesma versão dos dados, ou um novo job PENDENTE.
+    """
+    versao = import_string(TIPOS_RELATORIO[tipo][1])(data_inicio, data_fim)
+    existente = RelatorioJob.objects.filter(
+        Q(status__in=['PENDENTE', 'PROCESSANDO']) | Q(status='CONCLUIDO', conteudo__isnull=False),
+        tipo=tipo,
+        data_inicio=data_inicio.date(),
+        data_fim=data_fim.date(),
+        versao_dados=versao,
+    ).defer('conteudo').order_by('-criado_em').first()
+    if existente is not None:
+        return existente
+
+    return RelatorioJob.objects.create(
+        tipo=tipo,
+        data_inicio=data_inicio.date(),
+        data_fim=data_fim.date(),
+        versao_dados=versao,
+        solicitado_por=usuario if usuario is not None and usuario.is_authenticated else None,
+    )
+
+
+def reabrir_abandonados():
+    """ Devolve à fila os jobs que ficaram em PROCESSANDO por tempo demais. """
+    return RelatorioJob.objects.filter(
+        status='PROCESSANDO', iniciado_em__lt=timezone.now() - TEMPO_MAXIMO_PROCESSAMENTO
+    ).update(status='PENDENTE', iniciado_em=None)
+
+
+def reservar_proximo():
+    """
+    Tira o próximo job da fila. O UPDATE condicional garante que, com mais de
+    um worker, cada job seja processado por apenas um deles.
+    """
+    for job in RelatorioJob.objects.filter(status='PENDENTE').order_by('criado_em')[:10]:
+        agora = timezone.now()
+        if RelatorioJob.objects.filter(pk=job.pk, status='PENDENTE').update(status='PROCESSANDO', iniciado_em=agora):
+            job.status, job.iniciado_em = 'PROCESSANDO', agora
+            return job
+    return None
+
+
+def executar(job):
+    """ Gera o PDF do job e o grava no campo conteudo. """
+    gerar = import_string(TIPOS_RELATORIO[job.tipo][0])
+    try:
+        with arquivo_temporario() as arquivo:
+            gerar(arquivo, _como_datetime(job.data_inicio), _como_datetime(job.data_fim))
+            arquivo.seek(0)
+            job.conteudo = arquivo.read()
+    except Exception:
+        job.status = 'ERRO'
+        job.erro = traceback.format_exc()
+        job.concluido_em = timezone.now()
+        job.save(update_fields=['status', 'erro', 'concluido_em'])
+        return job
+
+    job.status = 'CONCLUIDO'
+    job.concluido_em = timezone.now()
+    with transaction.atomic():
+        job.save(update_fields=['status', 'conteudo', 'concluido_em'])
+        descartar_versoes_antigas(job)
+    return job
+
+
+def descartar_versoes_antigas(job):
+    """ Apaga as versões anteriores do mesmo relatório (mesmo tipo e período). """
+    RelatorioJob.objects.filter(
+        tipo=job.tipo, data_inicio=job.data_inicio, data_fim=job.data_fim, status__in=['CONCLUIDO', 'ERRO']
+    ).exclude(versao_dados=job.versao_dados).delete()
+
+
+def pagina_relatorio(request, tipo, template, contexto):
+    """
+    View comum das páginas de relatório: no POST enfileira o pedido e volta
+    para a página com ?job=<id>; no GET mostra o andamento desse job.
+    """
+    if request.method == 'POST':
+        try:
+            data_inicio, data_fim = periodo_do_formulario(request.POST)
+        except ValueError as e:
+            return render(request, template, {**contexto, 'erro_relatorio': str(e)})
+        job = solicitar_relatorio(tipo, data_inicio, data_fim, request.user)
+        return redirect(f"{request.path}?job={job.pk}")
+
+    job_id = request.GET.get('job', '')
+    if job_id.isdigit():
+        contexto['job'] = RelatorioJob.objects.filter(pk=job_id, tipo=tipo).first()
+    return render(request, template, contexto)
+
+
+def situacao_job(job):
+    """ Dados de andamento usados pela página (JSON). """
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'download_url': reverse('relatorio_download', args=[job.pk]) if job.status == 'CONCLUIDO' else None,
+        'erro': 'Falha ao gerar o relatório.' if job.status == 'ERRO' else None,
+    }
@@ -125,10 +125,37 @@ DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://postgres:HKhnFzXggtmylfsS
 DATABASES = {
     'default': dj_database_url.config(
         default=DATABASE_URL,
-        conn_max_age=600,
+        # Conexões persistentes no processo WSGI (web). O processo ASGI do mapa em
+        # tempo real (cedepe/asgi.py) usa DB_CONN_MAX_AGE=0, como o Django recomenda sob ASGI.
+        conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', 600)),
         ssl_require=True
     )
 }
+
+# Cache compartilhado entre os workers do gunicorn (tabela criada com
+# `manage.py createcachetable` na fase de release). Um cache por processo
+# não veria as invalidações feitas por outro worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cedepe_cache',
+    },
+    # Memória do próprio processo, para chaves lidas a cada requisição e de vida
+    # curta (autocomplete, geração do calendário), sem ida ao banco
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cedepe-local',
+    },
+}
+
+# Broker do mapa em tempo real (reservas/tempo_real.py). O padrão distribui as
+# alterações dentro de cada processo; com vários servidores, use
+# "reservas.tempo_real.BrokerPostgres" e rode `manage.py transmitir_alteracoes`.
+TEMPO_REAL_BROKER = env("TEMPO_REAL_BROKER", default="reservas.tempo_real.BrokerLocal")
+# Endereço do processo ASGI que serve o stream do mapa (Procfile: tempo_real), por
+# exemplo "https://tempo-real.grefloresta.com.br". Vazio: mesmo domínio do site, para
+# quando um proxy encaminha /reservas/api/mapa/eventos/ a esse processo.
+TEMPO_REAL_URL = env("TEMPO_REAL_URL", default="")
 import os
 
 MEDIA_URL = '/media/'
@@ -160,6 +187,9 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.BrowsableAPIRenderer',
         'rest_framework.permissions.AllowAny',
     ),
+    # Paginação por chave (sem OFFSET) e contagem estimada/em cache; ver cedepe/paginacao.py
+    'DEFAULT_PAGINATION_CLASS': 'cedepe.paginacao.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
 
@@ -0,0 +1,46 @@
+# transacao.py
+"""
+Trabalho adiado para o commit, feito uma vez por transação.
+
+Receptores de sinais rodam uma vez por objeto: numa exclusão em cascata ou
+num QuerySet.delete(), uma vez por linha. `ao_confirmar(processar, itens)`
+junta os itens de todas as chamadas da mesma transação e chama
+`processar(itens)` uma só vez, depois do commit.
+
+Os itens pendentes ficam presos ao callback registrado no Django. Se a
+transação (ou o savepoint em que o callback foi registrado) for desfeita, o
+Django descarta o callback e troca a lista de callbacks da conexão; a
+próxima chamada percebe a troca e começa uma lista nova, sem os itens
+desfeitos.
+"""
+from django.db import transaction
+
+
+def ao_confirmar(processar, itens=(), using=None):
+    """
+    Acrescenta `itens` aos pendentes de `processar` na transação atual e,
+    na primeira chamada da transação, registra `processar(lista)` no commit.
+    Fora de transação roda na hora. Como todo trabalho depois do commit, é
+    robust: uma falha é registrada no log e não derruba quem já gravou.
+    """
+    conexao = transaction.get_connection(using)
+    if not conexao.in_atomic_block:
+        transaction.on_commit(lambda: processar(list(itens)), using=using, robust=True)
+        return
+
+    if not hasattr(conexao, 'pendentes_commit'):
+        conexao.pendentes_commit = {}
+    pendentes = conexao.pendentes_commit
+    callbacks, lista = pendentes.get(processar, (None, None))
+    # O Django troca a lista de callbacks no commit e em todo rollback
+    if callbacks is not conexao.run_on_commit:
+        lista = []
+
+        def executar():
+            if pendentes.get(processar, (None, None))[1] is lista:
+                del pendentes[processar]
+            processar(lista)
+
+        transaction.on_commit(executar, using=using, robust=True)
+        pendentes[processar] = (conexao.run_on_commit, lista)
+    lista.extend(itens)
@@ -14,6 +14,10 @@ urlpatterns = [
     path('logout/', views.user_logout, name='logout'),
     path('register/', views.register, name='register'),
 
+    # Fila de relatórios em PDF
+    path('relatorios/<int:pk>/status/', views.relatorio_status, name='relatorio_status'),
+    path('relatorios/<int:pk>/download/', views.relatorio_download, name='relatorio_download'),
+
     # Rotas de recuperação de senha
     path('password_reset/', auth_views.PasswordResetView.as_view(template_name='cedepe/password_reset.html'), name='password_reset'),
     path('password_reset_done/', auth_views.PasswordResetDoneView.as_view(template_name='cedepe/password_reset_done.html'), name='password_reset_done'),
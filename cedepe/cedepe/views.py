@@ -39,3 +39,21 @@ def register(request):
     else:
         form = UserCreationForm()
     return render(request, "cedepe/register.html", {"form": form})
+
+import io
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from .models import RelatorioJob
+from .relatorios import situacao_job
+
+def relatorio_status(request, pk):
+    """ Consultado pelas páginas de relatório até o PDF ficar pronto. """
+    job = get_object_or_404(RelatorioJob.objects.defer('conteudo'), pk=pk)
+    return JsonResponse(situacao_job(job))
+
+def relatorio_download(request, pk):
+    job = RelatorioJob.objects.filter(pk=pk, status='CONCLUIDO', conteudo__isnull=False).first()
+    if job is None:
+        raise Http404("Arquivo do relatório não encontrado. Gere o relatório novamente.")
+    nome = f"relatorio_{job.tipo.lower()}_{job.data_inicio:%Y-%m-%d}_a_{job.data_fim:%Y-%m-%d}.pdf"
+    return FileResponse(io.BytesIO(job.conteudo), as_attachment=True, filename=nome)
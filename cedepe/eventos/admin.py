@@ -1,5 +1,10 @@
-from django.contrib import admin
-from .models import Sala, Evento, Agendamento
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import FilteredSelectMultiple
+from django.http import HttpResponseRedirect
+from .models import Sala, Evento, Agendamento, SerieAgendamento
+from .forms import AgendamentoForm
+from .conflitos import ConflitoSala, salvar_agendamento
 
 @admin.register(Sala)
 class SalaAdmin(admin.ModelAdmin):
@@ -12,13 +17,53 @@ class EventoAdmin(admin.ModelAdmin):
     search_fields = ('titulo', 'organizador__username')
     list_filter = ('data_criacao',)
 
+class AgendamentoAdminForm(AgendamentoForm):
+    """ Validação do formulário do site com os widgets do admin. """
+    salas = forms.ModelMultipleChoiceField(
+        queryset=Sala.objects.all(),
+        widget=FilteredSelectMultiple('salas', is_stacked=False),
+    )
+
+    class Meta(AgendamentoForm.Meta):
+        widgets = {}
+
 @admin.register(Agendamento)
 class AgendamentoAdmin(admin.ModelAdmin):
     list_display = ('evento', 'listar_salas', 'inicio', 'fim')
     search_fields = ('evento__titulo', 'salas__nome')
     list_filter = ('salas', 'inicio', 'fim')
-    filter_horizontal = ('salas',)  # facilita seleção de múltiplas salas no admin
+    # Valida conflitos de sala como o formulário do site; a gravação passa por salvar_agendamento
+    form = AgendamentoAdminForm
 
     def listar_salas(self, obj):
         return ", ".join([sala.nome for sala in obj.salas.all()])
     listar_salas.short_description = 'Salas'
+
+    def save_model(self, request, obj, form, change):
+        # Grava agendamento e salas juntos: as salas desmarcadas saem antes de o período mudar
+        salvar_agendamento(obj, form.cleaned_data['salas'])
+
+    def save_related(self, request, form, formsets, change):
+        # As salas já foram gravadas em save_model
+        for formset in formsets:
+            self.save_formset(request, form, formset, change=change)
+
+    def changeform_view(self, request, *args, **kwargs):
+        try:
+            return super().changeform_view(request, *args, **kwargs)
+        except ConflitoSala as e:
+            # Outra requisição reservou a sala entre a validação do formulário e a gravação
+            self.message_user(request, " ".join(e.messages), messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+
+@admin.register(SerieAgendamento)
+class SerieAgendamentoAdmin(admin.ModelAdmin):
+    list_display = ('evento', 'frequencia', 'intervalo', 'inicio', 'ate', 'repeticoes')
+    search_fields = ('evento__titulo',)
+    list_filter = ('frequencia',)
+    # Criação e alterações em lote passam por eventos/series.py (site e API); aqui só consulta e exclusão
+    readonly_fields = ('evento', 'salas', 'frequencia', 'intervalo', 'inicio', 'fim', 'ate', 'repeticoes', 'participantes')
+
+    def has_add_permission(self, request):
+        return False
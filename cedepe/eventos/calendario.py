@@ -0,0 +1,124 @@
+# calendario.py
+"""
+Eventos do calendário do dashboard (FullCalendar).
+
+Cada troca de visão pede só a janela visível (?start=&end=): agendamentos que
+se sobrepõem a ela, pelo índice (inicio, fim), com evento e salas carregados
+em número constante de consultas. O payload de cada janela fica no cache
+compartilhado até a próxima alteração em Agendamento, Evento ou Sala: as
+chaves levam uma "geração" que os sinais (signals.py) trocam a cada gravação.
+Cada processo guarda a geração na memória (cache 'local') por
+TEMPO_GERACAO_LOCAL segundos, para não ir ao banco em toda requisição; em
+outros processos a alteração aparece depois desse tempo.
+"""
+import hashlib
+import time
+from datetime import datetime, time as dt_time
+
+from django.core.cache import cache, caches
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from cedepe.transacao import ao_confirmar
+
+from .models import Agendamento, Sala
+
+CHAVE_GERACAO = 'eventos:calendario:geracao'
+# Limite de segurança caso alguma alteração escape da invalidação
+TEMPO_CACHE = 60 * 60
+# Segundos que cada processo reaproveita a geração lida do cache compartilhado
+TEMPO_GERACAO_LOCAL = 2
+
+
+def ler_data(valor, campo):
+    """ Data/hora ISO 8601 (ou só a data) dos parâmetros do FullCalendar; levanta ValueError. """
+    if not valor:
+        return None
+    # '+' do fuso vira espaço quando a data não é codificada na URL
+    valor = valor.replace(' ', '+')
+    momento = parse_datetime(valor)
+    if momento is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValueError(f"Parâmetro '{campo}' inválido. Use o formato ISO 8601.")
+        momento = datetime.combine(dia, dt_time.min)
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return momento
+
+
+def agendamentos_periodo(inicio=None, fim=None, salas=None):
+    """ Agendamentos que se sobrepõem a [inicio, fim), opcionalmente só das salas informadas. """
+    agendamentos = Agendamento.objects.all()
+    if inicio:
+        agendamentos = agendamentos.filter(fim__gt=inicio)
+    if fim:
+        agendamentos = agendamentos.filter(inicio__lt=fim)
+    if salas:
+        # Subconsulta em vez de join para não repetir agendamentos com várias salas
+        agendamentos = agendamentos.filter(
+            pk__in=Agendamento.salas.through.objects.filter(sala_id__in=salas).values('agendamento_id')
+        )
+    return agendamentos
+
+
+def montar_eventos(agendamentos):
+    """ Lista no formato do FullCalendar. Duas consultas: agendamentos com evento e as salas. """
+    agendamentos = agendamentos.select_related('evento').only(
+        'inicio', 'fim', 'evento__titulo', 'evento__descricao'
+    ).prefetch_related(
+        Prefetch('salas', queryset=Sala.objects.only('nome'))
+    ).order_by('inicio', 'id')
+
+    eventos = []
+    for agendamento in agendamentos:
+        inicio = timezone.localtime(agendamento.inicio)
+        fim = timezone.localtime(agendamento.fim)
+        eventos.append({
+            'id': agendamento.id,
+            'title': agendamento.evento.titulo,
+            'start': inicio.isoformat(),
+            'end': fim.isoformat(),
+            'extendedProps': {
+                'salas': [sala.nome for sala in agendamento.salas.all()],
+                'descricao': agendamento.evento.descricao,
+                'horario': f"{inicio.strftime('%H:%M')} - {fim.strftime('%H:%M')}"
+            }
+        })
+    return eventos
+
+
+def geracao():
+    valor = caches['local'].get(CHAVE_GERACAO)
+    if valor is None:
+        valor = cache.get_or_set(CHAVE_GERACAO, time.time_ns, None)
+        caches['local'].set(CHAVE_GERACAO, valor, TEMPO_GERACAO_LOCAL)
+    return valor
+
+
+def _nova_geracao(_alteracoes=()):
+    valor = time.time_ns()
+    cache.set(CHAVE_GERACAO, valor, None)
+    caches['local'].set(CHAVE_GERACAO, valor, TEMPO_GERACAO_LOCAL)
+
+
+def chave_janela(inicio, fim, salas):
+    partes = repr((geracao(), inicio and inicio.isoformat(), fim and fim.isoformat(), sorted(salas or [])))
+    return 'eventos:calendario:%s' % hashlib.md5(partes.encode(), usedforsecurity=False).hexdigest()
+
+
+def eventos_calendario(inicio=None, fim=None, salas=None):
+    """ Payload da janela, do cache quando nada mudou desde a última montagem. """
+    chave = chave_janela(inicio, fim, salas)
+    eventos = cache.get(chave)
+    if eventos is None:
+        eventos = montar_eventos(agendamentos_periodo(inicio, fim, salas))
+        cache.set(chave, eventos, TEMPO_CACHE)
+    return eventos
+
+
+def invalidar_calendario(**kwargs):
+    # Só depois do commit: antes disso outra requisição montaria a janela com dados antigos.
+    # Uma geração nova por transação, mesmo quando os sinais vêm de muitas linhas
+    ao_confirmar(_nova_geracao)
@@ -0,0 +1,207 @@
+# conflitos.py
+"""
+Conflito de salas entre agendamentos.
+
+Cada linha de AgendamentoSala guarda a sala e uma cópia do período do
+agendamento. Assim:
+
+- a verificação do formulário e da API é uma única consulta sobre todas as
+  salas escolhidas, que devolve todos os agendamentos em conflito;
+- o banco recusa a gravação se duas requisições simultâneas passarem pela
+  verificação ao mesmo tempo: no PostgreSQL, uma restrição de exclusão
+  (sala_id WITH =, tstzrange(inicio, fim) WITH &&); no SQLite, gatilhos com
+  a mesma regra (migração 0007). A violação vira ConflitoSala.
+
+Se já houver reservas sobrepostas quando a migração 0007 rodar, a restrição
+não é criada (a implantação segue). O comando `conflitos_salas` lista essas
+reservas, resolve-as com --corrigir e cria a restrição quando não sobrar
+nenhuma; ele roda na fase de release (Procfile).
+
+Os períodos são semiabertos: um agendamento que termina às 10h não conflita
+com outro que começa às 10h.
+"""
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import AgendamentoSala
+
+NOME_RESTRICAO = 'agendamento_sala_sem_conflito'
+
+
+class ConflitoSala(ValidationError):
+    """ Uma das salas já está reservada no período. """
+
+
+def conflitos_salas(inicio, fim, salas, excluir_agendamento=None):
+    """ Reservas (AgendamentoSala) das `salas` que se sobrepõem a [inicio, fim). Uma consulta. """
+    conflitos = AgendamentoSala.objects.filter(
+        sala__in=salas, inicio__lt=fim, fim__gt=inicio
+    ).select_related('sala', 'agendamento__evento').order_by('inicio', 'sala__nome')
+    if excluir_agendamento:
+        conflitos = conflitos.exclude(agendamento_id=excluir_agendamento)
+    return list(conflitos)
+
+
+def mensagens_conflito(conflitos):
+    mensagens = []
+    for conflito in conflitos:
+        inicio = timezone.localtime(conflito.inicio)
+        fim = timezone.localtime(conflito.fim)
+        mensagens.append(
+            f"Conflito de horário na sala '{conflito.sala.nome}' com "
+            f"'{conflito.agendamento.evento.titulo}' ({inicio:%d/%m/%Y %H:%M} - {fim:%H:%M})."
+        )
+    return mensagens
+
+
+def verificar_conflitos(inicio, fim, salas, excluir_agendamento=None):
+    """ Levanta ConflitoSala com uma mensagem por agendamento em conflito. """
+    conflitos = conflitos_salas(inicio, fim, salas, excluir_agendamento)
+    if conflitos:
+        raise ConflitoSala(mensagens_conflito(conflitos))
+
+
+def conflitos_periodos(periodos, salas, excluir_agendamentos=None):
+    """
+    Conflitos de vários períodos de uma vez (ocorrências de uma série): uma
+    consulta traz as reservas das `salas` entre o primeiro e o último período
+    e cada período é comparado em memória, por busca binária nas reservas
+    ordenadas. `periodos`: lista de (inicio, fim) ordenada. Retorna as
+    reservas em conflito, sem repetição.
+    """
+    if not periodos or not salas:
+        return []
+    reservas = AgendamentoSala.objects.filter(
+        sala__in=salas, inicio__lt=periodos[-1][1], fim__gt=periodos[0][0]
+    ).select_related('sala', 'agendamento__evento').order_by('inicio', 'sala__nome')
+    if excluir_agendamentos is not None:
+        reservas = reservas.exclude(agendamento__in=excluir_agendamentos)
+    reservas = list(reservas)
+    inicios = [reserva.inicio for reserva in reservas]
+    # Só reservas que começam até `maior_duracao` antes do período podem alcançá-lo
+    maior_duracao = max((reserva.fim - reserva.inicio for reserva in reservas), default=timedelta(0))
+
+    conflitos = {}
+    for inicio, fim in periodos:
+        primeira = bisect_left(inicios, inicio - maior_duracao)
+        ultima = bisect_left(inicios, fim)
+        for reserva in reservas[primeira:ultima]:
+            if reserva.fim > inicio:
+                conflitos[reserva.pk] = reserva
+    return sorted(conflitos.values(), key=lambda reserva: (reserva.inicio, reserva.sala.nome))
+
+
+def violacao_conflito(erro):
+    """ O IntegrityError veio da restrição de conflito de salas? """
+    return NOME_RESTRICAO in str(erro)
+
+
+def _traduzir_violacao(agendamento, salas, erro):
+    if not violacao_conflito(erro):
+        raise erro
+    # Outra requisição gravou primeiro: informa quem ocupou a sala
+    verificar_conflitos(agendamento.inicio, agendamento.fim, salas, agendamento.pk)
+    raise ConflitoSala("Uma das salas acabou de ser reservada nesse horário.")
+
+
+def definir_salas(agendamento, salas):
+    """ Substitui as salas de um agendamento já gravado, copiando o período. """
+    try:
+        with transaction.atomic():
+            agendamento.salas.set(salas, through_defaults={'inicio': agendamento.inicio, 'fim': agendamento.fim})
+    except IntegrityError as e:
+        _traduzir_violacao(agendamento, salas, e)
+
+
+def salvar_agendamento(agendamento, salas=None):
+    """
+    Grava o agendamento e suas salas em uma transação (salas=None mantém as
+    atuais). Levanta ConflitoSala se o banco recusar por conflito.
+    """
+    novo = agendamento._state.adding
+    try:
+        with transaction.atomic():
+            if salas is not None and not novo:
+                # Remove antes as salas desmarcadas, para o novo período não conflitar por causa delas
+                AgendamentoSala.objects.filter(agendamento=agendamento).exclude(sala__in=salas).delete()
+            agendamento.save()
+            if salas is not None:
+                agendamento.salas.add(*salas, through_defaults={'inicio': agendamento.inicio, 'fim': agendamento.fim})
+    except IntegrityError as e:
+        if novo:
+            # A transação foi desfeita: o objeto volta a ser novo
+            agendamento.pk = None
+            agendamento._state.adding = True
+        _traduzir_violacao(agendamento, salas if salas is not None else agendamento.salas.all(), e)
+
+
+def reservas_sobrepostas():
+    """ Reservas de sala que se sobrepõem a outra na mesma sala (só existem sem a restrição). """
+    outras = AgendamentoSala.objects.filter(
+        sala_id=OuterRef('sala_id'), inicio__lt=OuterRef('fim'), fim__gt=OuterRef('inicio'),
+    ).exclude(pk=OuterRef('pk'))
+    return AgendamentoSala.objects.filter(Exists(outras))
+
+
+def resolver_sobreposicoes():
+    """
+    Mantém, em cada sala, a reserva do agendamento criado primeiro e tira a
+    sala dos agendamentos posteriores que a sobrepõem (o agendamento continua
+    existindo, sem aquela sala). Retorna as reservas removidas.
+    """
+    from .calendario import invalidar_calendario
+    from .utilizacao import atualizar_periodos
+
+    mantidas = {}
+    removidas = []
+    reservas = reservas_sobrepostas().select_related('sala', 'agendamento__evento').order_by('agendamento_id', 'id')
+    for reserva in reservas:
+        da_sala = mantidas.setdefault(reserva.sala_id, [])
+        if any(inicio < reserva.fim and fim > reserva.inicio for inicio, fim in da_sala):
+            removidas.append(reserva)
+        else:
+            da_sala.append((reserva.inicio, reserva.fim))
+    if removidas:
+        with transaction.atomic():
+            AgendamentoSala.objects.filter(pk__in=[reserva.pk for reserva in removidas]).delete()
+            atualizar_periodos([(reserva.inicio, reserva.fim) for reserva in removidas])
+        invalidar_calendario()
+    return removidas
+
+
+def restricao_existe():
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT 1 FROM pg_constraint WHERE conname = %s', [NOME_RESTRICAO])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s", [f'{NOME_RESTRICAO}_insert']
+            )
+        else:
+            return True
+        return cursor.fetchone() is not None
+
+
+def criar_restricao():
+    """ Cria a restrição da migração 0007 (mesmo SQL), que depende de não haver sobreposições. """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+            cursor.execute(
+                f'ALTER TABLE eventos_agendamento_salas ADD CONSTRAINT {NOME_RESTRICAO} '
+                f"EXCLUDE USING gist (sala_id WITH =, tstzrange(inicio, fim, '[)') WITH &&)"
+            )
+        elif connection.vendor == 'sqlite':
+            for operacao, outra_linha in (('INSERT', ''), ('UPDATE OF sala_id, inicio, fim', 'o.id <> NEW.id AND ')):
+                cursor.execute(
+                    f"CREATE TRIGGER {NOME_RESTRICAO}_{operacao.split()[0].lower()} "
+                    f'BEFORE {operacao} ON eventos_agendamento_salas '
+                    f'WHEN EXISTS (SELECT 1 FROM eventos_agendamento_salas o WHERE {outra_linha}'
+                    f'o.sala_id = NEW.sala_id AND o.inicio < NEW.fim AND o.fim > NEW.inicio) '
+                    f"BEGIN SELECT RAISE(ABORT, '{NOME_RESTRICAO}'); END"
+                )
@@ -15,15 +15,21 @@ class EventoForm(forms.ModelForm):
 from django import forms
 from django.utils.timezone import now
 from .models import Agendamento
+from .conflitos import conflitos_salas, definir_salas, mensagens_conflito, salvar_agendamento
 
 class AgendamentoForm(forms.ModelForm):
+    # Declarado aqui porque a relação tem tabela própria (AgendamentoSala), gravada por salvar_agendamento
+    salas = forms.ModelMultipleChoiceField(
+        queryset=Sala.objects.all(),
+        # Alterando para CheckboxSelectMultiple para permitir múltiplas salas via checkbox:
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+    )
+
     class Meta:
         model = Agendamento
         fields = '__all__'
         widgets = {
             'evento': forms.Select(attrs={'class': 'form-select'}),
-            # Alterando para CheckboxSelectMultiple para permitir múltiplas salas via checkbox:
-            'salas': forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
             'inicio': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
             'fim': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
             'participantes': forms.TextInput(attrs={'class': 'form-control'}),
@@ -42,19 +48,65 @@ class AgendamentoForm(forms.ModelForm):
             if inicio < now():
                 self.add_error('inicio', 'O horário de início não pode ser no passado.')
 
-        # Validação de conflito em cada sala selecionada
-        if salas and inicio and fim:
-            for sala in salas:
-                # Filtra agendamentos dessa sala com conflito de horário
-                conflitos = Agendamento.objects.filter(
-                    salas=sala,
-                    inicio__lt=fim,
-                    fim__gt=inicio
-                )
-                # Se estiver editando, exclua o próprio agendamento
-                if self.instance and self.instance.pk:
-                    conflitos = conflitos.exclude(pk=self.instance.pk)
-                if conflitos.exists():
-                    self.add_error('salas', f'Já existe um agendamento na sala {sala.nome} nesse horário.')
+        # Conflitos em todas as salas selecionadas, numa consulta (exceto o próprio agendamento)
+        if salas and inicio and fim and inicio < fim:
+            for mensagem in mensagens_conflito(conflitos_salas(inicio, fim, salas, self.instance.pk)):
+                self.add_error('salas', mensagem)
 
         return cleaned_data
+
+    def save(self, commit=True):
+        """ Pode levantar ConflitoSala se outra requisição reservar a sala ao mesmo tempo. """
+        agendamento = super().save(commit=False)
+        if commit:
+            salvar_agendamento(agendamento, self.cleaned_data['salas'])
+        else:
+            self.save_m2m = lambda: definir_salas(agendamento, self.cleaned_data['salas'])
+        return agendamento
+
+from django.core.exceptions import ValidationError
+from .models import SerieAgendamento
+from .series import criar_serie, validar_serie, verificar_periodos
+from .conflitos import ConflitoSala
+
+class SerieAgendamentoForm(forms.ModelForm):
+    salas = forms.ModelMultipleChoiceField(
+        queryset=Sala.objects.all(),
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+    )
+
+    class Meta:
+        model = SerieAgendamento
+        fields = ['evento', 'salas', 'inicio', 'fim', 'frequencia', 'intervalo', 'ate', 'repeticoes', 'participantes']
+        widgets = {
+            'evento': forms.Select(attrs={'class': 'form-select'}),
+            'inicio': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+            'fim': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+            'frequencia': forms.Select(attrs={'class': 'form-select'}),
+            'intervalo': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'ate': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'repeticoes': forms.NumberInput(attrs={'class': 'form-control', 'min': 2}),
+            'participantes': forms.TextInput(attrs={'class': 'form-control'}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+        # Regra de repetição e conflitos de todas as ocorrências, numa consulta
+        serie = SerieAgendamento(**{campo: valor for campo, valor in cleaned_data.items() if campo != 'salas'})
+        try:
+            verificar_periodos(validar_serie(serie), cleaned_data['salas'])
+        except ConflitoSala as e:
+            for mensagem in e.messages:
+                self.add_error('salas', mensagem)
+        except ValidationError as e:
+            self.add_error(None, e)
+        return cleaned_data
+
+    def save(self, commit=True):
+        """ Cria a série e as ocorrências. Pode levantar ConflitoSala (reserva simultânea). """
+        serie = super().save(commit=False)
+        if commit:
+            criar_serie(serie, self.cleaned_data['salas'])
+        return serie
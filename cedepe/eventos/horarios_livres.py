@@ -0,0 +1,235 @@
+# horarios_livres.py
+"""
+Busca de horários livres nas salas.
+
+Duas consultas: as salas e as reservas de sala (AgendamentoSala) do período,
+pelo índice (sala, inicio, fim). O resto é feito em memória:
+
+1. para cada sala, os intervalos livres dentro do expediente de cada dia
+   (varredura das reservas ordenadas contra as janelas do expediente);
+2. horários numa sala só: o primeiro início (arredondado ao passo) de cada
+   intervalo livre que comporte a duração, em salas com capacidade suficiente;
+3. combinações de salas (opcional): linha de varredura sobre os inícios
+   possíveis das salas menores. Em cada instante, as salas livres por toda a
+   duração formam o conjunto ativo; escolhe-se o menor número de salas cuja
+   capacidade somada atende o pedido.
+"""
+import heapq
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import AgendamentoSala, Sala
+
+HORA_INICIO_PADRAO = time(8, 0)
+HORA_FIM_PADRAO = time(18, 0)
+PASSO_PADRAO = 30
+DIAS_PADRAO = 30
+# Limites para a busca continuar barata
+DIAS_MAXIMO = 92
+LIMITE_MAXIMO = 100
+SALAS_MAXIMO = 4
+
+
+def janelas_expediente(inicio, fim, hora_inicio, hora_fim):
+    """ Janelas [abertura, fechamento) de cada dia de inicio a fim (datas, inclusive). """
+    janelas = []
+    dia = inicio
+    while dia <= fim:
+        janelas.append((
+            timezone.make_aware(datetime.combine(dia, hora_inicio)),
+            timezone.make_aware(datetime.combine(dia, hora_fim)),
+        ))
+        dia += timedelta(days=1)
+    return janelas
+
+
+def intervalos_livres(ocupados, janelas):
+    """
+    Partes das `janelas` fora dos intervalos `ocupados`, como (inicio, fim,
+    abertura da janela). Ambas as listas de (inicio, fim) ordenadas por
+    início; percorre cada uma uma única vez.
+    """
+    livres = []
+    i = 0
+    for abertura, fechamento in janelas:
+        cursor = abertura
+        # Reservas que terminaram antes da janela não interessam mais
+        while i < len(ocupados) and ocupados[i][1] <= abertura:
+            i += 1
+        j = i
+        while j < len(ocupados) and ocupados[j][0] < fechamento:
+            ocupado_inicio, ocupado_fim = ocupados[j]
+            if ocupado_inicio > cursor:
+                livres.append((cursor, ocupado_inicio, abertura))
+            cursor = max(cursor, ocupado_fim)
+            j += 1
+        if cursor < fechamento:
+            livres.append((cursor, fechamento, abertura))
+    return livres
+
+
+def _arredondar(momento, passo, referencia):
+    """ Primeiro instante >= momento alinhado ao passo a partir da abertura do dia. """
+    resto = (momento - referencia) % passo
+    return momento if not resto else momento + (passo - resto)
+
+
+def _inicios_possiveis(livres, duracao, passo, agora):
+    """ (primeiro início, último início) de cada intervalo livre que comporte a duração. """
+    for livre_inicio, livre_fim, abertura in livres:
+        primeiro = _arredondar(max(livre_inicio, agora), passo, abertura)
+        if primeiro + duracao <= livre_fim:
+            yield primeiro, livre_fim - duracao
+
+
+def _sala_dict(sala):
+    return {'id': sala.id, 'nome': sala.nome, 'capacidade': sala.capacidade}
+
+
+def _periodo(inicio, duracao):
+    return {'inicio': timezone.localtime(inicio), 'fim': timezone.localtime(inicio + duracao)}
+
+
+def _combinacao(candidatas, capacidade, max_salas):
+    """ Menor conjunto de salas (as maiores primeiro) com capacidade somada >= capacidade. """
+    escolhidas, total = [], 0
+    for sala in sorted(candidatas, key=lambda sala: (-sala.capacidade, sala.nome)):
+        escolhidas.append(sala)
+        total += sala.capacidade
+        if total >= capacidade:
+            return escolhidas, total
+        if len(escolhidas) == max_salas:
+            break
+    return None, total
+
+
+def buscar_horarios(duracao, capacidade=1, inicio=None, fim=None, hora_inicio=HORA_INICIO_PADRAO,
+                    hora_fim=HORA_FIM_PADRAO, passo=PASSO_PADRAO, limite=10, max_salas=1):
+    """
+    Horários livres mais cedo para `duracao` minutos e `capacidade` pessoas,
+    entre as datas `inicio` e `fim` (inclusive), dentro do expediente.
+
+    Retorna {'horarios': [...], 'combinacoes': [...]}: horários numa sala que
+    comporta todos e, com max_salas > 1, combinações de salas menores.
+    """
+    duracao = timedelta(minutes=duracao)
+    passo = timedelta(minutes=passo)
+    agora = timezone.now()
+    janelas = janelas_expediente(inicio, fim, hora_inicio, hora_fim)
+    if not janelas:
+        return {'horarios': [], 'combinacoes': []}
+
+    salas = Sala.objects.only('nome', 'capacidade').order_by('nome')
+    if max_salas == 1:
+        salas = salas.filter(capacidade__gte=capacidade)
+    salas = {sala.id: sala for sala in salas}
+
+    ocupados = {sala_id: [] for sala_id in salas}
+    reservas = AgendamentoSala.objects.filter(
+        sala__in=list(salas), inicio__lt=janelas[-1][1], fim__gt=janelas[0][0]
+    ).order_by('inicio').values_list('sala_id', 'inicio', 'fim')
+    for sala_id, reserva_inicio, reserva_fim in reservas:
+        ocupados[sala_id].append((reserva_inicio, reserva_fim))
+
+    inicios = {
+        sala_id: list(_inicios_possiveis(intervalos_livres(ocupados[sala_id], janelas), duracao, passo, agora))
+        for sala_id in salas
+    }
+
+    # Numa sala só: os primeiros inícios de todas as salas grandes, em ordem
+    grandes = [sala_id for sala_id, sala in salas.items() if sala.capacidade >= capacidade]
+    horarios = []
+    for primeiro, sala_id in heapq.merge(*[[(p, sala_id) for p, _ in inicios[sala_id]] for sala_id in grandes]):
+        if len(horarios) >= limite:
+            break
+        horarios.append({'sala': _sala_dict(salas[sala_id]), **_periodo(primeiro, duracao)})
+
+    combinacoes = []
+    if max_salas > 1:
+        # Linha de varredura: cada sala menor está disponível para começar em [primeiro, último]
+        eventos = sorted(
+            (primeiro, ultimo, sala_id)
+            for sala_id, sala in salas.items() if sala.capacidade < capacidade
+            for primeiro, ultimo in inicios[sala_id]
+        )
+        ativas = []  # heap de (último início, sala_id)
+        anterior = None
+        for indice, (instante, ultimo, sala_id) in enumerate(eventos):
+            heapq.heappush(ativas, (ultimo, sala_id))
+            # Processa cada instante uma vez, depois de incluir todas as salas que abrem nele
+            if indice + 1 < len(eventos) and eventos[indice + 1][0] == instante:
+                continue
+            while ativas and ativas[0][0] < instante:
+                heapq.heappop(ativas)
+            ultimos = {s: u for u, s in ativas}
+            escolhidas, total = _combinacao([salas[s] for s in ultimos], capacidade, max_salas)
+            if not escolhidas:
+                continue
+            conjunto = {sala.id for sala in escolhidas}
+            # A mesma combinação, ainda livre desde o último instante informado, não se repete
+            if anterior and conjunto == anterior[0] and instante <= anterior[1]:
+                continue
+            anterior = (conjunto, min(ultimos[sala_id] for sala_id in conjunto))
+            combinacoes.append({
+                'salas': [_sala_dict(sala) for sala in escolhidas],
+                'capacidade_total': total,
+                **_periodo(instante, duracao),
+            })
+            if len(combinacoes) >= limite:
+                break
+
+    return {'horarios': horarios, 'combinacoes': combinacoes}
+
+
+def ler_parametros(dados):
+    """ Valida os parâmetros da API; retorna os argumentos de buscar_horarios ou levanta ValueError. """
+    def inteiro(nome, padrao, minimo, maximo):
+        valor = dados.get(nome) or padrao
+        try:
+            valor = int(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"Parâmetro '{nome}' deve ser um número inteiro.")
+        if not minimo <= valor <= maximo:
+            raise ValueError(f"Parâmetro '{nome}' deve estar entre {minimo} e {maximo}.")
+        return valor
+
+    def hora(nome, padrao):
+        valor = dados.get(nome)
+        if not valor:
+            return padrao
+        try:
+            return time.fromisoformat(valor)
+        except ValueError:
+            raise ValueError(f"Parâmetro '{nome}' inválido. Use HH:MM.")
+
+    def dia(nome, padrao):
+        valor = dados.get(nome)
+        if not valor:
+            return padrao
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            raise ValueError(f"Parâmetro '{nome}' inválido. Use AAAA-MM-DD.")
+
+    if not dados.get('duracao'):
+        raise ValueError("Informe a duração em minutos (duracao).")
+    hoje = timezone.localdate()
+    parametros = {
+        'duracao': inteiro('duracao', None, 1, 24 * 60),
+        'capacidade': inteiro('capacidade', 1, 1, 100000),
+        'inicio': dia('inicio', hoje),
+        'hora_inicio': hora('hora_inicio', HORA_INICIO_PADRAO),
+        'hora_fim': hora('hora_fim', HORA_FIM_PADRAO),
+        'passo': inteiro('passo', PASSO_PADRAO, 5, 24 * 60),
+        'limite': inteiro('limite', 10, 1, LIMITE_MAXIMO),
+        'max_salas': inteiro('max_salas', 1, 1, SALAS_MAXIMO),
+    }
+    parametros['fim'] = dia('fim', parametros['inicio'] + timedelta(days=DIAS_PADRAO))
+    if parametros['fim'] < parametros['inicio']:
+        raise ValueError("A data final não pode ser anterior à data inicial.")
+    if (parametros['fim'] - parametros['inicio']).days > DIAS_MAXIMO:
+        raise ValueError(f"O período pode ter no máximo {DIAS_MAXIMO} dias.")
+    if parametros['hora_fim'] <= parametros['hora_inicio']:
+        raise ValueError("O fim do expediente deve ser posterior ao início.")
+    return parametros
@@ -0,0 +1,67 @@
+# conflitos_salas.py
+"""
+Lista os agendamentos em conflito na mesma sala e cria a restrição de
+conflito do banco (eventos/conflitos.py) quando não houver nenhum.
+
+A migração 0007 não cria a restrição se já houver conflitos, para não
+bloquear a implantação. Este comando roda na fase de release (Procfile):
+enquanto houver conflitos, só os lista; na primeira implantação depois de
+corrigidos, cria a restrição.
+
+    python manage.py conflitos_salas
+    python manage.py conflitos_salas --corrigir
+"""
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from eventos.conflitos import criar_restricao, reservas_sobrepostas, resolver_sobreposicoes, restricao_existe
+
+
+def _descricao(reserva):
+    inicio = timezone.localtime(reserva.inicio)
+    fim = timezone.localtime(reserva.fim)
+    return (
+        f"Sala {reserva.sala.nome}: agendamento {reserva.agendamento_id} "
+        f"'{reserva.agendamento.evento.titulo}' ({inicio:%d/%m/%Y %H:%M} a {fim:%d/%m/%Y %H:%M})"
+    )
+
+
+class Command(BaseCommand):
+    help = "Lista (e com --corrigir resolve) agendamentos em conflito na mesma sala e cria a restrição do banco."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corrigir',
+            action='store_true',
+            help="Tira a sala dos agendamentos criados por último em cada conflito.",
+        )
+
+    def handle(self, *args, **options):
+        if options['corrigir']:
+            for reserva in resolver_sobreposicoes():
+                self.stdout.write(f"Removida: {_descricao(reserva)}")
+
+        conflitos = list(
+            reservas_sobrepostas().select_related('sala', 'agendamento__evento').order_by('sala__nome', 'inicio')
+        )
+        if conflitos:
+            for reserva in conflitos:
+                self.stdout.write(_descricao(reserva))
+            self.stdout.write(self.style.WARNING(
+                f"{len(conflitos)} reserva(s) de sala em conflito; a restrição do banco ainda não foi criada. "
+                "Corrija os agendamentos ou rode com --corrigir."
+            ))
+            return
+
+        if restricao_existe():
+            self.stdout.write(self.style.SUCCESS("Nenhum conflito; a restrição do banco já existe."))
+            return
+        try:
+            with transaction.atomic():
+                criar_restricao()
+        except DatabaseError as e:
+            # Um agendamento em conflito gravado agora: fica para a próxima execução
+            self.stdout.write(self.style.WARNING(f"Restrição não criada: {e}"))
+            return
+        self.stdout.write(self.style.SUCCESS("Nenhum conflito; restrição do banco criada."))
@@ -0,0 +1,38 @@
+# consolidar_utilizacao.py
+"""
+Reconstrói o consolidado semanal de uso das salas (UtilizacaoSala).
+
+Roda na fase de release (Procfile): preenche o consolidado na primeira
+implantação e corrige qualquer divergência nas seguintes.
+
+    python manage.py consolidar_utilizacao                      # todo o histórico
+    python manage.py consolidar_utilizacao --inicio 2025-01-01 --fim 2025-12-31
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventos.utilizacao import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o consolidado semanal de uso das salas a partir dos agendamentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', help="Primeiro dia (AAAA-MM-DD). Padrão: primeiro agendamento.")
+        parser.add_argument('--fim', help="Último dia (AAAA-MM-DD). Padrão: último agendamento.")
+
+    def handle(self, *args, **options):
+        try:
+            inicio = date.fromisoformat(options['inicio']) if options['inicio'] else None
+            fim = date.fromisoformat(options['fim']) if options['fim'] else None
+        except ValueError:
+            raise CommandError("Data inválida. Use o formato AAAA-MM-DD.")
+        if inicio and fim and fim < inicio:
+            raise CommandError("A data final não pode ser anterior à inicial.")
+
+        comeco = time.monotonic()
+        total = reconstruir(inicio, fim)
+        duracao = (time.monotonic() - comeco) * 1000
+        self.stdout.write(self.style.SUCCESS(f"{total} linha(s) de consolidado gravada(s) em {duracao:.0f} ms."))
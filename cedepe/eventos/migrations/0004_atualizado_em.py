@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0003_alter_agendamento_unique_together_agendamento_salas_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agendamento',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
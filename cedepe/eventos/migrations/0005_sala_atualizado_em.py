@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0004_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sala',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0005_sala_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agendamento',
+            index=models.Index(fields=['inicio', 'fim'], name='agendamento_periodo_idx'),
+        ),
+    ]
@@ -0,0 +1,143 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+RESTRICAO = 'agendamento_sala_sem_conflito'
+# Conflitos listados na mensagem de erro
+MAXIMO_CONFLITOS_EXIBIDOS = 50
+
+
+def copiar_periodos(apps, schema_editor):
+    Agendamento = apps.get_model('eventos', 'Agendamento')
+    AgendamentoSala = apps.get_model('eventos', 'AgendamentoSala')
+    agendamento = Agendamento.objects.filter(pk=OuterRef('agendamento_id'))
+    AgendamentoSala.objects.update(
+        inicio=Subquery(agendamento.values('inicio')),
+        fim=Subquery(agendamento.values('fim')),
+    )
+
+
+def listar_conflitos(apps):
+    """ Linhas descrevendo as reservas de sala que já se sobrepõem (vazia se não houver). """
+    AgendamentoSala = apps.get_model('eventos', 'AgendamentoSala')
+    sobrepostas = AgendamentoSala.objects.filter(
+        sala_id=OuterRef('sala_id'), inicio__lt=OuterRef('fim'), fim__gt=OuterRef('inicio'),
+    ).exclude(pk=OuterRef('pk'))
+    conflitos = list(
+        AgendamentoSala.objects.filter(Exists(sobrepostas))
+        .order_by('sala_id', 'inicio')
+        .values_list('sala__nome', 'agendamento_id', 'inicio', 'fim')[:MAXIMO_CONFLITOS_EXIBIDOS + 1]
+    )
+    linhas = [
+        f"  sala {sala}: agendamento {agendamento_id} "
+        f"({timezone.localtime(inicio):%d/%m/%Y %H:%M} a {timezone.localtime(fim):%d/%m/%Y %H:%M})"
+        for sala, agendamento_id, inicio, fim in conflitos[:MAXIMO_CONFLITOS_EXIBIDOS]
+    ]
+    if len(conflitos) > MAXIMO_CONFLITOS_EXIBIDOS:
+        linhas.append("  ...")
+    return linhas
+
+
+def criar_restricao(apps, schema_editor):
+    """
+    PostgreSQL: restrição de exclusão (precisa de btree_gist para o '=' no
+    sala_id). SQLite: gatilhos com a mesma regra.
+
+    Se já houver agendamentos em conflito, a restrição não é criada e a
+    migração apenas os lista: a implantação não fica bloqueada por dados
+    antigos. O comando `conflitos_salas` (fase de release) resolve os
+    conflitos e cria a restrição depois.
+    """
+    conflitos = listar_conflitos(apps)
+    if conflitos:
+        print(
+            f"\n  Restrição {RESTRICAO} não criada: há agendamentos em conflito na mesma sala.\n"
+            "  Corrija-os ou rode `python manage.py conflitos_salas --corrigir`:\n" + "\n".join(conflitos)
+        )
+        return
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        schema_editor.execute(
+            f'ALTER TABLE eventos_agendamento_salas ADD CONSTRAINT {RESTRICAO} '
+            f"EXCLUDE USING gist (sala_id WITH =, tstzrange(inicio, fim, '[)') WITH &&)"
+        )
+    elif vendor == 'sqlite':
+        for operacao, outra_linha in (('INSERT', ''), ('UPDATE OF sala_id, inicio, fim', 'o.id <> NEW.id AND ')):
+            nome = f"{RESTRICAO}_{operacao.split()[0].lower()}"
+            schema_editor.execute(
+                f'CREATE TRIGGER {nome} BEFORE {operacao} ON eventos_agendamento_salas '
+                f'WHEN EXISTS (SELECT 1 FROM eventos_agendamento_salas o WHERE {outra_linha}'
+                f'o.sala_id = NEW.sala_id AND o.inicio < NEW.fim AND o.fim > NEW.inicio) '
+                f"BEGIN SELECT RAISE(ABORT, '{RESTRICAO}'); END"
+            )
+
+
+def remover_restricao(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'ALTER TABLE eventos_agendamento_salas DROP CONSTRAINT IF EXISTS {RESTRICAO}')
+    elif vendor == 'sqlite':
+        for nome in (f'{RESTRICAO}_insert', f'{RESTRICAO}_update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {nome}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0006_agendamento_periodo_idx'),
+    ]
+
+    operations = [
+        # A tabela da relação automática passa a ser o modelo AgendamentoSala
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='AgendamentoSala',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('agendamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='eventos.agendamento')),
+                        ('sala', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='eventos.sala')),
+                    ],
+                    options={
+                        'db_table': 'eventos_agendamento_salas',
+                        'unique_together': {('agendamento', 'sala')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='agendamento',
+                    name='salas',
+                    field=models.ManyToManyField(related_name='agendamentos', through='eventos.AgendamentoSala', to='eventos.sala'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='agendamentosala',
+            name='inicio',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='agendamentosala',
+            name='fim',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(copiar_periodos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='agendamentosala',
+            name='inicio',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='agendamentosala',
+            name='fim',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='agendamentosala',
+            index=models.Index(fields=['sala', 'inicio', 'fim'], name='agendamento_sala_periodo_idx'),
+        ),
+        migrations.RunPython(criar_restricao, remover_restricao),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0007_agendamento_sala'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieAgendamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequencia', models.CharField(choices=[('SEMANAL', 'Semanal'), ('MENSAL', 'Mensal')], default='SEMANAL', max_length=10)),
+                ('intervalo', models.PositiveSmallIntegerField(default=1, help_text='Repetir a cada quantas semanas/meses.')),
+                ('inicio', models.DateTimeField(help_text='Início da primeira ocorrência.')),
+                ('fim', models.DateTimeField(help_text='Fim da primeira ocorrência.')),
+                ('ate', models.DateField(blank=True, help_text='Última data em que pode haver ocorrência.', null=True)),
+                ('repeticoes', models.PositiveSmallIntegerField(blank=True, help_text='Quantidade de ocorrências.', null=True)),
+                ('participantes', models.CharField(blank=True, help_text='Insira os nomes dos participantes separados por vírgula (opcional).', max_length=255, null=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='eventos.evento')),
+                ('salas', models.ManyToManyField(related_name='series', to='eventos.sala')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='agendamento',
+            name='serie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='agendamentos', to='eventos.serieagendamento'),
+        ),
+    ]
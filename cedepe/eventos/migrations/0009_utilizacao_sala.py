@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0008_serie_agendamento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UtilizacaoSala',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semana', models.DateField(help_text='Segunda-feira da semana.')),
+                ('minutos', models.JSONField(default=list)),
+                ('total_minutos', models.PositiveIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('sala', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utilizacao', to='eventos.sala')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('semana', 'sala'), name='utilizacao_sala_semana_uniq')],
+            },
+        ),
+    ]
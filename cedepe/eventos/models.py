@@ -10,6 +10,7 @@ class Sala(models.Model):
     nome = models.CharField(max_length=100, unique=True)
     capacidade = models.PositiveIntegerField()
     localizacao = models.CharField(max_length=200, blank=True, null=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.nome} ({self.capacidade} pessoas)"
@@ -19,13 +20,48 @@ class Evento(models.Model):
     descricao = models.TextField(blank=True, null=True)
     organizador = models.CharField(max_length=100)
     data_criacao = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.titulo
 
+class SerieAgendamento(models.Model):
+    """
+    Regra de repetição de um agendamento (semanal ou mensal, até uma data ou
+    por um número de vezes). As ocorrências são Agendamentos ligados à série;
+    a criação e as alterações em lote ficam em eventos/series.py.
+    """
+    FREQUENCIAS = [
+        ('SEMANAL', 'Semanal'),
+        ('MENSAL', 'Mensal'),
+    ]
+
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='series')
+    salas = models.ManyToManyField(Sala, related_name='series')
+    frequencia = models.CharField(max_length=10, choices=FREQUENCIAS, default='SEMANAL')
+    intervalo = models.PositiveSmallIntegerField(default=1, help_text="Repetir a cada quantas semanas/meses.")
+    inicio = models.DateTimeField(help_text="Início da primeira ocorrência.")
+    fim = models.DateTimeField(help_text="Fim da primeira ocorrência.")
+    ate = models.DateField(blank=True, null=True, help_text="Última data em que pode haver ocorrência.")
+    repeticoes = models.PositiveSmallIntegerField(blank=True, null=True, help_text="Quantidade de ocorrências.")
+    participantes = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        help_text="Insira os nomes dos participantes separados por vírgula (opcional)."
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.evento.titulo} ({self.get_frequencia_display().lower()})"
+
 class Agendamento(models.Model):
     evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='agendamentos')
-    salas = models.ManyToManyField(Sala, related_name='agendamentos')
+    serie = models.ForeignKey(
+        SerieAgendamento, on_delete=models.CASCADE, blank=True, null=True, related_name='agendamentos'
+    )
+    salas = models.ManyToManyField(Sala, related_name='agendamentos', through='AgendamentoSala')
     inicio = models.DateTimeField()
     fim = models.DateTimeField()
     participantes = models.CharField(
@@ -34,6 +70,66 @@ class Agendamento(models.Model):
         null=True,
         help_text="Insira os nomes dos participantes separados por vírgula (opcional)."
     )
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Janela do calendário: inicio < fim da janela e fim > início da janela
+            models.Index(fields=['inicio', 'fim'], name='agendamento_periodo_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        novo = self._state.adding
+        super().save(*args, **kwargs)
+        if not novo:
+            # As salas guardam uma cópia do período, usada pela restrição de conflito do banco
+            AgendamentoSala.objects.filter(agendamento=self).exclude(inicio=self.inicio, fim=self.fim).update(
+                inicio=self.inicio, fim=self.fim
+            )
 
     def __str__(self):
         return f"{self.evento.titulo} ({self.inicio} - {self.fim})"
+
+class AgendamentoSala(models.Model):
+    """
+    Sala de um agendamento. O período é copiado do agendamento para que o banco
+    impeça dois agendamentos na mesma sala ao mesmo tempo (ver eventos/conflitos.py).
+    """
+    agendamento = models.ForeignKey(Agendamento, on_delete=models.CASCADE)
+    sala = models.ForeignKey(Sala, on_delete=models.CASCADE)
+    inicio = models.DateTimeField()
+    fim = models.DateTimeField()
+
+    class Meta:
+        # Mesma tabela da antiga relação automática
+        db_table = 'eventos_agendamento_salas'
+        unique_together = [('agendamento', 'sala')]
+        indexes = [
+            # Verificação de conflito: salas escolhidas com período sobreposto
+            models.Index(fields=['sala', 'inicio', 'fim'], name='agendamento_sala_periodo_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.inicio, self.fim = self.agendamento.inicio, self.agendamento.fim
+        super().save(*args, **kwargs)
+
+class UtilizacaoSala(models.Model):
+    """
+    Consolidado semanal de uso de uma sala, mantido por eventos/utilizacao.py.
+    `minutos` tem 168 valores (dia da semana x hora, segunda 0h primeiro):
+    minutos reservados em cada hora. Só existem linhas para semanas com uso;
+    não editar manualmente.
+    """
+    sala = models.ForeignKey(Sala, on_delete=models.CASCADE, related_name='utilizacao')
+    semana = models.DateField(help_text="Segunda-feira da semana.")
+    minutos = models.JSONField(default=list)
+    total_minutos = models.PositiveIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['semana', 'sala'], name='utilizacao_sala_semana_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.sala.nome} - semana de {self.semana:%d/%m/%Y}: {self.total_minutos / 60:.1f} h"
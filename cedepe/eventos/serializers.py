@@ -15,6 +15,7 @@ from django.utils.timezone import now, make_aware
 from rest_framework import serializers
 from .models import Agendamento
 from datetime import datetime
+from .conflitos import conflitos_salas, mensagens_conflito, salvar_agendamento
 
 class AgendamentoSerializer(serializers.ModelSerializer):
     salas = serializers.PrimaryKeyRelatedField(
@@ -56,20 +57,82 @@ class AgendamentoSerializer(serializers.ModelSerializer):
                     "inicio": "Não é possível agendar no passado."
                 })
 
-        # Validação de conflito para cada sala
-        if salas and inicio and fim:
-            for sala in salas:
-                conflitos = Agendamento.objects.filter(
-                    salas=sala,
-                    inicio__lt=fim,
-                    fim__gt=inicio
-                )
-                if self.instance:
-                    conflitos = conflitos.exclude(pk=self.instance.pk)
-                if conflitos.exists():
-                    raise serializers.ValidationError({
-                        "salas": f"Conflito de horário na sala '{sala.nome}'."
-                    })
+        # Conflitos em todas as salas, numa consulta; em PATCH, o que faltar vem do agendamento atual
+        if self.instance and {'inicio', 'fim', 'salas'} & set(data):
+            inicio = inicio or self.instance.inicio
+            fim = fim or self.instance.fim
+            if salas is None:
+                salas = list(self.instance.salas.all())
+        if salas and inicio and fim and inicio < fim:
+            conflitos = conflitos_salas(inicio, fim, salas, self.instance.pk if self.instance else None)
+            if conflitos:
+                raise serializers.ValidationError({"salas": mensagens_conflito(conflitos)})
 
         return data
 
+    def create(self, validated_data):
+        salas = validated_data.pop('salas', [])
+        agendamento = Agendamento(**validated_data)
+        salvar_agendamento(agendamento, salas)
+        return agendamento
+
+    def update(self, instance, validated_data):
+        salas = validated_data.pop('salas', None)
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        salvar_agendamento(instance, salas)
+        return instance
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from .models import SerieAgendamento
+from .series import validar_serie, verificar_periodos, criar_serie
+from .conflitos import ConflitoSala
+
+class SerieAgendamentoSerializer(serializers.ModelSerializer):
+    salas = serializers.PrimaryKeyRelatedField(
+        many=True, queryset=Sala.objects.all()
+    )
+    evento_titulo = serializers.CharField(source='evento.titulo', read_only=True)
+    ocorrencias = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SerieAgendamento
+        fields = '__all__'
+
+    def get_ocorrencias(self, obj):
+        # A listagem já traz a contagem anotada
+        total = getattr(obj, 'total_ocorrencias', None)
+        return obj.agendamentos.count() if total is None else total
+
+    def validate(self, data):
+        # Alterações passam por AlteracaoSerieSerializer; aqui só a criação
+        salas = data.get('salas')
+        serie = SerieAgendamento(**{campo: valor for campo, valor in data.items() if campo != 'salas'})
+        try:
+            periodos = validar_serie(serie)
+            verificar_periodos(periodos, salas)
+        except ConflitoSala as e:
+            raise serializers.ValidationError({"salas": e.messages})
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        return data
+
+    def create(self, validated_data):
+        salas = validated_data.pop('salas', [])
+        serie = SerieAgendamento(**validated_data)
+        criar_serie(serie, salas)
+        return serie
+
+
+class AlteracaoSerieSerializer(serializers.Serializer):
+    """ Campos que podem mudar em todas as ocorrências de uma vez. """
+    evento = serializers.PrimaryKeyRelatedField(queryset=Evento.objects.all(), required=False)
+    salas = serializers.PrimaryKeyRelatedField(many=True, queryset=Sala.objects.all(), required=False)
+    participantes = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    hora_inicio = serializers.TimeField(required=False)
+    hora_fim = serializers.TimeField(required=False)
+
+    def validate_salas(self, salas):
+        if not salas:
+            raise serializers.ValidationError("Escolha pelo menos uma sala.")
+        return salas
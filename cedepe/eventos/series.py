@@ -0,0 +1,266 @@
+# series.py
+"""
+Séries de agendamentos recorrentes.
+
+- criar_serie: expande a regra em ocorrências, verifica todas contra as
+  reservas existentes numa única consulta (conflitos_periodos) e grava com
+  bulk_create os agendamentos e as linhas de AgendamentoSala;
+- alterar_serie / cancelar_serie: aplicam-se à série toda ou às ocorrências
+  a partir de uma data, com UPDATE/DELETE em conjunto. "A partir de" divide
+  a série em duas.
+
+Mudanças de horário deslocam todas as ocorrências pela mesma diferença
+(F('inicio') + delta). bulk_create e update não passam pelos sinais, então o
+calendário e o consolidado de uso (utilizacao.py) são atualizados
+explicitamente. O cancelamento usa QuerySet.delete(): os sinais disparam por
+ocorrência, mas o calendário e o consolidado são refeitos uma vez, no commit
+(cedepe/transacao.py).
+"""
+import calendar
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .calendario import invalidar_calendario
+from .conflitos import ConflitoSala, conflitos_periodos, mensagens_conflito, violacao_conflito
+from .models import Agendamento, AgendamentoSala, SerieAgendamento
+from .utilizacao import atualizar_periodos
+
+MAXIMO_OCORRENCIAS = 200
+DURACAO_MAXIMA = timedelta(days=1)
+
+
+def _somar_meses(momento, meses):
+    """ Mesmo dia `meses` depois; em meses mais curtos, o último dia do mês. """
+    total = momento.month - 1 + meses
+    ano, mes = momento.year + total // 12, total % 12 + 1
+    return momento.replace(year=ano, month=mes, day=min(momento.day, calendar.monthrange(ano, mes)[1]))
+
+
+def ocorrencias(serie, limite=MAXIMO_OCORRENCIAS):
+    """
+    Períodos (inicio, fim) da série, em ordem. As datas são calculadas no
+    horário local: a ocorrência das 9h continua às 9h depois de mudança de fuso.
+    """
+    inicio = timezone.localtime(serie.inicio).replace(tzinfo=None)
+    duracao = serie.fim - serie.inicio
+    quantidade = min(serie.repeticoes or limite, limite)
+    periodos = []
+    while len(periodos) < quantidade:
+        passo = len(periodos) * serie.intervalo
+        if serie.frequencia == 'MENSAL':
+            momento = _somar_meses(inicio, passo)
+        else:
+            momento = inicio + timedelta(weeks=passo)
+        if serie.ate and momento.date() > serie.ate:
+            break
+        momento = timezone.make_aware(momento)
+        periodos.append((momento, momento + duracao))
+    return periodos
+
+
+def validar_serie(serie):
+    """ Levanta ValidationError (por campo) se a regra for inválida. Retorna as ocorrências. """
+    erros = {}
+    if serie.inicio and serie.fim:
+        if serie.fim <= serie.inicio:
+            erros['fim'] = "O término deve ser posterior ao início."
+        elif serie.fim - serie.inicio > DURACAO_MAXIMA:
+            erros['fim'] = "Cada ocorrência pode durar no máximo 24 horas."
+        if serie._state.adding and serie.inicio < timezone.now():
+            erros['inicio'] = "Não é possível agendar no passado."
+    if not serie.intervalo or serie.intervalo < 1:
+        erros['intervalo'] = "O intervalo deve ser de pelo menos 1."
+    if bool(serie.ate) == bool(serie.repeticoes):
+        erros['repeticoes'] = "Informe a data final ou a quantidade de repetições (apenas uma delas)."
+    elif serie.repeticoes and not 2 <= serie.repeticoes <= MAXIMO_OCORRENCIAS:
+        erros['repeticoes'] = f"A série deve ter entre 2 e {MAXIMO_OCORRENCIAS} ocorrências."
+    elif serie.ate and serie.inicio and serie.ate < timezone.localtime(serie.inicio).date():
+        erros['ate'] = "A data final não pode ser anterior à primeira ocorrência."
+    if erros:
+        raise ValidationError(erros)
+
+    periodos = ocorrencias(serie, MAXIMO_OCORRENCIAS + 1)
+    if len(periodos) > MAXIMO_OCORRENCIAS:
+        raise ValidationError({'ate': f"A série pode ter no máximo {MAXIMO_OCORRENCIAS} ocorrências."})
+    return periodos
+
+
+def verificar_periodos(periodos, salas, excluir_agendamentos=None):
+    """ Levanta ConflitoSala com uma mensagem por reserva em conflito com qualquer ocorrência. """
+    conflitos = conflitos_periodos(periodos, salas, excluir_agendamentos)
+    if conflitos:
+        raise ConflitoSala(mensagens_conflito(conflitos))
+
+
+def _traduzir_violacao(erro):
+    if not violacao_conflito(erro):
+        raise erro
+    raise ConflitoSala("Uma das salas acabou de ser reservada em uma das ocorrências.")
+
+
+def criar_serie(serie, salas):
+    """
+    Grava a série e todas as ocorrências. Uma consulta para os conflitos e um
+    INSERT em lote para agendamentos e outro para as salas.
+    """
+    salas = list(salas)
+    periodos = validar_serie(serie)
+    verificar_periodos(periodos, salas)
+    try:
+        with transaction.atomic():
+            serie.save()
+            serie.salas.set(salas)
+            agendamentos = Agendamento.objects.bulk_create([
+                Agendamento(
+                    evento_id=serie.evento_id, serie=serie, inicio=inicio, fim=fim,
+                    participantes=serie.participantes,
+                )
+                for inicio, fim in periodos
+            ])
+            AgendamentoSala.objects.bulk_create([
+                AgendamentoSala(agendamento=agendamento, sala=sala, inicio=agendamento.inicio, fim=agendamento.fim)
+                for agendamento in agendamentos
+                for sala in salas
+            ])
+            atualizar_periodos(periodos)
+    except IntegrityError as e:
+        serie.pk = None
+        serie._state.adding = True
+        _traduzir_violacao(e)
+    invalidar_calendario()
+    return agendamentos
+
+
+def _dividir(serie, a_partir_de):
+    """
+    Série que contém as ocorrências a partir de `a_partir_de` (None se não
+    houver nenhuma). Se houver ocorrências antes, elas ficam na série original
+    e as seguintes passam para uma cópia. Chamar dentro de transação.
+    """
+    seguintes = Agendamento.objects.filter(serie=serie, inicio__gte=a_partir_de)
+    primeira = seguintes.order_by('inicio').values_list('inicio', 'fim').first()
+    if primeira is None:
+        return None
+    anteriores = Agendamento.objects.filter(serie=serie, inicio__lt=a_partir_de).count()
+    if not anteriores:
+        return serie
+
+    salas = list(serie.salas.all())
+    nova = SerieAgendamento.objects.create(
+        evento_id=serie.evento_id, frequencia=serie.frequencia, intervalo=serie.intervalo,
+        inicio=primeira[0], fim=primeira[1], ate=serie.ate, participantes=serie.participantes,
+    )
+    nova.salas.set(salas)
+    movidas = seguintes.update(serie=nova, atualizado_em=timezone.now())
+    if serie.repeticoes:
+        serie.repeticoes, nova.repeticoes = anteriores, movidas
+        nova.save(update_fields=['repeticoes'])
+    else:
+        serie.ate = timezone.localtime(primeira[0]).date() - timedelta(days=1)
+    serie.save(update_fields=['repeticoes', 'ate', 'atualizado_em'])
+    return nova
+
+
+def alterar_serie(serie, a_partir_de=None, evento=None, participantes=None, salas=None,
+                  hora_inicio=None, hora_fim=None):
+    """
+    Altera todas as ocorrências da série, ou só as que começam a partir de
+    `a_partir_de` (datetime). Campos None ficam como estão. hora_inicio e
+    hora_fim (time) deslocam todas as ocorrências pela mesma diferença.
+    Retorna a série alterada (uma nova, se a original foi dividida).
+    """
+    try:
+        with transaction.atomic():
+            if a_partir_de is not None:
+                serie = _dividir(serie, a_partir_de)
+                if serie is None:
+                    return None
+            agendamentos = Agendamento.objects.filter(serie=serie)
+            reservas = AgendamentoSala.objects.filter(agendamento__serie=serie)
+
+            inicio = timezone.localtime(serie.inicio)
+            fim = timezone.localtime(serie.fim)
+            delta_inicio = delta_fim = timedelta(0)
+            if hora_inicio is not None:
+                delta_inicio = timezone.make_aware(datetime.combine(inicio.date(), hora_inicio)) - serie.inicio
+            if hora_fim is not None:
+                delta_fim = timezone.make_aware(datetime.combine(fim.date(), hora_fim)) - serie.fim
+            novo_inicio, novo_fim = serie.inicio + delta_inicio, serie.fim + delta_fim
+            if novo_fim <= novo_inicio:
+                raise ValidationError({'hora_fim': "O término deve ser posterior ao início."})
+            if novo_fim - novo_inicio > DURACAO_MAXIMA:
+                raise ValidationError({'hora_fim': "Cada ocorrência pode durar no máximo 24 horas."})
+
+            salas_atuais = list(serie.salas.all())
+            salas = salas_atuais if salas is None else list(salas)
+            if delta_inicio or delta_fim or set(salas) != set(salas_atuais):
+                anteriores = list(agendamentos.order_by('inicio').values_list('inicio', 'fim'))
+                periodos = [(i + delta_inicio, f + delta_fim) for i, f in anteriores]
+                if delta_inicio or delta_fim or set(salas) - set(salas_atuais):
+                    verificar_periodos(periodos, salas, excluir_agendamentos=agendamentos)
+                atualizar_periodos(anteriores + periodos)
+
+            agora = timezone.now()
+            campos = {'atualizado_em': agora}
+            if evento is not None:
+                campos['evento'] = serie.evento = evento
+            if participantes is not None:
+                campos['participantes'] = serie.participantes = participantes
+            if delta_inicio or delta_fim:
+                campos.update(inicio=F('inicio') + delta_inicio, fim=F('fim') + delta_fim)
+            agendamentos.update(**campos)
+
+            # Remove antes as salas desmarcadas, para o novo horário não conflitar por causa delas
+            reservas.exclude(sala__in=salas).delete()
+            if delta_inicio or delta_fim:
+                reservas.update(inicio=F('inicio') + delta_inicio, fim=F('fim') + delta_fim)
+            novas = [sala for sala in salas if sala not in salas_atuais]
+            if novas:
+                AgendamentoSala.objects.bulk_create([
+                    AgendamentoSala(agendamento_id=agendamento_id, sala=sala, inicio=i, fim=f)
+                    for agendamento_id, i, f in agendamentos.values_list('id', 'inicio', 'fim')
+                    for sala in novas
+                ])
+            if set(salas) != set(salas_atuais):
+                serie.salas.set(salas)
+
+            serie.inicio, serie.fim = novo_inicio, novo_fim
+            serie.save()
+    except IntegrityError as e:
+        _traduzir_violacao(e)
+    invalidar_calendario()
+    return serie
+
+
+def cancelar_serie(serie, a_partir_de=None):
+    """
+    Exclui todas as ocorrências (e a série) ou só as que começam a partir de
+    `a_partir_de`; nesse caso a série passa a terminar na véspera. Retorna
+    quantas ocorrências foram excluídas. As reservas de sala saem num DELETE
+    só (não têm sinais); os agendamentos, num DELETE depois de carregados
+    para os sinais de calendário e de uso.
+    """
+    with transaction.atomic():
+        canceladas = Agendamento.objects.filter(serie=serie)
+        if a_partir_de is not None:
+            canceladas = canceladas.filter(inicio__gte=a_partir_de)
+        periodos = list(canceladas.values_list('inicio', 'fim'))
+        restantes = Agendamento.objects.filter(serie=serie).count() - len(periodos)
+        if periodos:
+            AgendamentoSala.objects.filter(agendamento__in=canceladas).delete()
+            canceladas.delete()
+        if not restantes:
+            serie.delete()
+        elif periodos:
+            if serie.repeticoes:
+                serie.repeticoes = restantes
+            else:
+                # Véspera da primeira ocorrência cancelada, não de `a_partir_de`: pode haver
+                # ocorrência mantida no mesmo dia, antes desse horário
+                serie.ate = timezone.localtime(min(periodos)[0]).date() - timedelta(days=1)
+            serie.save(update_fields=['repeticoes', 'ate', 'atualizado_em'])
+    return len(periodos)
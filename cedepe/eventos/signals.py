@@ -0,0 +1,40 @@
+# signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from .calendario import invalidar_calendario
+from .models import Agendamento, Evento, Sala
+from .utilizacao import atualizar_periodos
+
+
+def guardar_periodo_anterior(sender, instance, **kwargs):
+    # O consolidado precisa recalcular também as semanas de onde o agendamento saiu
+    instance._periodo_anterior = None
+    if instance.pk and not instance._state.adding:
+        instance._periodo_anterior = Agendamento.objects.filter(pk=instance.pk).values_list('inicio', 'fim').first()
+
+
+def atualizar_utilizacao(sender, instance, **kwargs):
+    atualizar_periodos([(instance.inicio, instance.fim), getattr(instance, '_periodo_anterior', None) or (None, None)])
+
+
+def atualizar_utilizacao_salas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        atualizar_periodos([(instance.inicio, instance.fim)])
+    elif pk_set:
+        atualizar_periodos(Agendamento.objects.filter(pk__in=pk_set).values_list('inicio', 'fim'))
+
+
+def conectar():
+    # Cache das janelas do calendário
+    for modelo in (Sala, Evento, Agendamento):
+        post_save.connect(invalidar_calendario, sender=modelo, dispatch_uid=f'calendario_{modelo.__name__}_save')
+        post_delete.connect(invalidar_calendario, sender=modelo, dispatch_uid=f'calendario_{modelo.__name__}_delete')
+    m2m_changed.connect(invalidar_calendario, sender=Agendamento.salas.through, dispatch_uid='calendario_salas')
+
+    # Consolidado de uso das salas (utilizacao.py)
+    pre_save.connect(guardar_periodo_anterior, sender=Agendamento, dispatch_uid='utilizacao_agendamento_pre_save')
+    post_save.connect(atualizar_utilizacao, sender=Agendamento, dispatch_uid='utilizacao_agendamento_save')
+    post_delete.connect(atualizar_utilizacao, sender=Agendamento, dispatch_uid='utilizacao_agendamento_delete')
+    m2m_changed.connect(atualizar_utilizacao_salas, sender=Agendamento.salas.through, dispatch_uid='utilizacao_salas')
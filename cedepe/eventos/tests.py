@@ -1,3 +1,304 @@
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
 from django.test import TestCase
+from django.utils import timezone
+
+from .conflitos import NOME_RESTRICAO, ConflitoSala, restricao_existe, salvar_agendamento, violacao_conflito
+from .horarios_livres import buscar_horarios, intervalos_livres, janelas_expediente
+from .models import Agendamento, AgendamentoSala, Evento, Sala, SerieAgendamento, UtilizacaoSala
+from .series import alterar_serie, cancelar_serie, criar_serie, ocorrencias
+from .utilizacao import minutos_por_hora
+
+
+def momento(dia, hora, minuto=0, segundo=0):
+    return timezone.make_aware(datetime.combine(dia, time(hora, minuto, segundo)))
+
+
+def proxima_segunda():
+    """ Segunda-feira daqui a pelo menos uma semana: sempre no futuro. """
+    hoje = date.today()
+    return hoje + timedelta(days=7 - hoje.weekday() + 7)
+
+
+class ConflitoSalaTests(TestCase):
+    def setUp(self):
+        self.evento = Evento.objects.create(titulo='Formação', organizador='CEDEPE')
+        self.sala = Sala.objects.create(nome='Auditório', capacidade=50)
+        self.outra = Sala.objects.create(nome='Sala 1', capacidade=20)
+        self.dia = proxima_segunda()
+        self.primeiro = Agendamento(evento=self.evento, inicio=momento(self.dia, 10), fim=momento(self.dia, 11))
+        salvar_agendamento(self.primeiro, [self.sala])
+
+    def agendar(self, inicio, fim, salas):
+        agendamento = Agendamento(evento=self.evento, inicio=inicio, fim=fim)
+        salvar_agendamento(agendamento, salas)
+        return agendamento
+
+    def test_sobreposicao_na_mesma_sala(self):
+        with self.assertRaises(ConflitoSala) as contexto:
+            self.agendar(momento(self.dia, 10, 30), momento(self.dia, 11, 30), [self.outra, self.sala])
+        self.assertIn('Auditório', contexto.exception.messages[0])
+        self.assertEqual(Agendamento.objects.count(), 1)
+        self.assertEqual(AgendamentoSala.objects.count(), 1)
+
+    def test_periodos_encostados_e_outra_sala(self):
+        self.agendar(momento(self.dia, 11), momento(self.dia, 12), [self.sala])
+        self.agendar(momento(self.dia, 10, 30), momento(self.dia, 11, 30), [self.outra])
+        self.assertEqual(AgendamentoSala.objects.count(), 3)
+
+    def test_mover_agendamento_para_horario_ocupado(self):
+        segundo = self.agendar(momento(self.dia, 14), momento(self.dia, 15), [self.sala])
+        segundo.inicio, segundo.fim = momento(self.dia, 10, 45), momento(self.dia, 11, 45)
+        with self.assertRaises(ConflitoSala):
+            salvar_agendamento(segundo)
+        self.assertEqual(AgendamentoSala.objects.get(agendamento=segundo).inicio, momento(self.dia, 14))
+
+    def test_restricao_do_banco(self):
+        # Mesmo sem passar por salvar_agendamento, o banco recusa a sobreposição
+        outro = Agendamento.objects.create(evento=self.evento, inicio=momento(self.dia, 9), fim=momento(self.dia, 12))
+        with self.assertRaises(IntegrityError) as contexto, transaction.atomic():
+            AgendamentoSala.objects.create(agendamento=outro, sala=self.sala)
+        self.assertTrue(violacao_conflito(contexto.exception))
+
+        # Também em UPDATE: trocar a sala para uma já ocupada no período
+        AgendamentoSala.objects.create(agendamento=outro, sala=self.outra)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AgendamentoSala.objects.filter(agendamento=self.primeiro).update(sala=self.outra)
+
+
+class ConflitosAntigosTests(TestCase):
+    """ Base com reservas sobrepostas gravadas antes da restrição (migração 0007 sem a restrição). """
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            for operacao in ('insert', 'update'):
+                cursor.execute(f'DROP TRIGGER {NOME_RESTRICAO}_{operacao}')
+        evento = Evento.objects.create(titulo='Formação', organizador='CEDEPE')
+        self.sala = Sala.objects.create(nome='Auditório', capacidade=50)
+        self.outra = Sala.objects.create(nome='Sala 1', capacidade=20)
+        dia = proxima_segunda()
+        self.primeiro = Agendamento.objects.create(evento=evento, inicio=momento(dia, 10), fim=momento(dia, 12))
+        self.segundo = Agendamento.objects.create(evento=evento, inicio=momento(dia, 11), fim=momento(dia, 13))
+        AgendamentoSala.objects.create(agendamento=self.primeiro, sala=self.sala)
+        AgendamentoSala.objects.create(agendamento=self.segundo, sala=self.sala)
+        AgendamentoSala.objects.create(agendamento=self.segundo, sala=self.outra)
+
+    def executar(self, *args):
+        saida = StringIO()
+        call_command('conflitos_salas', *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_lista_sem_criar_a_restricao(self):
+        saida = self.executar()
+        self.assertIn(f'agendamento {self.segundo.pk}', saida)
+        self.assertFalse(restricao_existe())
+        self.assertEqual(AgendamentoSala.objects.count(), 3)
+
+    def test_corrigir_tira_a_sala_do_agendamento_posterior_e_cria_a_restricao(self):
+        saida = self.executar('--corrigir')
+        self.assertIn(f'Removida: Sala Auditório: agendamento {self.segundo.pk}', saida)
+        self.assertEqual(
+            sorted(AgendamentoSala.objects.values_list('agendamento_id', 'sala_id')),
+            sorted([(self.primeiro.pk, self.sala.pk), (self.segundo.pk, self.outra.pk)]),
+        )
+        self.assertTrue(restricao_existe())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AgendamentoSala.objects.create(agendamento=self.segundo, sala=self.sala)
+
+
+class HorariosLivresTests(TestCase):
+    def setUp(self):
+        self.dia = proxima_segunda()
+
+    def test_janelas_expediente(self):
+        janelas = janelas_expediente(self.dia, self.dia + timedelta(days=1), time(8), time(18))
+        self.assertEqual(janelas, [
+            (momento(self.dia, 8), momento(self.dia, 18)),
+            (momento(self.dia + timedelta(days=1), 8), momento(self.dia + timedelta(days=1), 18)),
+        ])
+
+    def test_intervalos_livres_junta_reservas_sobrepostas(self):
+        amanha = self.dia + timedelta(days=1)
+        janelas = janelas_expediente(self.dia, amanha, time(8), time(18))
+        ocupados = [
+            (momento(self.dia - timedelta(days=1), 9), momento(self.dia - timedelta(days=1), 10)),
+            (momento(self.dia, 9), momento(self.dia, 10)),
+            (momento(self.dia, 9, 30), momento(self.dia, 11)),
+            (momento(self.dia, 10), momento(self.dia, 10, 30)),
+            (momento(self.dia, 17), momento(amanha, 9)),
+        ]
+        self.assertEqual(intervalos_livres(ocupados, janelas), [
+            (momento(self.dia, 8), momento(self.dia, 9), momento(self.dia, 8)),
+            (momento(self.dia, 11), momento(self.dia, 17), momento(self.dia, 8)),
+            (momento(amanha, 9), momento(amanha, 18), momento(amanha, 8)),
+        ])
+
+    def test_intervalos_livres_sem_reservas(self):
+        janelas = janelas_expediente(self.dia, self.dia, time(8), time(18))
+        self.assertEqual(intervalos_livres([], janelas), [(momento(self.dia, 8), momento(self.dia, 18), momento(self.dia, 8))])
+
+    def test_buscar_horarios(self):
+        evento = Evento.objects.create(titulo='Reunião', organizador='CEDEPE')
+        pequena = Sala.objects.create(nome='Sala 1', capacidade=10)
+        grande = Sala.objects.create(nome='Sala 2', capacidade=30)
+        ocupado = Agendamento(evento=evento, inicio=momento(self.dia, 8), fim=momento(self.dia, 10, 15))
+        salvar_agendamento(ocupado, [pequena])
+
+        resultado = buscar_horarios(60, capacidade=5, inicio=self.dia, fim=self.dia)
+        self.assertEqual(
+            [(horario['sala']['id'], horario['inicio']) for horario in resultado['horarios']],
+            [(grande.id, momento(self.dia, 8)), (pequena.id, momento(self.dia, 10, 30))],
+        )
+        self.assertEqual(resultado['combinacoes'], [])
+
+        # Nenhuma sala comporta 35 pessoas: as duas juntas, a partir de quando ambas estão livres
+        resultado = buscar_horarios(60, capacidade=35, inicio=self.dia, fim=self.dia, max_salas=2)
+        self.assertEqual(resultado['horarios'], [])
+        combinacao = resultado['combinacoes'][0]
+        self.assertEqual([sala['id'] for sala in combinacao['salas']], [grande.id, pequena.id])
+        self.assertEqual(combinacao['capacidade_total'], 40)
+        self.assertEqual(combinacao['inicio'], momento(self.dia, 10, 30))
+        self.assertEqual(len(resultado['combinacoes']), 1)
+
+
+class MinutosPorHoraTests(TestCase):
+    def setUp(self):
+        self.segunda = proxima_segunda()
+
+    def test_minutos_truncados_e_sobreposicao_contada_uma_vez(self):
+        reservas = [
+            (1, momento(self.segunda, 9, 0, 30), momento(self.segunda, 10, 15, 59)),
+            (1, momento(self.segunda, 9, 30), momento(self.segunda, 9, 45)),
+        ]
+        resultado = minutos_por_hora(reservas, self.segunda, 1)
+        self.assertEqual(list(resultado), [(1, 0)])
+        vetor = resultado[1, 0]
+        self.assertEqual(len(vetor), 168)
+        self.assertEqual((vetor[9], vetor[10]), (60, 15))
+        self.assertEqual(vetor.sum(), 75)
+
+    def test_reserva_que_atravessa_a_semana(self):
+        domingo = self.segunda + timedelta(days=6)
+        reservas = [(2, momento(domingo, 23, 30), momento(domingo + timedelta(days=1), 0, 30))]
+        resultado = minutos_por_hora(reservas, self.segunda, 2)
+        self.assertEqual(sorted(resultado), [(2, 0), (2, 1)])
+        self.assertEqual((resultado[2, 0][167], resultado[2, 0].sum()), (30, 30))
+        self.assertEqual((resultado[2, 1][0], resultado[2, 1].sum()), (30, 30))
+        # Fora das semanas pedidas não entra
+        self.assertEqual(sorted(minutos_por_hora(reservas, self.segunda, 1)), [(2, 0)])
+
+    def test_sem_reservas(self):
+        self.assertEqual(minutos_por_hora([], self.segunda, 1), {})
+
+
+class SerieTests(TestCase):
+    def setUp(self):
+        # Roda já o que as gravações do setUp deixam para o commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento = Evento.objects.create(titulo='Curso', organizador='CEDEPE')
+            self.sala = Sala.objects.create(nome='Sala 1', capacidade=20)
+        self.segunda = proxima_segunda()
+
+    def nova_serie(self, **campos):
+        campos = {
+            'evento': self.evento, 'inicio': momento(self.segunda, 9), 'fim': momento(self.segunda, 10),
+            'repeticoes': 4, **campos,
+        }
+        return SerieAgendamento(**campos)
+
+    def semana(self, n):
+        return self.segunda + timedelta(weeks=n)
+
+    def horarios(self, serie):
+        return list(Agendamento.objects.filter(serie=serie).order_by('inicio').values_list('inicio', 'fim'))
+
+    def test_ocorrencias_mensais_no_fim_do_mes(self):
+        serie = SerieAgendamento(
+            frequencia='MENSAL', inicio=momento(date(2030, 1, 31), 9), fim=momento(date(2030, 1, 31), 10),
+            repeticoes=3,
+        )
+        self.assertEqual([inicio for inicio, _ in ocorrencias(serie)], [
+            momento(date(2030, 1, 31), 9), momento(date(2030, 2, 28), 9), momento(date(2030, 3, 31), 9),
+        ])
+
+    def test_ocorrencias_ate_uma_data(self):
+        serie = self.nova_serie(intervalo=2, repeticoes=None, ate=self.semana(5))
+        self.assertEqual([inicio for inicio, _ in ocorrencias(serie)], [
+            momento(self.semana(0), 9), momento(self.semana(2), 9), momento(self.semana(4), 9),
+        ])
+
+    def test_criar_serie(self):
+        serie = self.nova_serie()
+        criar_serie(serie, [self.sala])
+        self.assertEqual(self.horarios(serie), [(momento(self.semana(n), 9), momento(self.semana(n), 10)) for n in range(4)])
+        self.assertEqual(AgendamentoSala.objects.filter(sala=self.sala).count(), 4)
+
+    def test_criar_serie_com_conflito_nao_grava_nada(self):
+        salvar_agendamento(
+            Agendamento(evento=self.evento, inicio=momento(self.semana(2), 9, 30), fim=momento(self.semana(2), 11)),
+            [self.sala],
+        )
+        serie = self.nova_serie()
+        with self.assertRaises(ConflitoSala):
+            criar_serie(serie, [self.sala])
+        self.assertIsNone(serie.pk)
+        self.assertFalse(SerieAgendamento.objects.exists())
+        self.assertEqual(Agendamento.objects.count(), 1)
+
+    def test_alterar_a_partir_de_divide_e_desloca(self):
+        serie = self.nova_serie()
+        criar_serie(serie, [self.sala])
+
+        nova = alterar_serie(serie, a_partir_de=momento(self.semana(2), 0), hora_inicio=time(14), hora_fim=time(15, 30))
+        self.assertNotEqual(nova.pk, serie.pk)
+        serie.refresh_from_db()
+        self.assertEqual((serie.repeticoes, nova.repeticoes), (2, 2))
+        self.assertEqual(self.horarios(serie), [(momento(self.semana(n), 9), momento(self.semana(n), 10)) for n in range(2)])
+        self.assertEqual(self.horarios(nova), [(momento(self.semana(n), 14), momento(self.semana(n), 15, 30)) for n in (2, 3)])
+        self.assertEqual((nova.inicio, nova.fim), (momento(self.semana(2), 14), momento(self.semana(2), 15, 30)))
+        # O período copiado nas salas acompanha o agendamento
+        self.assertFalse(AgendamentoSala.objects.exclude(inicio=F('agendamento__inicio'), fim=F('agendamento__fim')).exists())
+
+    def test_alterar_para_horario_ocupado(self):
+        serie = self.nova_serie()
+        criar_serie(serie, [self.sala])
+        salvar_agendamento(
+            Agendamento(evento=self.evento, inicio=momento(self.semana(3), 14), fim=momento(self.semana(3), 15)),
+            [self.sala],
+        )
+        with self.assertRaises(ConflitoSala):
+            alterar_serie(serie, hora_inicio=time(14), hora_fim=time(15))
+        self.assertEqual(self.horarios(serie)[0], (momento(self.semana(0), 9), momento(self.semana(0), 10)))
+        self.assertEqual(SerieAgendamento.objects.count(), 1)
+
+    def test_cancelar_a_partir_de(self):
+        serie = self.nova_serie(repeticoes=None, ate=self.semana(3))
+        criar_serie(serie, [self.sala])
+        self.assertEqual(cancelar_serie(serie, a_partir_de=momento(self.semana(1), 12)), 2)
+        serie.refresh_from_db()
+        self.assertEqual(serie.ate, self.semana(2) - timedelta(days=1))
+        self.assertEqual(len(self.horarios(serie)), 2)
+        self.assertEqual(AgendamentoSala.objects.count(), 2)
+
+    def test_cancelar_tudo_exclui_a_serie(self):
+        serie = self.nova_serie()
+        criar_serie(serie, [self.sala])
+        pk = serie.pk
+        self.assertEqual(cancelar_serie(serie), 4)
+        self.assertFalse(SerieAgendamento.objects.filter(pk=pk).exists())
+        self.assertFalse(AgendamentoSala.objects.exists())
 
-# Create your tests here.
+    def test_cancelar_refaz_calendario_e_uso_uma_vez(self):
+        serie = self.nova_serie()
+        with self.captureOnCommitCallbacks(execute=True):
+            criar_serie(serie, [self.sala])
+        self.assertTrue(UtilizacaoSala.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            cancelar_serie(serie)
+        # Um callback para o calendário e um para o consolidado, não um por ocorrência
+        self.assertEqual(len(callbacks), 2)
+        self.assertFalse(UtilizacaoSala.objects.exists())
@@ -5,9 +5,12 @@ router = DefaultRouter()
 router.register(r'salas', views.SalaViewSet, basename='sala')
 router.register(r'eventos', views.EventoViewSet, basename='evento')
 router.register(r'agendamentos', views.AgendamentoViewSet, basename='agendamento')
+router.register(r'series', views.SerieAgendamentoViewSet, basename='serie')
 urlpatterns = [
     path('api/', include(router.urls)),
     path('api/fullcalendar/', views.FullCalendarEventsView.as_view(), name='fullcalendar-events'),
+    path('api/horarios-livres/', views.HorariosLivresView.as_view(), name='horarios_livres'),
+    path('api/utilizacao/', views.UtilizacaoSalasView.as_view(), name='utilizacao_salas'),
     
     path('dashboard_eventos/', views.dashboard, name='dashboard_eventos'),
    # Salas
@@ -26,6 +29,8 @@ urlpatterns = [
     # Agendamentos
     path('agendamentos/', views.gerenciar_agendamentos, name='gerenciar_agendamentos'),
     path('agendamentos/novo/', views.agendamento_form, name='agendamento_form'),
+    path('agendamentos/serie/nova/', views.serie_form, name='serie_form'),
+    path('agendamentos/exportar/', views.exportar_agendamentos, name='exportar_agendamentos'),
     path('agendamentos/editar/<int:pk>/', views.agendamento_form, name='editar_agendamento'),
     
 
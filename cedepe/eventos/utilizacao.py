@@ -0,0 +1,291 @@
+# utilizacao.py
+"""
+Consolidado de uso das salas (UtilizacaoSala).
+
+Para cada sala e semana guarda os minutos reservados em cada hora de cada
+dia da semana (7 x 24), calculados das reservas de sala (AgendamentoSala, que
+já têm o período copiado do agendamento). O cálculo é vetorizado com NumPy:
+cada reserva vira um +1 no minuto de início e um -1 no minuto de fim da
+linha (sala, semana) de uma matriz; a soma acumulada dá os minutos ocupados
+e um reshape (168 x 60) soma cada hora. Reservas sobrepostas na mesma sala
+contam uma vez só (tempo de sala ocupada).
+
+O consolidado é atualizado depois de cada commit que altera agendamentos,
+recalculando só as semanas afetadas (sinais em signals.py e chamadas
+explícitas nas gravações em lote de series.py). O comando
+`consolidar_utilizacao` reconstrói qualquer período do zero.
+
+As consultas de uso (resumo_utilizacao) leem só o consolidado: um ano de
+todas as salas são ~52 linhas por sala, independentemente do número de
+agendamentos.
+"""
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from cedepe.transacao import ao_confirmar
+
+from .horarios_livres import HORA_FIM_PADRAO, HORA_INICIO_PADRAO
+from .models import AgendamentoSala, Sala, UtilizacaoSala
+
+HORAS_SEMANA = 7 * 24
+MINUTOS_SEMANA = HORAS_SEMANA * 60
+# Semanas recalculadas por consulta na reconstrução completa
+SEMANAS_POR_BLOCO = 53
+# Linhas (sala, semana) da matriz de minutos montadas de cada vez (~10 MB)
+CHAVES_POR_LOTE = 256
+
+
+def segunda_feira(dia):
+    return dia - timedelta(days=dia.weekday())
+
+
+def semanas_periodo(inicio, fim):
+    """ Segundas-feiras das semanas (horário local) que o período [inicio, fim) toca. """
+    if fim <= inicio:
+        return []
+    semana = segunda_feira(timezone.localtime(inicio).date())
+    ultima = segunda_feira(timezone.localtime(fim - timedelta(microseconds=1)).date())
+    semanas = []
+    while semana <= ultima:
+        semanas.append(semana)
+        semana += timedelta(days=7)
+    return semanas
+
+
+def _limite(semana):
+    return timezone.make_aware(datetime.combine(semana, time.min))
+
+
+def minutos_por_hora(reservas, origem, semanas):
+    """
+    `reservas`: lista de (sala_id, inicio, fim). Retorna {(sala_id, índice da
+    semana a partir de `origem`): vetor de 168 minutos}, só das `semanas`
+    semanas a partir de `origem` (segunda-feira) e com algum uso.
+    """
+    if not reservas:
+        return {}
+    base = datetime.combine(origem, time.min)
+    minuto = timedelta(minutes=1)
+    total = semanas * MINUTOS_SEMANA
+    salas = np.array([sala_id for sala_id, _, _ in reservas], dtype=np.int64)
+    # Minutos (truncados) desde a origem no horário local: a hora do mapa de calor é a do relógio
+    inicios = np.array([(timezone.localtime(i).replace(tzinfo=None) - base) // minuto for _, i, _ in reservas])
+    fins = np.array([(timezone.localtime(f).replace(tzinfo=None) - base) // minuto for _, _, f in reservas])
+    inicios = np.clip(inicios, 0, total)
+    fins = np.clip(fins, 0, total)
+    validas = fins > inicios
+    salas, inicios, fins = salas[validas], inicios[validas], fins[validas]
+    if not len(salas):
+        return {}
+
+    # Reservas que atravessam a virada da semana viram um pedaço por semana
+    primeira = inicios // MINUTOS_SEMANA
+    pedacos = (fins - 1) // MINUTOS_SEMANA - primeira + 1
+    indice = np.repeat(np.arange(len(salas)), pedacos)
+    deslocamento = np.arange(len(indice)) - np.repeat(np.cumsum(pedacos) - pedacos, pedacos)
+    semana = primeira[indice] + deslocamento
+    comeco = semana * MINUTOS_SEMANA
+    inicio_pedaco = np.maximum(inicios[indice], comeco) - comeco
+    fim_pedaco = np.minimum(fins[indice], comeco + MINUTOS_SEMANA) - comeco
+
+    chaves, linha = np.unique(np.stack([salas[indice], semana], axis=1), axis=0, return_inverse=True)
+    linha = linha.reshape(-1)
+    resultado = {}
+    for lote in range(0, len(chaves), CHAVES_POR_LOTE):
+        no_lote = (linha >= lote) & (linha < lote + CHAVES_POR_LOTE)
+        variacao = np.zeros((min(CHAVES_POR_LOTE, len(chaves) - lote), MINUTOS_SEMANA + 1), dtype=np.int32)
+        np.add.at(variacao, (linha[no_lote] - lote, inicio_pedaco[no_lote]), 1)
+        np.add.at(variacao, (linha[no_lote] - lote, fim_pedaco[no_lote]), -1)
+        ocupado = np.cumsum(variacao[:, :-1], axis=1) > 0
+        minutos = ocupado.reshape(-1, HORAS_SEMANA, 60).sum(axis=2)
+        for (sala_id, indice_semana), vetor in zip(chaves[lote:lote + CHAVES_POR_LOTE].tolist(), minutos):
+            resultado[sala_id, indice_semana] = vetor
+    return resultado
+
+
+def calcular(inicio, fim):
+    """
+    Consolidado das semanas de `inicio` a `fim` (segundas-feiras, inclusive)
+    direto das reservas de sala. Retorna UtilizacaoSala não salvas.
+    """
+    semanas = (fim - inicio).days // 7 + 1
+    reservas = AgendamentoSala.objects.filter(
+        inicio__lt=_limite(fim + timedelta(days=7)), fim__gt=_limite(inicio)
+    ).order_by().values_list('sala_id', 'inicio', 'fim')
+    return [
+        UtilizacaoSala(
+            sala_id=sala_id,
+            semana=inicio + timedelta(weeks=indice),
+            minutos=vetor.tolist(),
+            total_minutos=int(vetor.sum()),
+        )
+        for (sala_id, indice), vetor in sorted(minutos_por_hora(list(reservas), inicio, semanas).items())
+    ]
+
+
+@transaction.atomic
+def recalcular(inicio, fim):
+    """ Substitui o consolidado das semanas de `inicio` a `fim` (segundas-feiras, inclusive). """
+    UtilizacaoSala.objects.filter(semana__gte=inicio, semana__lte=fim).delete()
+    return UtilizacaoSala.objects.bulk_create(calcular(inicio, fim), batch_size=1000)
+
+
+def atualizar_semanas(semanas):
+    """ Recalcula as semanas informadas, uma consulta por sequência de semanas seguidas. """
+    semanas = sorted(set(semanas))
+    while semanas:
+        fim = 0
+        while fim + 1 < len(semanas) and semanas[fim + 1] - semanas[fim] == timedelta(days=7):
+            fim += 1
+        recalcular(semanas[0], semanas[fim])
+        semanas = semanas[fim + 1:]
+
+
+def atualizar_periodos(periodos):
+    """
+    Marca as semanas tocadas pelos períodos (inicio, fim) antigos e novos de
+    agendamentos alterados. O recálculo roda uma vez, depois do commit, com
+    todas as semanas marcadas na transação (exclusões em cascata de uma série
+    marcam várias vezes e recalculam uma só).
+    """
+    semanas = {semana for inicio, fim in periodos if inicio and fim for semana in semanas_periodo(inicio, fim)}
+    if not semanas:
+        return
+    # robust: uma falha aqui não derruba a requisição que já gravou; `consolidar_utilizacao` corrige
+    ao_confirmar(atualizar_semanas, semanas)
+
+
+def reconstruir(inicio=None, fim=None):
+    """
+    Reconstrói o consolidado das semanas de `inicio` a `fim` (datas) em blocos.
+    Sem datas, reconstrói todo o histórico e apaga linhas fora dele.
+    """
+    limites = AgendamentoSala.objects.aggregate(primeiro=Min('inicio'), ultimo=Max('fim'))
+    if inicio is None and fim is None:
+        if limites['primeiro'] is None:
+            UtilizacaoSala.objects.all().delete()
+            return 0
+        semanas = semanas_periodo(limites['primeiro'], limites['ultimo'])
+        UtilizacaoSala.objects.exclude(semana__gte=semanas[0], semana__lte=semanas[-1]).delete()
+    if limites['primeiro'] is None:
+        return 0
+    inicio = segunda_feira(inicio or timezone.localtime(limites['primeiro']).date())
+    fim = segunda_feira(fim or timezone.localtime(limites['ultimo']).date())
+
+    total = 0
+    bloco_inicio = inicio
+    while bloco_inicio <= fim:
+        bloco_fim = min(bloco_inicio + timedelta(weeks=SEMANAS_POR_BLOCO - 1), fim)
+        total += len(recalcular(bloco_inicio, bloco_fim))
+        bloco_inicio = bloco_fim + timedelta(days=7)
+    return total
+
+
+DIAS_SEMANA = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+# Até dois anos por consulta: salas x ~105 semanas de linhas
+DIAS_MAXIMO = 731
+
+
+def resumo_utilizacao(inicio, fim, salas=None, agrupar='semana',
+                      hora_inicio=HORA_INICIO_PADRAO.hour, hora_fim=HORA_FIM_PADRAO.hour):
+    """
+    Uso das salas de `inicio` a `fim` (datas, inclusive) lido só do
+    consolidado: horas reservadas por sala e por dia ou semana, taxa de uso no
+    expediente (hora_inicio às hora_fim, todos os dias do período) e o mapa de
+    calor dia da semana x hora. Duas consultas (salas e consolidado).
+    """
+    salas_consulta = Sala.objects.order_by('nome').only('nome', 'capacidade')
+    if salas:
+        salas_consulta = salas_consulta.filter(pk__in=salas)
+    salas = list(salas_consulta)
+    posicao = {sala.id: i for i, sala in enumerate(salas)}
+
+    primeira = segunda_feira(inicio)
+    semanas = (segunda_feira(fim) - primeira).days // 7 + 1
+    # Matriz sala x dia x hora de todas as semanas tocadas; dias fora do período são zerados
+    minutos = np.zeros((len(salas), semanas, 7, 24), dtype=np.int64)
+    linhas = UtilizacaoSala.objects.filter(
+        sala_id__in=list(posicao), semana__gte=primeira, semana__lte=fim
+    ).values_list('sala_id', 'semana', 'minutos')
+    linhas = list(linhas)
+    if linhas:
+        indices_sala = np.array([posicao[sala_id] for sala_id, _, _ in linhas])
+        indices_semana = np.array([(semana - primeira).days // 7 for _, semana, _ in linhas])
+        minutos[indices_sala, indices_semana] = np.array([vetor for _, _, vetor in linhas]).reshape(-1, 7, 24)
+
+    datas = np.arange(np.datetime64(primeira, 'D'), np.datetime64(primeira, 'D') + semanas * 7).reshape(semanas, 7)
+    no_periodo = (datas >= np.datetime64(inicio, 'D')) & (datas <= np.datetime64(fim, 'D'))
+    minutos *= no_periodo[None, :, :, None]
+    dias = int(no_periodo.sum())
+
+    if agrupar == 'dia':
+        periodos = [str(data) for data in datas[no_periodo]]
+        horas = minutos.sum(axis=3).reshape(len(salas), -1)[:, no_periodo.reshape(-1)] / 60
+    else:
+        periodos = [str(data) for data in datas[:, 0]]
+        horas = minutos.sum(axis=(2, 3)) / 60
+
+    expediente = minutos[..., hora_inicio:hora_fim].sum(axis=(1, 2, 3))
+    capacidade_expediente = dias * (hora_fim - hora_inicio) * 60
+    # Quantas vezes cada dia da semana aparece no período, para a taxa do mapa de calor
+    ocorrencias_dia = no_periodo.sum(axis=0)
+    mapa = minutos.sum(axis=(0, 1))
+    disponivel = ocorrencias_dia[:, None] * len(salas) * 60
+    taxa_mapa = np.divide(100 * mapa, disponivel, out=np.zeros(mapa.shape), where=disponivel > 0)
+
+    return {
+        'inicio': inicio,
+        'fim': fim,
+        'agrupar': agrupar,
+        'expediente': {'hora_inicio': hora_inicio, 'hora_fim': hora_fim},
+        'salas': [
+            {
+                'id': sala.id,
+                'nome': sala.nome,
+                'capacidade': sala.capacidade,
+                'horas_reservadas': round(float(horas[i].sum()), 2),
+                'taxa_expediente': round(100 * float(expediente[i]) / capacidade_expediente, 1) if capacidade_expediente else 0,
+            }
+            for i, sala in enumerate(salas)
+        ],
+        'serie': {
+            'periodos': periodos,
+            'horas': {sala.id: np.round(horas[i], 2).tolist() for i, sala in enumerate(salas)},
+        },
+        'mapa_calor': {
+            'dias': DIAS_SEMANA,
+            'horas': list(range(24)),
+            'horas_reservadas': np.round(mapa / 60, 2).tolist(),
+            'taxa': np.round(taxa_mapa, 1).tolist(),
+        },
+    }
+
+
+def ler_parametros(dados):
+    """ Valida os parâmetros da API; retorna os argumentos de resumo_utilizacao ou levanta ValueError. """
+    def dia(nome, padrao):
+        valor = dados.get(nome)
+        if not valor:
+            return padrao
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            raise ValueError(f"Parâmetro '{nome}' inválido. Use AAAA-MM-DD.")
+
+    fim = dia('fim', timezone.localdate())
+    inicio = dia('inicio', fim - timedelta(weeks=12) + timedelta(days=1))
+    if fim < inicio:
+        raise ValueError("A data final não pode ser anterior à data inicial.")
+    if (fim - inicio).days >= DIAS_MAXIMO:
+        raise ValueError(f"O período pode ter no máximo {DIAS_MAXIMO} dias.")
+    agrupar = dados.get('agrupar') or 'semana'
+    if agrupar not in ('dia', 'semana'):
+        raise ValueError("Parâmetro 'agrupar' deve ser 'dia' ou 'semana'.")
+    salas = [valor for item in dados.getlist('sala') for valor in item.split(',') if valor]
+    if not all(valor.isdigit() for valor in salas):
+        raise ValueError("Parâmetro 'sala' deve conter ids numéricos.")
+    return {'inicio': inicio, 'fim': fim, 'salas': [int(valor) for valor in salas], 'agrupar': agrupar}
@@ -2,6 +2,7 @@ from django.shortcuts import render, get_object_or_404, redirect
 from rest_framework import viewsets, filters
 from django_filters.rest_framework import DjangoFilterBackend
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from cedepe.paginacao import KeysetPaginator, PaginadorContagemRapida
 from django.http import JsonResponse
 from .models import Sala, Evento, Agendamento
 from .forms import SalaForm, EventoForm, AgendamentoForm
@@ -23,7 +24,7 @@ def gerenciar_salas(request):
             Q(localizacao__icontains=query)
         )
     
-    paginator = Paginator(salas_list, ITENS_POR_PAGINA)
+    paginator = PaginadorContagemRapida(salas_list, ITENS_POR_PAGINA)
     
     try:
         salas = paginator.page(page_number)
@@ -67,7 +68,7 @@ def gerenciar_eventos(request):
             Q(organizador__icontains=query)
         )
     
-    paginator = Paginator(eventos_list, ITENS_POR_PAGINA)
+    paginator = PaginadorContagemRapida(eventos_list, ITENS_POR_PAGINA)
     
     try:
         eventos = paginator.page(page_number)
@@ -108,27 +109,28 @@ def evento_form(request, pk=None):
 from django.db.models import Q
 
 # Views para Agendamentos
-def gerenciar_agendamentos(request):
-    query = request.GET.get('q', '')
-    filter_by = request.GET.get('filter_by', 'all')
-    page_number = request.GET.get('page')
-
-    agendamentos_list = Agendamento.objects.all()
-    
+def filtrar_agendamentos(agendamentos_list, params):
+    """ Filtros da listagem de agendamentos (também usados na exportação em CSV). """
+    query = params.get('q', '')
     if query:
         agendamentos_list = agendamentos_list.filter(
             Q(evento__titulo__icontains=query) |
             Q(salas__nome__icontains=query)  # <-- Correção aqui
         ).distinct()
-    
-    paginator = Paginator(agendamentos_list, ITENS_POR_PAGINA)
-    
-    try:
-        agendamentos = paginator.page(page_number)
-    except PageNotAnInteger:
-        agendamentos = paginator.page(1)
-    except EmptyPage:
-        agendamentos = paginator.page(paginator.num_pages)
+    return agendamentos_list
+
+
+def gerenciar_agendamentos(request):
+    query = request.GET.get('q', '')
+    filter_by = request.GET.get('filter_by', 'all')
+
+    agendamentos_list = filtrar_agendamentos(
+        Agendamento.objects.select_related('evento').prefetch_related('salas'), request.GET
+    )
+
+    # Paginação por chave: páginas profundas custam o mesmo que a primeira
+    paginator = KeysetPaginator(agendamentos_list, ITENS_POR_PAGINA, ['-inicio', 'id'])
+    agendamentos = paginator.page(request.GET.get('cursor'))
 
     context = {
         'agendamentos': agendamentos,
@@ -142,6 +144,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
 from .models import Agendamento
 from .forms import AgendamentoForm
+from .conflitos import ConflitoSala
 
 def agendamento_form(request, pk=None):
     agendamento = get_object_or_404(Agendamento, pk=pk) if pk else None
@@ -149,8 +152,13 @@ def agendamento_form(request, pk=None):
     if request.method == 'POST':
         form = AgendamentoForm(request.POST, instance=agendamento)
         if form.is_valid():
-            form.save()
-            return redirect('dashboard_eventos')
+            try:
+                form.save()
+                return redirect('dashboard_eventos')
+            except ConflitoSala as e:
+                # Outra requisição reservou a sala entre a validação e a gravação
+                for mensagem in e.messages:
+                    messages.error(request, mensagem)
         else:
             # Adiciona mensagens de erro para cada campo inválido
             for field, errors in form.errors.items():
@@ -167,25 +175,50 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from .models import Sala, Evento, Agendamento
 from .serializers import SalaSerializer, EventoSerializer, AgendamentoSerializer
+from cedepe.condicional import RespostaCondicionalMixin
+from rest_framework.exceptions import APIException
+
+class ConflitoAgendamento(APIException):
+    """ 409: outra requisição reservou uma das salas no mesmo horário. """
+    status_code = 409
+    default_detail = 'Uma das salas já está reservada nesse horário.'
+    default_code = 'conflito'
 
-class SalaViewSet(viewsets.ModelViewSet):
+class SalaViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     queryset = Sala.objects.all()
     serializer_class = SalaSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['nome', 'localizacao']
+    keyset_ordering = ['nome', 'id']
 
-class EventoViewSet(viewsets.ModelViewSet):
+class EventoViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     queryset = Evento.objects.all()
     serializer_class = EventoSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['titulo', 'organizador']
+    keyset_ordering = ['-data_criacao', 'id']
 
-class AgendamentoViewSet(viewsets.ModelViewSet):
-    queryset = Agendamento.objects.all()
+class AgendamentoViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
+    queryset = Agendamento.objects.select_related('evento').prefetch_related('salas')
     serializer_class = AgendamentoSerializer
+    campos_versao = ['atualizado_em', 'evento__atualizado_em', 'salas__atualizado_em']
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['salas', 'evento']
     search_fields = ['evento__descricao']
+    keyset_ordering = ['-inicio', 'id']
+
+    def perform_create(self, serializer):
+        # O serializer já verificou conflitos; aqui só chega a corrida barrada pelo banco
+        try:
+            serializer.save()
+        except ConflitoSala as e:
+            raise ConflitoAgendamento(e.messages)
+
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except ConflitoSala as e:
+            raise ConflitoAgendamento(e.messages)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -260,31 +293,47 @@ from rest_framework import permissions
 from django.utils import timezone
 from .models import Agendamento
 from django.utils import timezone
-
-class FullCalendarEventsView(APIView):
+import hashlib
+from .calendario import eventos_calendario, geracao, ler_data
+
+class FullCalendarEventsView(RespostaCondicionalMixin, APIView):
+    """
+    Eventos do calendário na janela visível.
+    GET /eventos/api/fullcalendar/?start=<ISO 8601>&end=<ISO 8601>[&sala=<id>[,<id>...]]
+    """
     permission_classes = [permissions.AllowAny]
 
+    def parametros(self, request):
+        """ (inicio, fim, salas) da query string ou levanta ValueError. """
+        inicio = ler_data(request.query_params.get('start'), 'start')
+        fim = ler_data(request.query_params.get('end'), 'end')
+        if inicio and fim and fim <= inicio:
+            raise ValueError("'end' deve ser posterior a 'start'.")
+        salas = [
+            sala.strip() for valor in request.query_params.getlist('sala') for sala in valor.split(',') if sala.strip()
+        ]
+        if not all(sala.isdigit() for sala in salas):
+            raise ValueError("Parâmetro 'sala' deve ser numérico.")
+        return inicio, fim, sorted({int(sala) for sala in salas})
+
+    def versao_resposta(self, request):
+        # A geração do cache do calendário já muda a cada alteração: o ETag não precisa consultar o banco
+        extra = (geracao(), request.get_full_path(), getattr(request, 'accepted_media_type', None))
+        return None, hashlib.md5(repr(extra).encode(), usedforsecurity=False).hexdigest()
+
     def get(self, request, format=None):
-        agendamentos = Agendamento.objects.all()
-        events = [{
-            'id': agendamento.id,
-            'title': agendamento.evento.titulo,
-            'start': timezone.localtime(agendamento.inicio).isoformat(),
-            'end': timezone.localtime(agendamento.fim).isoformat(),
-            'extendedProps': {
-                'salas': [sala.nome for sala in agendamento.salas.all()],
-                'descricao': agendamento.evento.descricao,
-                'horario': f"{timezone.localtime(agendamento.inicio).strftime('%H:%M')} - {timezone.localtime(agendamento.fim).strftime('%H:%M')}"
-            }
-        } for agendamento in agendamentos]
-        return Response(events)
+        try:
+            inicio, fim, salas = self.parametros(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(eventos_calendario(inicio, fim, salas))
 
     
 from django.db.models.functions import ExtractYear    
 from django.shortcuts import render
-from django.http import HttpResponse
 from datetime import datetime
 from .models import Evento, Agendamento
+from cedepe.relatorios import pagina_relatorio, versao_dados
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
@@ -294,130 +343,122 @@ from reportlab.platypus import Paragraph  # Import corrigido aqui
 
 
 
-def eventos_report_pdf(request):
-    if request.method == 'POST':
-        tipo_filtro = request.POST.get('tipo_filtro')
-        data_inicio = data_fim = None
-
-        if tipo_filtro == 'mes':
-            mes = int(request.POST.get('mes'))
-            ano = int(request.POST.get('ano'))
-            data_inicio = datetime(ano, mes, 1)
-            if mes == 12:
-                data_fim = datetime(ano + 1, 1, 1)
-            else:
-                data_fim = datetime(ano, mes + 1, 1)
-        elif tipo_filtro == 'periodo':
-            data_inicio = datetime.strptime(request.POST.get('data_inicio'), '%Y-%m-%d')
-            data_fim = datetime.strptime(request.POST.get('data_fim'), '%Y-%m-%d')
-
-        agendamentos = Agendamento.objects.filter(inicio__gte=data_inicio, fim__lte=data_fim).order_by('inicio')
-
-        # Geração do PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="relatorio_eventos_{datetime.now().date()}.pdf"'
-
-        styles = {
-            'title': ParagraphStyle(
-                name='Title',
-                fontSize=16,
-                leading=18,
-                textColor=HexColor('#2c3e50'),
-                fontName='Helvetica-Bold',
-                spaceAfter=12
-            ),
-            'header': ParagraphStyle(
-                name='Header',
-                fontSize=10,
-                textColor=HexColor('#7f8c8d'),
-                fontName='Helvetica',
-                spaceAfter=15
-            ),
-            'event_title': ParagraphStyle(
-                name='EventTitle',
-                fontSize=12,
-                textColor=HexColor('#2c3e50'),
-                fontName='Helvetica-Bold',
-                spaceAfter=6
-            ),
-            'detail': ParagraphStyle(
-                name='Detail',
-                fontSize=10,
-                textColor=HexColor('#34495e'),
-                fontName='Helvetica',
-                leading=12,
-                spaceAfter=8
-            )
-        }
-
-        p = canvas.Canvas(response, pagesize=A4)
-        width, height = A4
-        margin = 2 * cm
-        line_height = 0.7 * cm
-        max_width = width - 2 * margin
-
-        # Cabeçalho
-        title = Paragraph("Relatório de Eventos e Agendamentos", styles['title'])
-        title.wrapOn(p, width, height)
-        title.drawOn(p, margin, height - margin)
-
-        period_text = f"Período: {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
-        period = Paragraph(period_text, styles['header'])
-        period.wrapOn(p, width, height)
-        period.drawOn(p, margin, height - margin - 1.2*cm)
-
-        y = height - margin - 3*cm
-        for agendamento in agendamentos:
-            if y < 6 * cm:  # Mais espaço reservado para "card"
-                p.showPage()
-                y = height - margin
-                title.drawOn(p, margin, height - margin)
-                period.drawOn(p, margin, height - margin - 1.2*cm)
-                y -= 2*cm
-
-            evento = agendamento.evento
-
-            # Define cor de fundo com base na hora
-            hora_inicio = agendamento.inicio.hour
-            if hora_inicio < 12:
-                bg_color = HexColor('#dff9fb')  # manhã
-            elif hora_inicio < 18:
-                bg_color = HexColor('#f6e58d')  # tarde
-            else:
-                bg_color = HexColor('#ffbe76')  # noite
-
-            card_height = 5 * cm
-            card_width = max_width
-
-            # Desenha o retângulo (card)
-            p.setFillColor(bg_color)
-            p.roundRect(margin, y - card_height, card_width, card_height, 10, fill=True, stroke=False)
-
-            # Adiciona título do evento
-            event_title = Paragraph(f"<b>Evento:</b> {evento.titulo}", styles['event_title'])
-            event_title.wrapOn(p, card_width - 1*cm, line_height)
-            event_title.drawOn(p, margin + 0.5*cm, y - 0.8*cm)
-
-            # Detalhes do agendamento
-            details = [
-            f"<b>Início:</b> {agendamento.inicio.strftime('%d/%m/%Y %H:%M')} | Fim:</b> {agendamento.fim.strftime('%d/%m/%Y %H:%M')}",
-            f"<b>Organizador:</b> {evento.organizador} | ",
-            f"<b>Participantes:</b> {agendamento.participantes or 'Não informado'}",
-            f"<b>Salas:</b> {', '.join([s.nome for s in agendamento.salas.all()])}"
-        ]
+def consulta_agendamentos(data_inicio, data_fim):
+    return Agendamento.objects.filter(inicio__gte=data_inicio, fim__lte=data_fim)
+
+
+def versao_eventos(data_inicio, data_fim):
+    return versao_dados(consulta_agendamentos(data_inicio, data_fim), 'atualizado_em', 'evento__atualizado_em')
+
+
+def gerar_pdf_eventos(arquivo, data_inicio, data_fim):
+    agendamentos = consulta_agendamentos(data_inicio, data_fim).select_related('evento').prefetch_related(
+        'salas'
+    ).order_by('inicio')
+
+    styles = {
+        'title': ParagraphStyle(
+            name='Title',
+            fontSize=16,
+            leading=18,
+            textColor=HexColor('#2c3e50'),
+            fontName='Helvetica-Bold',
+            spaceAfter=12
+        ),
+        'header': ParagraphStyle(
+            name='Header',
+            fontSize=10,
+            textColor=HexColor('#7f8c8d'),
+            fontName='Helvetica',
+            spaceAfter=15
+        ),
+        'event_title': ParagraphStyle(
+            name='EventTitle',
+            fontSize=12,
+            textColor=HexColor('#2c3e50'),
+            fontName='Helvetica-Bold',
+            spaceAfter=6
+        ),
+        'detail': ParagraphStyle(
+            name='Detail',
+            fontSize=10,
+            textColor=HexColor('#34495e'),
+            fontName='Helvetica',
+            leading=12,
+            spaceAfter=8
+        )
+    }
+
+    p = canvas.Canvas(arquivo, pagesize=A4)
+    width, height = A4
+    margin = 2 * cm
+    line_height = 0.7 * cm
+    max_width = width - 2 * margin
+
+    # Cabeçalho
+    title = Paragraph("Relatório de Eventos e Agendamentos", styles['title'])
+    title.wrapOn(p, width, height)
+    title.drawOn(p, margin, height - margin)
+
+    period_text = f"Período: {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
+    period = Paragraph(period_text, styles['header'])
+    period.wrapOn(p, width, height)
+    period.drawOn(p, margin, height - margin - 1.2*cm)
+
+    y = height - margin - 3*cm
+    for agendamento in agendamentos:
+        if y < 6 * cm:  # Mais espaço reservado para "card"
+            p.showPage()
+            y = height - margin
+            title.drawOn(p, margin, height - margin)
+            period.drawOn(p, margin, height - margin - 1.2*cm)
+            y -= 2*cm
+
+        evento = agendamento.evento
+
+        # Define cor de fundo com base na hora
+        hora_inicio = agendamento.inicio.hour
+        if hora_inicio < 12:
+            bg_color = HexColor('#dff9fb')  # manhã
+        elif hora_inicio < 18:
+            bg_color = HexColor('#f6e58d')  # tarde
+        else:
+            bg_color = HexColor('#ffbe76')  # noite
+
+        card_height = 5 * cm
+        card_width = max_width
+
+        # Desenha o retângulo (card)
+        p.setFillColor(bg_color)
+        p.roundRect(margin, y - card_height, card_width, card_height, 10, fill=True, stroke=False)
+
+        # Adiciona título do evento
+        event_title = Paragraph(f"<b>Evento:</b> {evento.titulo}", styles['event_title'])
+        event_title.wrapOn(p, card_width - 1*cm, line_height)
+        event_title.drawOn(p, margin + 0.5*cm, y - 0.8*cm)
+
+        # Detalhes do agendamento
+        details = [
+        f"<b>Início:</b> {agendamento.inicio.strftime('%d/%m/%Y %H:%M')} | <b>Fim:</b> {agendamento.fim.strftime('%d/%m/%Y %H:%M')}",
+        f"<b>Organizador:</b> {evento.organizador} | ",
+        f"<b>Participantes:</b> {agendamento.participantes or 'Não informado'}",
+        f"<b>Salas:</b> {', '.join([s.nome for s in agendamento.salas.all()])}"
+    ]
 
-            text_y = y - 1.6*cm
-            for detail in details:
-                text = Paragraph(detail, styles['detail'])
-                text.wrapOn(p, card_width - 1.5*cm, line_height)
-                text.drawOn(p, margin + 0.7*cm, text_y)
-                text_y -= line_height
+        text_y = y - 1.6*cm
+        for detail in details:
+            text = Paragraph(detail, styles['detail'])
+            text.wrapOn(p, card_width - 1.5*cm, line_height)
+            text.drawOn(p, margin + 0.7*cm, text_y)
+            text_y -= line_height
 
-            y -= card_height + 0.5*cm
+        y -= card_height + 0.5*cm
 
-        p.save()
-        return response
+    p.save()
 
+
+# O PDF é gerado pelo worker (cedepe/relatorios.py); a página acompanha o pedido
+def eventos_report_pdf(request):
     # Gera lista de meses
     meses = [
         'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
@@ -425,12 +466,187 @@ def eventos_report_pdf(request):
     ]
 
     # Obtém anos distintos a partir dos agendamentos
-    anos_inicio = Agendamento.objects.annotate(ano=ExtractYear('inicio')).values_list('ano', flat=True)
-    anos_fim = Agendamento.objects.annotate(ano=ExtractYear('fim')).values_list('ano', flat=True)
+    anos_inicio = Agendamento.objects.annotate(ano=ExtractYear('inicio')).values_list('ano', flat=True).distinct()
+    anos_fim = Agendamento.objects.annotate(ano=ExtractYear('fim')).values_list('ano', flat=True).distinct()
     anos = sorted(set(anos_inicio).union(anos_fim))
 
-    return render(request, 'relatorios/filtro_eventos.html', {
+    return pagina_relatorio(request, 'EVENTOS', 'relatorios/filtro_eventos.html', {
         'meses': meses,
         'anos': anos,
     })
 
+
+# Exportação em CSV: mesmos filtros da listagem e, opcionalmente, o período do relatório
+from itertools import groupby
+from django.http import HttpResponseBadRequest
+from cedepe.exportacao import TAMANHO_LOTE_EXPORTACAO, resposta_csv
+from cedepe.relatorios import periodo_do_formulario
+
+
+def _linhas_agendamentos(linhas):
+    """
+    A consulta traz uma linha por sala (join com a tabela das salas); junta as
+    linhas consecutivas do mesmo agendamento em uma só.
+    """
+    for _, grupo in groupby(linhas, key=lambda linha: linha[0]):
+        grupo = list(grupo)
+        salas = ', '.join(linha[-1] for linha in grupo if linha[-1])
+        yield (*grupo[0][:-1], salas)
+
+
+def exportar_agendamentos(request):
+    try:
+        if request.GET.get('tipo_filtro'):
+            agendamentos = consulta_agendamentos(*periodo_do_formulario(request.GET))
+        else:
+            agendamentos = Agendamento.objects.all()
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    # O filtro por sala vira subconsulta, para o join das salas abaixo trazer todas as salas
+    filtrados = filtrar_agendamentos(agendamentos, request.GET).values('pk')
+    linhas = Agendamento.objects.filter(pk__in=filtrados).order_by('inicio', 'id', 'salas__nome').values_list(
+        'id', 'evento__titulo', 'evento__organizador', 'inicio', 'fim', 'participantes', 'salas__nome',
+    ).iterator(chunk_size=TAMANHO_LOTE_EXPORTACAO)
+    return resposta_csv(
+        request,
+        'agendamentos',
+        ['ID', 'Evento', 'Organizador', 'Início', 'Fim', 'Participantes', 'Salas'],
+        _linhas_agendamentos(linhas),
+    )
+
+
+from .horarios_livres import buscar_horarios, ler_parametros
+
+class HorariosLivresView(APIView):
+    """
+    Primeiros horários livres para uma atividade.
+    GET /eventos/api/horarios-livres/?duracao=<min>[&capacidade=N][&inicio=AAAA-MM-DD][&fim=AAAA-MM-DD]
+        [&hora_inicio=HH:MM][&hora_fim=HH:MM][&passo=<min>][&limite=N][&max_salas=N]
+
+    Com max_salas > 1 também sugere combinações de salas menores que, juntas,
+    comportam a capacidade pedida.
+    """
+
+    def get(self, request, format=None):
+        try:
+            parametros = ler_parametros(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response({**parametros, **buscar_horarios(**parametros)})
+
+
+
+from django.db.models import Count
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError as ErroValidacao
+from .models import SerieAgendamento
+from .forms import SerieAgendamentoForm
+from .serializers import SerieAgendamentoSerializer, AlteracaoSerieSerializer
+from .series import alterar_serie, cancelar_serie
+
+def serie_form(request):
+    if request.method == 'POST':
+        form = SerieAgendamentoForm(request.POST)
+        if form.is_valid():
+            try:
+                serie = form.save()
+                messages.success(request, f"Série criada com {serie.agendamentos.count()} agendamentos.")
+                return redirect('dashboard_eventos')
+            except ConflitoSala as e:
+                for mensagem in e.messages:
+                    messages.error(request, mensagem)
+        else:
+            for field, errors in form.errors.items():
+                for error in errors:
+                    messages.error(request, f"Erro no campo {field}: {error}")
+    else:
+        form = SerieAgendamentoForm()
+
+    return render(request, 'eventos/serie_form.html', {'form': form})
+
+
+class SerieAgendamentoViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
+    """
+    Séries de agendamentos. PATCH e DELETE valem para a série toda ou, com
+    ?a_partir_de=AAAA-MM-DD, para as ocorrências dessa data em diante.
+    PATCH aceita evento, salas, participantes, hora_inicio e hora_fim.
+    """
+    queryset = SerieAgendamento.objects.select_related('evento').prefetch_related('salas').annotate(
+        total_ocorrencias=Count('agendamentos')
+    )
+    serializer_class = SerieAgendamentoSerializer
+    campos_versao = ['atualizado_em', 'evento__atualizado_em', 'agendamentos__atualizado_em']
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['evento', 'frequencia']
+    keyset_ordering = ['-criado_em', 'id']
+    http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
+
+    def a_partir_de(self):
+        try:
+            return ler_data(self.request.query_params.get('a_partir_de'), 'a_partir_de')
+        except ValueError as e:
+            raise ErroValidacao({'a_partir_de': str(e)})
+
+    def perform_create(self, serializer):
+        try:
+            serializer.save()
+        except ConflitoSala as e:
+            raise ConflitoAgendamento(e.messages)
+
+    def partial_update(self, request, *args, **kwargs):
+        serie = self.get_object()
+        a_partir_de = self.a_partir_de()
+        alteracao = AlteracaoSerieSerializer(data=request.data)
+        alteracao.is_valid(raise_exception=True)
+        try:
+            serie = alterar_serie(serie, a_partir_de, **alteracao.validated_data)
+        except ConflitoSala as e:
+            raise ConflitoAgendamento(e.messages)
+        except DjangoValidationError as e:
+            raise ErroValidacao(e.message_dict)
+        if serie is None:
+            return Response({'detail': 'Nenhuma ocorrência a partir dessa data.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_serializer(self.get_queryset().get(pk=serie.pk)).data)
+
+    def destroy(self, request, *args, **kwargs):
+        serie = self.get_object()
+        canceladas = cancelar_serie(serie, self.a_partir_de())
+        return Response({'canceladas': canceladas})
+
+
+from cedepe.condicional import versao_consultas
+from .models import UtilizacaoSala
+from . import utilizacao
+
+class UtilizacaoSalasView(RespostaCondicionalMixin, APIView):
+    """
+    Uso das salas lido do consolidado semanal (UtilizacaoSala).
+    GET /eventos/api/utilizacao/[?inicio=AAAA-MM-DD][&fim=AAAA-MM-DD][&sala=<id>,<id>][&agrupar=dia|semana]
+
+    Padrão: as últimas 12 semanas, agrupadas por semana. Retorna horas
+    reservadas por sala e por período, taxa de uso no expediente e o mapa de
+    calor dia da semana x hora.
+    """
+
+    def versao_resposta(self, request):
+        try:
+            parametros = utilizacao.ler_parametros(request.query_params)
+        except ValueError:
+            linhas = UtilizacaoSala.objects.none()
+        else:
+            linhas = UtilizacaoSala.objects.filter(
+                semana__gte=utilizacao.segunda_feira(parametros['inicio']), semana__lte=parametros['fim']
+            )
+        # Salas entram pelo nome e pela lista (salas sem uso também aparecem)
+        return versao_consultas(
+            (linhas, ['atualizado_em']), (Sala.objects.all(), ['atualizado_em']),
+            extra=(request.get_full_path(), getattr(request, 'accepted_media_type', None)),
+        )
+
+    def get(self, request, format=None):
+        try:
+            parametros = utilizacao.ler_parametros(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(utilizacao.resumo_utilizacao(**parametros))
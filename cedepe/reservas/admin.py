@@ -1,4 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import render
+from django.urls import path
+from .alocacao import reconciliar_status_camas
+from .forms import ImportarHospedesForm
+from .importacao import importar_hospedes
 from .models import Quarto, Cama, Hospede, Ocupacao, Reserva
 
 class CamaInline(admin.TabularInline):
@@ -20,12 +26,61 @@ class CamaAdmin(admin.ModelAdmin):
     list_filter = ('status', 'quarto')
     search_fields = ('identificacao', 'quarto__numero')
     readonly_fields = ('criado_em', 'atualizado_em')
+    actions = ['reconciliar_status']
+
+    @admin.action(description="Corrigir status pelas ocupações ativas")
+    def reconciliar_status(self, request, queryset):
+        divergencias = reconciliar_status_camas(queryset)
+        if not divergencias:
+            self.message_user(request, "Nenhuma divergência encontrada.", messages.INFO)
+            return
+        detalhes = ", ".join(f"{d['identificacao']} ({d['de']} → {d['para']})" for d in divergencias)
+        self.message_user(request, f"{len(divergencias)} cama(s) corrigida(s): {detalhes}", messages.SUCCESS)
 
 @admin.register(Hospede)
 class HospedeAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'cpf', 'email', 'telefone', 'criado_em')
+    list_display = ('nome', 'cpf', 'email', 'telefone', 'cpf_duplicado', 'criado_em')
+    list_filter = ('cpf_duplicado',)
     search_fields = ('nome', 'cpf', 'email')
     readonly_fields = ('criado_em', 'atualizado_em')
+    change_list_template = 'admin/reservas/hospede/change_list.html'
+
+    # Erros exibidos na página; o comando importar_hospedes grava o relatório completo
+    MAXIMO_ERROS_EXIBIDOS = 500
+
+    def get_urls(self):
+        urls = [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='reservas_hospede_importar'),
+        ]
+        return urls + super().get_urls()
+
+    def importar_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            raise PermissionDenied
+        form = ImportarHospedesForm(request.POST or None, request.FILES or None)
+        resultado = None
+        if request.method == 'POST' and form.is_valid():
+            arquivo = form.cleaned_data['arquivo']
+            try:
+                resultado = importar_hospedes(arquivo, arquivo.name)
+            except ValueError as e:
+                form.add_error('arquivo', str(e))
+            else:
+                self.message_user(
+                    request,
+                    f"{resultado['criados']} hóspede(s) criado(s), {resultado['atualizados']} atualizado(s), "
+                    f"{len(resultado['erros'])} linha(s) com erro.",
+                    messages.WARNING if resultado['erros'] else messages.SUCCESS,
+                )
+        contexto = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Importar hóspedes",
+            'form': form,
+            'resultado': resultado,
+            'erros': resultado['erros'][:self.MAXIMO_ERROS_EXIBIDOS] if resultado else [],
+        }
+        return render(request, 'admin/reservas/hospede/importar.html', contexto)
 
 @admin.register(Ocupacao)
 class OcupacaoAdmin(admin.ModelAdmin):
@@ -34,11 +89,6 @@ class OcupacaoAdmin(admin.ModelAdmin):
     search_fields = ('hospede__nome', 'cama__identificacao')
     date_hierarchy = 'data_checkin'
     readonly_fields = ('criado_em', 'atualizado_em')
-    
-    def save_model(self, request, obj, form, change):
-        # Garante a atualização do status da cama
-        super().save_model(request, obj, form, change)
-        obj.cama.save()  # Salva alterações no status da cama
 
 @admin.register(Reserva)
 class ReservaAdmin(admin.ModelAdmin):
@@ -0,0 +1,427 @@
+# alocacao.py
+"""
+Alocação de camas.
+
+Toda gravação de Ocupacao passa por `alocar` (chamado em Ocupacao.save()),
+que dentro de uma transação:
+
+1. trava as linhas das camas envolvidas (SELECT ... FOR UPDATE), de modo que
+   duas recepções alocando a mesma cama ao mesmo tempo sejam serializadas;
+2. verifica sobreposição de período com outras ocupações ativas e levanta
+   ConflitoAlocacao em vez de gravar uma reserva dupla;
+3. após a gravação, ajusta Cama.status com UPDATEs que só tocam as camas
+   cujo status realmente mudou e atualiza o consolidado diário
+   (reservas/consolidacao.py) nos dias afetados.
+
+Exclusões de Ocupacao (uma a uma, QuerySet.delete() ou em cascata a partir de
+Hospede, Cama ou Quarto) passam pelo receptor `ocupacao_excluida`, que libera
+as camas e atualiza o consolidado uma vez por transação, no commit.
+"""
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from itertools import groupby
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from cedepe.transacao import ao_confirmar
+
+from .consolidacao import atualizar_periodos, recalcular
+from .disponibilidade import camas_livres, ocupacoes_sobrepostas
+from .painel import invalidar_estatisticas
+from .tempo_real import avisar_alteracao
+from .models import Cama, Ocupacao, Reserva
+
+logger = logging.getLogger(__name__)
+
+
+class ConflitoAlocacao(ValidationError):
+    """ A cama já possui ocupação ativa no período pedido. """
+
+
+def ocupacoes_ativas_da_cama():
+    return Ocupacao.objects.filter(status='ATIVA', cama=OuterRef('pk'))
+
+
+def ocupar_camas(camas_ids):
+    """ Marca como OCUPADA as camas informadas que ainda não estão assim. Um UPDATE. """
+    alteradas = Cama.objects.filter(pk__in=camas_ids).exclude(status='OCUPADA').update(
+        status='OCUPADA', atualizado_em=timezone.now()
+    )
+    if alteradas:
+        invalidar_estatisticas()
+        avisar_alteracao()
+    return alteradas
+
+
+def liberar_camas(camas_ids):
+    """
+    Marca como DISPONIVEL as camas informadas que não têm mais nenhuma
+    ocupação ativa. Um UPDATE.
+    """
+    alteradas = Cama.objects.filter(pk__in=camas_ids).filter(
+        ~Exists(ocupacoes_ativas_da_cama())
+    ).exclude(status='DISPONIVEL').update(
+        status='DISPONIVEL', atualizado_em=timezone.now()
+    )
+    if alteradas:
+        invalidar_estatisticas()
+        avisar_alteracao()
+    return alteradas
+
+
+def _processar_exclusoes(excluidas):
+    """ Libera as camas e atualiza o consolidado das ocupações (cama_id, checkin, checkout) excluídas. """
+    camas = {cama_id for cama_id, _, _ in excluidas}
+    quarto_da_cama = dict(Cama.objects.filter(pk__in=camas).values_list('pk', 'quarto_id'))
+    with transaction.atomic():
+        liberar_camas(quarto_da_cama)
+        if len(quarto_da_cama) < len(camas):
+            # Cama excluída junto (cascata de Cama ou Quarto): sem o quarto, recalcula todos no período
+            recalcular(min(checkin for _, checkin, _ in excluidas), max(checkout for _, _, checkout in excluidas))
+        else:
+            atualizar_periodos([
+                (quarto_da_cama[cama_id], checkin, checkout) for cama_id, checkin, checkout in excluidas
+            ])
+
+
+def ocupacao_excluida(sender, instance, **kwargs):
+    """
+    Receptor de post_delete de Ocupacao. Só guarda a cama e o período; a
+    liberação das camas e o consolidado rodam uma vez, depois do commit, com
+    todas as ocupações excluídas na transação (uma cascata de Hospede ou Cama
+    exclui várias de uma vez).
+    """
+    # `reconciliar_camas` corrige se o processamento depois do commit falhar
+    ao_confirmar(_processar_exclusoes, [(instance.cama_id, instance.data_checkin, instance.data_checkout)])
+
+
+def verificar_conflito(ocupacao):
+    """ Levanta ConflitoAlocacao se a cama já estiver ocupada no período da ocupação. """
+    if ocupacao.status != 'ATIVA':
+        return
+    conflito = ocupacoes_sobrepostas(ocupacao.data_checkin, ocupacao.data_checkout).filter(
+        cama_id=ocupacao.cama_id
+    )
+    if ocupacao.pk:
+        conflito = conflito.exclude(pk=ocupacao.pk)
+    conflito = conflito.select_related('hospede').first()
+    if conflito:
+        raise ConflitoAlocacao(
+            f"A cama já está ocupada por {conflito.hospede.nome} de "
+            f"{conflito.data_checkin.strftime('%d/%m/%Y')} a {conflito.data_checkout.strftime('%d/%m/%Y')}.",
+            code='conflito',
+        )
+
+
+def _muda_consolidado(anterior, ocupacao):
+    """ Finalizar uma ocupação (ATIVA -> FINALIZADA) não altera o consolidado diário. """
+    if anterior is None:
+        return True
+    return (
+        anterior['cama_id'] != ocupacao.cama_id
+        or anterior['hospede_id'] != ocupacao.hospede_id
+        or anterior['data_checkin'] != ocupacao.data_checkin
+        or anterior['data_checkout'] != ocupacao.data_checkout
+        or (anterior['status'] == 'CANCELADA') != (ocupacao.status == 'CANCELADA')
+    )
+
+
+@contextmanager
+def alocar(ocupacao):
+    """
+    Envolve a gravação de uma Ocupacao: trava as camas, valida o período e,
+    depois que o corpo do bloco grava a ocupação, sincroniza o status das camas.
+
+        with alocar(ocupacao):
+            super().save(*args, **kwargs)
+    """
+    with transaction.atomic():
+        camas_ids = {ocupacao.cama_id}
+        anterior = None
+        if ocupacao.pk:
+            anterior = Ocupacao.objects.filter(pk=ocupacao.pk).values(
+                'cama_id', 'cama__quarto_id', 'hospede_id', 'data_checkin', 'data_checkout', 'status'
+            ).first()
+            if anterior:
+                # Ao trocar de cama, a cama anterior também precisa ser liberada
+                camas_ids.add(anterior['cama_id'])
+
+        # Ordem fixa de travamento para evitar deadlock entre transações concorrentes
+        quartos = dict(
+            Cama.objects.select_for_update().filter(pk__in=camas_ids).order_by('pk').values_list('pk', 'quarto_id')
+        )
+
+        verificar_conflito(ocupacao)
+
+        yield
+
+        if ocupacao.status == 'ATIVA':
+            ocupar_camas([ocupacao.cama_id])
+            liberar_camas(camas_ids - {ocupacao.cama_id})
+        else:
+            liberar_camas(camas_ids)
+
+        if _muda_consolidado(anterior, ocupacao):
+            periodos = [(quartos.get(ocupacao.cama_id), ocupacao.data_checkin, ocupacao.data_checkout)]
+            if anterior:
+                periodos.append((anterior['cama__quarto_id'], anterior['data_checkin'], anterior['data_checkout']))
+            atualizar_periodos(periodos)
+
+        # A cama carregada em memória pode estar com o status antigo
+        if Ocupacao.cama.is_cached(ocupacao):
+            if ocupacao.status == 'ATIVA':
+                ocupacao.cama.status = 'OCUPADA'
+            else:
+                Ocupacao.cama.field.delete_cached_value(ocupacao)
+
+
+def distribuir_por_quartos(camas_por_quarto, quantidade):
+    """
+    Escolhe camas para `quantidade` pessoas usando o menor número de quartos.
+
+    `camas_por_quarto` é uma lista de listas de camas livres (uma por quarto).
+    Enquanto nenhum quarto comporta o restante do grupo, usa o quarto com mais
+    camas livres; quando algum comporta, usa o menor deles (melhor encaixe),
+    evitando desperdiçar um quarto grande com poucas pessoas.
+    Retorna None se não houver camas suficientes.
+    """
+    quartos = sorted(camas_por_quarto, key=len, reverse=True)
+    escolhidas = []
+    restantes = quantidade
+    while restantes > 0 and quartos:
+        comportam = [camas for camas in quartos if len(camas) >= restantes]
+        camas = min(comportam, key=len) if comportam else quartos[0]
+        quartos.remove(camas)
+        escolhidas.extend(camas[:restantes])
+        restantes -= min(len(camas), restantes)
+    return escolhidas if restantes == 0 else None
+
+
+@transaction.atomic
+def alocar_grupo(hospedes, data_checkin, data_checkout, quartos=None):
+    """
+    Cria ocupações ATIVAS para todo um grupo em uma única transação.
+
+    Trava as camas candidatas, calcula as livres no período (uma consulta),
+    distribui o grupo pelo menor número de quartos, insere as ocupações com
+    bulk_create e marca as camas como OCUPADA com um único UPDATE.
+    Levanta ConflitoAlocacao se não houver camas suficientes.
+    """
+    candidatas = Cama.objects.all()
+    if quartos:
+        candidatas = candidatas.filter(quarto_id__in=quartos)
+    # Mesma ordem de travamento usada em alocar()
+    list(candidatas.select_for_update().order_by('pk').values_list('pk', flat=True))
+
+    livres = camas_livres(data_checkin, data_checkout)
+    if quartos:
+        livres = livres.filter(quarto_id__in=quartos)
+    camas_por_quarto = [list(camas) for _, camas in groupby(livres, key=lambda cama: cama.quarto_id)]
+
+    escolhidas = distribuir_por_quartos(camas_por_quarto, len(hospedes))
+    if escolhidas is None:
+        total_livres = sum(len(camas) for camas in camas_por_quarto)
+        raise ConflitoAlocacao(
+            f"Não há camas suficientes no período: {len(hospedes)} hóspedes para {total_livres} camas livres.",
+            code='capacidade',
+        )
+
+    ocupacoes = Ocupacao.objects.bulk_create([
+        Ocupacao(
+            hospede=hospede,
+            cama=cama,
+            data_checkin=data_checkin,
+            data_checkout=data_checkout,
+            status='ATIVA',
+        )
+        for hospede, cama in zip(hospedes, escolhidas)
+    ])
+    ocupar_camas([cama.pk for cama in escolhidas])
+    atualizar_periodos([(cama.quarto_id, data_checkin, data_checkout) for cama in escolhidas])
+    return ocupacoes
+
+
+def ocupacoes_vencidas(data_referencia):
+    """ Ocupações ainda ATIVAS cujo check-out já passou (anterior a `data_referencia`). """
+    return Ocupacao.objects.filter(status='ATIVA', data_checkout__lt=data_referencia)
+
+
+def camas_a_liberar(data_referencia):
+    """
+    Camas OCUPADAS que ficariam sem nenhuma ocupação ativa depois de
+    finalizar as vencidas em `data_referencia` (usado na simulação).
+    """
+    vencidas = ocupacoes_vencidas(data_referencia)
+    return Cama.objects.filter(status='OCUPADA').filter(
+        Exists(vencidas.filter(cama=OuterRef('pk'))),
+        ~Exists(ocupacoes_ativas_da_cama().filter(data_checkout__gte=data_referencia)),
+    )
+
+
+@transaction.atomic
+def finalizar_ocupacoes_vencidas(data_referencia):
+    """
+    Finaliza em lote as ocupações vencidas e libera as camas delas na mesma
+    transação (sem passar por Ocupacao.save() linha a linha): trava e lê os
+    ids das vencidas, finaliza com um UPDATE e libera as camas com outro.
+    Retorna (ocupações finalizadas, camas liberadas).
+    """
+    vencidas = list(ocupacoes_vencidas(data_referencia).select_for_update().values_list('pk', 'cama_id'))
+    if not vencidas:
+        return 0, 0
+
+    finalizadas = Ocupacao.objects.filter(pk__in=[pk for pk, _ in vencidas]).update(
+        status='FINALIZADA', atualizado_em=timezone.now()
+    )
+    liberadas = liberar_camas({cama_id for _, cama_id in vencidas})
+    return finalizadas, liberadas
+
+
+def camas_divergentes(camas=None):
+    """
+    Camas cujo status não corresponde às ocupações: OCUPADA sem nenhuma
+    ocupação ativa ou DISPONIVEL com ocupação ativa. Uma consulta (EXISTS).
+    """
+    camas = Cama.objects.all() if camas is None else camas
+    return camas.annotate(tem_ocupacao_ativa=Exists(ocupacoes_ativas_da_cama())).filter(
+        Q(status='OCUPADA', tem_ocupacao_ativa=False) | Q(status='DISPONIVEL', tem_ocupacao_ativa=True)
+    )
+
+
+@transaction.atomic
+def reconciliar_status_camas(camas=None, simular=False):
+    """
+    Corrige Cama.status a partir das ocupações ativas com no máximo dois
+    UPDATEs e registra no log cada cama alterada. Retorna a lista de
+    divergências encontradas: [{id, quarto, identificacao, de, para}].
+    """
+    divergencias = [
+        {
+            'id': cama['pk'],
+            'quarto': cama['quarto__numero'],
+            'identificacao': cama['identificacao'],
+            'de': cama['status'],
+            'para': 'OCUPADA' if cama['tem_ocupacao_ativa'] else 'DISPONIVEL',
+        }
+        for cama in camas_divergentes(camas).order_by('pk').values(
+            'pk', 'quarto__numero', 'identificacao', 'status', 'tem_ocupacao_ativa'
+        )
+    ]
+    if simular or not divergencias:
+        return divergencias
+
+    for item in divergencias:
+        logger.warning(
+            "Cama %(id)s (quarto %(quarto)s, %(identificacao)s): status %(de)s -> %(para)s", item
+        )
+    # Os UPDATEs repetem a condição para não desfazer uma alocação concorrente
+    ocupadas = Cama.objects.filter(
+        pk__in=[item['id'] for item in divergencias if item['para'] == 'OCUPADA']
+    ).filter(Exists(ocupacoes_ativas_da_cama())).exclude(status='OCUPADA').update(
+        status='OCUPADA', atualizado_em=timezone.now()
+    )
+    if ocupadas:
+        invalidar_estatisticas()
+        avisar_alteracao()
+    liberar_camas([item['id'] for item in divergencias if item['para'] == 'DISPONIVEL'])
+    return divergencias
+
+
+@transaction.atomic
+def processar_chegadas(data=None):
+    """
+    Converte em ocupações as reservas CONFIRMADAS com check-in em `data`
+    (padrão: hoje), escolhendo as camas com as mesmas regras de alocar_grupo:
+    livres no período e no menor número de quartos.
+
+    Roda em uma transação com número fixo de consultas, independentemente da
+    quantidade de reservas: trava as camas, lê reservas e ocupações do
+    período, calcula a distribuição em memória e grava tudo em lote.
+    Retorna {'alocadas': [{'reserva', 'ocupacao', 'quarto', 'cama'}],
+             'nao_alocadas': [{'reserva', 'motivo'}]}.
+    """
+    data = data or date.today()
+
+    # Mesma ordem de travamento usada em alocar()
+    camas = list(
+        Cama.objects.select_for_update().order_by('pk').values_list('pk', 'quarto_id', 'quarto__numero', 'identificacao')
+    )
+    camas.sort(key=lambda cama: (cama[2], cama[3]))
+
+    ja_hospedado = Ocupacao.objects.filter(
+        status='ATIVA',
+        hospede=OuterRef('hospede'),
+        data_checkin__lt=OuterRef('data_checkout'),
+        data_checkout__gt=OuterRef('data_checkin'),
+    )
+    reservas = list(
+        Reserva.objects.select_for_update(of=('self',)).select_related('hospede')
+        .filter(status='CONFIRMADA', data_checkin=data)
+        .annotate(ja_hospedado=Exists(ja_hospedado))
+        .order_by('-data_checkout', 'pk')
+    )
+
+    nao_alocadas = []
+    validas = []
+    for reserva in reservas:
+        if reserva.ja_hospedado:
+            nao_alocadas.append({'reserva': reserva, 'motivo': "Hóspede já possui ocupação ativa no período."})
+        elif reserva.data_checkout <= reserva.data_checkin:
+            nao_alocadas.append({'reserva': reserva, 'motivo': "Data de check-out inválida."})
+        else:
+            validas.append(reserva)
+    if not validas:
+        return {'alocadas': [], 'nao_alocadas': nao_alocadas}
+
+    # Períodos já ocupados de cada cama, para checar disponibilidade em memória
+    ocupados = defaultdict(list)
+    for cama_id, checkin, checkout in ocupacoes_sobrepostas(data, max(r.data_checkout for r in validas)).values_list(
+        'cama_id', 'data_checkin', 'data_checkout'
+    ):
+        ocupados[cama_id].append((checkin, checkout))
+
+    def livre(cama_id, fim):
+        return all(not (checkin < fim and checkout > data) for checkin, checkout in ocupados[cama_id])
+
+    novas = []
+    # Estadias mais longas primeiro; reservas com o mesmo período são distribuídas juntas
+    for fim, grupo in groupby(validas, key=lambda reserva: reserva.data_checkout):
+        grupo = list(grupo)
+        livres = [cama for cama in camas if livre(cama[0], fim)]
+        por_quarto = [list(camas_quarto) for _, camas_quarto in groupby(livres, key=lambda cama: cama[1])]
+        escolhidas = distribuir_por_quartos(por_quarto, min(len(grupo), len(livres))) or []
+
+        for reserva, cama in zip(grupo, escolhidas):
+            ocupados[cama[0]].append((data, fim))
+            novas.append((reserva, cama, Ocupacao(
+                hospede_id=reserva.hospede_id,
+                cama_id=cama[0],
+                data_checkin=data,
+                data_checkout=fim,
+                status='ATIVA',
+            )))
+        for reserva in grupo[len(escolhidas):]:
+            nao_alocadas.append({'reserva': reserva, 'motivo': "Não há cama livre para o período."})
+
+    if not novas:
+        return {'alocadas': [], 'nao_alocadas': nao_alocadas}
+
+    ocupacoes = Ocupacao.objects.bulk_create([ocupacao for _, _, ocupacao in novas])
+    ocupadas = ocupar_camas([ocupacao.cama_id for ocupacao in ocupacoes])
+    Reserva.objects.filter(pk__in=[reserva.pk for reserva, _, _ in novas]).update(
+        status='HOSPEDADA', atualizado_em=timezone.now()
+    )
+    atualizar_periodos([(cama[1], data, ocupacao.data_checkout) for _, cama, ocupacao in novas])
+    if not ocupadas:
+        # O status das reservas entra nas estatísticas; ocupar_camas só invalida quando altera camas
+        invalidar_estatisticas()
+    alocadas = [
+        {'reserva': reserva, 'ocupacao': ocupacao, 'quarto': cama[2], 'cama': cama[3]}
+        for reserva, cama, ocupacao in novas
+    ]
+    return {'alocadas': alocadas, 'nao_alocadas': nao_alocadas}
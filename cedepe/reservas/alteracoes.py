@@ -0,0 +1,173 @@
+# alteracoes.py
+"""
+Feed de alterações de camas, ocupações, reservas e hóspedes.
+
+O cliente guarda o `cursor` devolvido e, na próxima consulta, recebe só as
+linhas alteradas depois dele (pelo índice (atualizado_em, id) de cada
+tabela) e os ids excluídos desde então (RegistroExcluido, marcado pelo sinal
+post_delete e gravado em lote no commit da exclusão).
+
+O cursor guarda, para cada tabela, a posição (atualizado_em, id) da última
+linha lida. Quando a tabela foi lida até o fim, a posição volta
+MARGEM_TRANSACOES no tempo: uma transação que gravou atualizado_em antes da
+consulta mas só fez commit depois ainda aparece na próxima. Por isso uma
+mesma linha pode vir repetida; o cliente deve aplicar as alterações por id.
+
+As marcas de exclusão são guardadas por RETENCAO_EXCLUSOES e depois apagadas
+(limpar_exclusoes, comando `limpar_exclusoes`). Um cursor mais antigo que isso
+levanta CursorExpirado: o cliente deve refazer a sincronização completa.
+
+Observação: atualizações em massa (QuerySet.update) só aparecem no feed se
+gravarem atualizado_em, como já fazem as de reservas/alocacao.py.
+"""
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+
+from cedepe.transacao import ao_confirmar
+
+from .models import Cama, Hospede, Ocupacao, RegistroExcluido, Reserva
+
+# Tempo que uma transação pode levar entre gravar atualizado_em e fazer commit
+MARGEM_TRANSACOES = timedelta(seconds=30)
+
+# Tempo que as marcas de exclusão ficam guardadas; cursores mais antigos expiram
+RETENCAO_EXCLUSOES = timedelta(days=30)
+
+# Máximo de linhas por tabela em cada resposta
+LIMITE_ALTERACOES = 500
+
+# nome no feed -> (modelo, campos enviados)
+TABELAS = {
+    'camas': (Cama, ('id', 'quarto_id', 'identificacao', 'status', 'atualizado_em')),
+    # Nome e CPF do hóspede vêm junto (join) para o mapa mostrar o ocupante sem outra consulta
+    'ocupacoes': (Ocupacao, (
+        'id', 'cama_id', 'hospede_id', 'hospede__nome', 'hospede__cpf',
+        'data_checkin', 'data_checkout', 'status', 'atualizado_em',
+    )),
+    'reservas': (Reserva, ('id', 'hospede_id', 'data_checkin', 'data_checkout', 'status', 'atualizado_em')),
+    'hospedes': (Hospede, (
+        'id', 'nome', 'cpf', 'email', 'telefone', 'endereco', 'instituicao', 'atualizado_em',
+    )),
+}
+MODELOS_EXCLUSAO = {modelo.__name__: nome for nome, (modelo, _) in TABELAS.items()}
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class CursorExpirado(CursorInvalido):
+    """ O cursor é anterior às marcas de exclusão guardadas. """
+
+
+def codificar_cursor(posicoes):
+    dados = {nome: [momento.isoformat(), pk] for nome, (momento, pk) in posicoes.items()}
+    return base64.urlsafe_b64encode(json.dumps(dados, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(valor, nomes):
+    """
+    Aceita o cursor devolvido pelo feed ou uma data/hora ISO 8601
+    (alterações a partir dela). Retorna {nome: (atualizado_em, id)}.
+    """
+    try:
+        # '+' do fuso vira espaço quando a data não é codificada na URL
+        momento = datetime.fromisoformat(valor.replace(' ', '+'))
+    except ValueError:
+        pass
+    else:
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+        return {nome: (momento, 0) for nome in nomes}
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(valor + '=' * (-len(valor) % 4)))
+        return {nome: (datetime.fromisoformat(dados[nome][0]), int(dados[nome][1])) for nome in nomes}
+    except (ValueError, TypeError, KeyError, IndexError):
+        raise CursorInvalido("Cursor inválido.")
+
+
+def _depois_de(campo, posicao):
+    momento, pk = posicao
+    return Q(**{f'{campo}__gt': momento}) | Q(**{campo: momento, 'id__gt': pk})
+
+
+def _ler(queryset, campo, posicao, agora, limite):
+    """ (linhas, nova posição, há mais) de uma tabela a partir de `posicao`. """
+    linhas = list(queryset.filter(_depois_de(campo, posicao)).order_by(campo, 'id')[:limite + 1])
+    mais = len(linhas) > limite
+    linhas = linhas[:limite]
+    if mais:
+        return linhas, (linhas[-1][campo], linhas[-1]['id']), True
+    # Lida até o fim: recua a margem, mas nunca para antes da posição recebida
+    return linhas, max(posicao, (agora - MARGEM_TRANSACOES, 0)), False
+
+
+def alteracoes(desde=None, nomes=None, limite=LIMITE_ALTERACOES):
+    """
+    Alterações desde o cursor `desde` (ou desde o início, se None) nas
+    tabelas `nomes` (padrão: todas). Uma consulta por tabela e uma para as
+    exclusões.
+    """
+    nomes = [nome for nome in TABELAS if nomes is None or nome in nomes]
+    agora = timezone.now()
+    inicio = (datetime.min.replace(tzinfo=dt_timezone.utc), 0)
+    posicoes = decodificar_cursor(desde, nomes + ['exclusoes']) if desde else dict.fromkeys(
+        nomes + ['exclusoes'], inicio
+    )
+    if desde and posicoes['exclusoes'][0] < agora - RETENCAO_EXCLUSOES:
+        # Exclusões desse período já podem ter sido apagadas
+        raise CursorExpirado("Cursor expirado. Refaça a sincronização completa (sem 'since').")
+
+    resultado = {'alteracoes': {}, 'exclusoes': {nome: [] for nome in nomes}, 'mais': False}
+    novas_posicoes = {}
+    for nome in nomes:
+        modelo, campos = TABELAS[nome]
+        linhas, novas_posicoes[nome], mais = _ler(
+            modelo.objects.values(*campos), 'atualizado_em', posicoes[nome], agora, limite
+        )
+        resultado['alteracoes'][nome] = linhas
+        resultado['mais'] |= mais
+
+    exclusoes = RegistroExcluido.objects.filter(
+        modelo__in=[TABELAS[nome][0].__name__ for nome in nomes]
+    ).values('id', 'modelo', 'objeto_id', 'excluido_em')
+    linhas, novas_posicoes['exclusoes'], mais = _ler(exclusoes, 'excluido_em', posicoes['exclusoes'], agora, limite)
+    for linha in linhas:
+        resultado['exclusoes'][MODELOS_EXCLUSAO[linha['modelo']]].append(linha['objeto_id'])
+    resultado['mais'] |= mais
+
+    resultado['cursor'] = codificar_cursor(novas_posicoes)
+    return resultado
+
+
+def cursor_atual(nomes=None):
+    """ Cursor que começa agora (menos a margem), para quem acabou de carregar tudo. """
+    momento = timezone.now() - MARGEM_TRANSACOES
+    return codificar_cursor({nome: (momento, 0) for nome in TABELAS if nomes is None or nome in nomes} | {
+        'exclusoes': (momento, 0)
+    })
+
+
+def limpar_exclusoes(agora=None):
+    """ Apaga as marcas de exclusão mais antigas que RETENCAO_EXCLUSOES. Retorna quantas. """
+    limite = (agora or timezone.now()) - RETENCAO_EXCLUSOES
+    return RegistroExcluido.objects.filter(excluido_em__lt=limite).delete()[0]
+
+
+def _gravar_exclusoes(excluidos):
+    RegistroExcluido.objects.bulk_create(
+        [RegistroExcluido(modelo=modelo, objeto_id=pk) for modelo, pk in excluidos], batch_size=1000
+    )
+
+
+def registrar_exclusao(sender, instance, **kwargs):
+    """
+    Receptor de post_delete: marca o objeto excluído. As marcas da transação
+    são gravadas num INSERT em lote depois do commit (uma exclusão em cascata
+    marca muitas de uma vez); se a transação for desfeita, não são gravadas.
+    """
+    ao_confirmar(_gravar_exclusoes, [(sender.__name__, instance.pk)])
@@ -0,0 +1,105 @@
+# busca.py
+"""
+Busca de hóspedes.
+
+Hospede guarda duas colunas derivadas, preenchidas em Hospede.save():
+
+- cpf_numeros: somente os dígitos do CPF (índice B-tree, busca por prefixo);
+- busca: nome, instituição e e-mail em minúsculas e sem acentos.
+
+No PostgreSQL a coluna `busca` tem índice GIN de trigramas (pg_trgm), que
+atende o `LIKE '%termo%'` e permite ordenar por similaridade. Em outros
+bancos (SQLite no desenvolvimento) a mesma consulta funciona sem o índice
+e a ordenação usa uma pontuação simples.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Cast
+from rest_framework import filters
+
+VALOR_PADRAO = 'Não informado'
+
+
+def normalizar(texto):
+    """ Minúsculas, sem acentos e com espaços simples: 'José  Álvares' -> 'jose alvares'. """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def somente_digitos(texto):
+    return re.sub(r'\D', '', texto or '')
+
+
+def texto_busca(*valores):
+    """ Junta os valores informados (ignorando o padrão 'Não informado') já normalizados. """
+    return normalizar(' '.join(v for v in valores if v and v != VALOR_PADRAO))
+
+
+def buscar_hospedes(queryset, termo):
+    """
+    Filtra e ordena por relevância os hóspedes que casam com `termo`
+    (nome, instituição, e-mail ou CPF com ou sem pontuação).
+    """
+    termo_normalizado = normalizar(termo)
+    digitos = somente_digitos(termo)
+    if not termo_normalizado:
+        return queryset
+
+    filtro = Q(busca__contains=termo_normalizado)
+    if len(digitos) >= 3:
+        filtro |= Q(cpf_numeros__startswith=digitos)
+    queryset = queryset.filter(filtro)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        # double precision: o valor volta idêntico no cursor da paginação por chave
+        relevancia = Cast(TrigramSimilarity('busca', termo_normalizado), FloatField())
+        if digitos:
+            relevancia = relevancia + Case(
+                When(cpf_numeros=digitos, then=Value(1.0)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+    else:
+        pontuacao = [When(busca__startswith=termo_normalizado, then=Value(2))]
+        if digitos:
+            pontuacao.insert(0, When(cpf_numeros=digitos, then=Value(3)))
+        relevancia = Case(*pontuacao, default=Value(1), output_field=IntegerField())
+    return queryset.annotate(relevancia=relevancia).order_by('-relevancia', 'nome', 'id')
+
+
+def autocompletar_hospedes(queryset, prefixo):
+    """
+    Typeahead: hóspedes cujo nome (ou alguma palavra do nome/instituição)
+    começa com `prefixo`, ou cujo CPF começa com os dígitos digitados.
+    Quem casa pelo início do nome vem primeiro.
+    """
+    prefixo_normalizado = normalizar(prefixo)
+    digitos = somente_digitos(prefixo)
+    if not prefixo_normalizado:
+        return queryset.order_by('nome', 'id')
+
+    filtro = Q(busca__startswith=prefixo_normalizado) | Q(busca__contains=' ' + prefixo_normalizado)
+    if len(digitos) >= 3:
+        filtro |= Q(cpf_numeros__startswith=digitos)
+    inicio_do_nome = Case(
+        When(busca__startswith=prefixo_normalizado, then=Value(0)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+    return queryset.filter(filtro).annotate(inicio_do_nome=inicio_do_nome).order_by('inicio_do_nome', 'nome', 'id')
+
+
+class BuscaHospedeFilter(filters.BaseFilterBackend):
+    """ Substitui o SearchFilter em HospedeViewSet mantendo o parâmetro ?search=. """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        termo = request.query_params.get(self.search_param, '').strip()
+        if not termo:
+            return queryset
+        return buscar_hospedes(queryset, termo)
@@ -0,0 +1,123 @@
+# consolidacao.py
+"""
+Consolidado diário da hospedagem (OcupacaoDiaria).
+
+Para cada quarto e dia guarda camas ocupadas, hóspedes, check-ins e
+check-outs. Uma ocupação ocupa a cama nas noites de data_checkin até a
+véspera de data_checkout e conta como check-out em data_checkout.
+Ocupações CANCELADAS não entram.
+
+O consolidado é atualizado a cada gravação de Ocupacao (reservas/alocacao.py),
+recalculando apenas o quarto e o intervalo de dias afetados. O comando
+`consolidar_ocupacao` reconstrói qualquer período do zero.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import Ocupacao, OcupacaoDiaria
+
+# Tamanho dos blocos (em dias) usados na reconstrução completa
+DIAS_POR_BLOCO = 366
+
+
+def _dias(inicio, fim):
+    dia = inicio
+    while dia <= fim:
+        yield dia
+        dia += timedelta(days=1)
+
+
+def calcular(inicio, fim, quartos=None):
+    """
+    Calcula o consolidado de `inicio` a `fim` (inclusive) direto das ocupações.
+    Retorna uma lista de OcupacaoDiaria não salvas, só para dias com movimento.
+    """
+    ocupacoes = Ocupacao.objects.exclude(status='CANCELADA').filter(
+        data_checkin__lte=fim, data_checkout__gte=inicio
+    )
+    if quartos is not None:
+        ocupacoes = ocupacoes.filter(cama__quarto_id__in=quartos)
+
+    camas = defaultdict(set)
+    hospedes = defaultdict(set)
+    checkins = defaultdict(int)
+    checkouts = defaultdict(int)
+    linhas = ocupacoes.values_list('cama__quarto_id', 'cama_id', 'hospede_id', 'data_checkin', 'data_checkout')
+    for quarto_id, cama_id, hospede_id, checkin, checkout in linhas.iterator(chunk_size=2000):
+        for dia in _dias(max(checkin, inicio), min(checkout - timedelta(days=1), fim)):
+            camas[quarto_id, dia].add(cama_id)
+            hospedes[quarto_id, dia].add(hospede_id)
+        if inicio <= checkin <= fim:
+            checkins[quarto_id, checkin] += 1
+        if inicio <= checkout <= fim:
+            checkouts[quarto_id, checkout] += 1
+
+    chaves = set(camas) | set(checkins) | set(checkouts)
+    return [
+        OcupacaoDiaria(
+            quarto_id=quarto_id,
+            data=dia,
+            camas_ocupadas=len(camas.get((quarto_id, dia), ())),
+            hospedes=len(hospedes.get((quarto_id, dia), ())),
+            checkins=checkins.get((quarto_id, dia), 0),
+            checkouts=checkouts.get((quarto_id, dia), 0),
+        )
+        for quarto_id, dia in sorted(chaves, key=lambda chave: (chave[1], chave[0]))
+    ]
+
+
+@transaction.atomic
+def recalcular(inicio, fim, quartos=None):
+    """ Substitui o consolidado de `inicio` a `fim` (opcionalmente só de alguns quartos). """
+    existentes = OcupacaoDiaria.objects.filter(data__gte=inicio, data__lte=fim)
+    if quartos is not None:
+        existentes = existentes.filter(quarto_id__in=quartos)
+    existentes.delete()
+    return OcupacaoDiaria.objects.bulk_create(calcular(inicio, fim, quartos), batch_size=2000)
+
+
+def atualizar_periodos(periodos):
+    """
+    Atualiza o consolidado após mudanças em ocupações. `periodos` é uma
+    lista de (quarto_id, data_checkin, data_checkout) antigos e novos; tudo
+    é recalculado de uma vez (quartos envolvidos x intervalo que cobre todos
+    os períodos), com um número fixo de consultas.
+    """
+    periodos = [p for p in periodos if None not in p]
+    if not periodos:
+        return
+    recalcular(
+        min(checkin for _, checkin, _ in periodos),
+        max(checkout for _, _, checkout in periodos),
+        quartos={quarto_id for quarto_id, _, _ in periodos},
+    )
+
+
+def reconstruir(inicio=None, fim=None):
+    """
+    Reconstrói o consolidado de `inicio` a `fim` em blocos de um ano. Sem
+    datas, reconstrói todo o histórico e apaga linhas fora dele.
+    """
+    limites = Ocupacao.objects.exclude(status='CANCELADA').aggregate(
+        primeiro=Min('data_checkin'), ultimo=Max('data_checkout')
+    )
+    if inicio is None and fim is None:
+        if limites['primeiro'] is None:
+            OcupacaoDiaria.objects.all().delete()
+            return 0
+        OcupacaoDiaria.objects.exclude(data__gte=limites['primeiro'], data__lte=limites['ultimo']).delete()
+    inicio = inicio or limites['primeiro']
+    fim = fim or limites['ultimo']
+    if inicio is None or fim is None:
+        return 0
+
+    total = 0
+    bloco_inicio = inicio
+    while bloco_inicio <= fim:
+        bloco_fim = min(bloco_inicio + timedelta(days=DIAS_POR_BLOCO - 1), fim)
+        total += len(recalcular(bloco_inicio, bloco_fim))
+        bloco_inicio = bloco_fim + timedelta(days=1)
+    return total
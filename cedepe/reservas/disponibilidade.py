@@ -0,0 +1,81 @@
+# disponibilidade.py
+"""
+Consulta de disponibilidade de camas por período.
+
+Uma cama está livre em [inicio, fim) quando não existe Ocupacao ATIVA cujo
+período se sobreponha ao intervalo pedido. A data de check-out é exclusiva:
+quem sai no dia 14 libera a cama para quem entra no dia 14.
+"""
+from datetime import date
+from itertools import groupby
+
+from django.db.models import Exists, OuterRef
+
+from .models import Cama, Ocupacao
+
+
+def ocupacoes_sobrepostas(inicio, fim):
+    """ Ocupações ativas que se sobrepõem ao período [inicio, fim). """
+    return Ocupacao.objects.filter(
+        status='ATIVA',
+        data_checkin__lt=fim,
+        data_checkout__gt=inicio,
+    )
+
+
+def camas_livres(inicio, fim, quarto=None, excluir_ocupacao=None):
+    """
+    Retorna as camas sem ocupação ativa no período [inicio, fim).
+
+    Tudo é resolvido em uma única consulta (NOT EXISTS sobre o índice
+    ocupacao_cama_periodo_idx). `excluir_ocupacao` permite ignorar a própria
+    ocupação ao editar um registro existente.
+    """
+    conflitos = ocupacoes_sobrepostas(inicio, fim).filter(cama=OuterRef('pk'))
+    if excluir_ocupacao:
+        conflitos = conflitos.exclude(pk=excluir_ocupacao)
+
+    camas = Cama.objects.select_related('quarto').filter(~Exists(conflitos))
+    if quarto:
+        camas = camas.filter(quarto_id=quarto)
+    return camas.order_by('quarto__numero', 'identificacao')
+
+
+def camas_livres_por_quarto(inicio, fim, quarto=None, excluir_ocupacao=None):
+    """ Agrupa o resultado de camas_livres por Quarto, pronto para serializar. """
+    camas = camas_livres(inicio, fim, quarto=quarto, excluir_ocupacao=excluir_ocupacao)
+    resultado = []
+    for quarto_obj, camas_do_quarto in groupby(camas, key=lambda cama: cama.quarto):
+        resultado.append({
+            'id': quarto_obj.id,
+            'numero': quarto_obj.numero,
+            'descricao': quarto_obj.descricao,
+            'camas': [
+                {'id': cama.id, 'identificacao': cama.identificacao}
+                for cama in camas_do_quarto
+            ],
+        })
+    return resultado
+
+
+def cama_livre(cama, inicio, fim, excluir_ocupacao=None):
+    """ Indica se uma cama específica está livre no período [inicio, fim). """
+    conflitos = ocupacoes_sobrepostas(inicio, fim).filter(cama=cama)
+    if excluir_ocupacao:
+        conflitos = conflitos.exclude(pk=excluir_ocupacao)
+    return not conflitos.exists()
+
+
+def validar_periodo(inicio, fim):
+    """
+    Converte e valida o período recebido como texto (YYYY-MM-DD).
+    Levanta ValueError com uma mensagem amigável se o período for inválido.
+    """
+    try:
+        inicio = date.fromisoformat(inicio)
+        fim = date.fromisoformat(fim)
+    except (TypeError, ValueError):
+        raise ValueError("Informe 'inicio' e 'fim' no formato AAAA-MM-DD.")
+    if inicio >= fim:
+        raise ValueError("A data de início deve ser anterior à data de fim.")
+    return inicio, fim
@@ -16,23 +16,46 @@ class HospedeForm(forms.ModelForm):
     class Meta:
         model = Hospede
         fields = ['nome', 'cpf', 'email', 'telefone', 'instituicao', 'endereco']
+
 from datetime import date
+from django.urls import reverse_lazy
+
+class HospedeAutocompleteWidget(forms.Select):
+    """
+    Select de hóspede carregado sob demanda: renderiza apenas a opção
+    selecionada e o restante vem do autocomplete (listar_hospedes_json).
+    """
+
+    def __init__(self, attrs=None):
+        padrao = {'class': 'form-select', 'data-autocomplete-url': reverse_lazy('listar_hospedes_json')}
+        super().__init__(attrs={**padrao, **(attrs or {})})
+
+    def optgroups(self, name, value, attrs=None):
+        todas = self.choices
+        selecionados = [v for v in value if str(v).isdigit()]
+        opcoes = [('', 'Selecione...')]
+        if selecionados:
+            opcoes += [todas.choice(obj) for obj in todas.queryset.filter(pk__in=selecionados)]
+        self.choices = opcoes
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = todas
 
 class OcupacaoForm(forms.ModelForm):  # Novo form para Ocupacao
     class Meta:
         model = Ocupacao
         fields = ['hospede', 'cama', 'data_checkin', 'data_checkout', 'status']
+        widgets = {'hospede': HospedeAutocompleteWidget()}
 
     def clean(self):
         cleaned_data = super().clean()
-        cama = cleaned_data.get('cama')
         hospede = cleaned_data.get('hospede')
         data_checkin = cleaned_data.get('data_checkin')
         data_checkout = cleaned_data.get('data_checkout')
         status = cleaned_data.get('status')
 
-        if cama and cama.status != 'DISPONIVEL':
-            raise forms.ValidationError("A cama selecionada não está disponível.")        
+        # A sobreposição com outras ocupações da cama é validada em Ocupacao.clean()
 
         if data_checkin and data_checkout and data_checkin >= data_checkout:
             raise forms.ValidationError("A data de check-in deve ser anterior à data de check-out.")
@@ -43,16 +66,15 @@ class OcupacaoForm(forms.ModelForm):  # Novo form para Ocupacao
         return cleaned_data
 
     def save(self, commit=True):
+        # O status da cama é sincronizado em Ocupacao.save() (reservas/alocacao.py)
         ocupacao = super().save(commit=False)
 
-        if ocupacao.status == 'ATIVA':
-            ocupacao.cama.status = 'OCUPADA'
-        elif ocupacao.status in ['CANCELADA', 'FINALIZADA']:
-            ocupacao.cama.status = 'DISPONIVEL'
-
         if commit:
-            ocupacao.cama.save()
-            ocupacao.save()
+            if self.instance._state.adding:
+                ocupacao.save()
+            elif self.changed_data:
+                # Grava apenas as colunas alteradas no formulário
+                ocupacao.save(update_fields=[*self.changed_data, 'atualizado_em'])
 
         return ocupacao
 
@@ -60,6 +82,7 @@ class ReservaForm(forms.ModelForm):  # Novo form para Reserva
     class Meta:
         model = Reserva
         fields = ['hospede', 'data_checkin', 'data_checkout', 'status']
+        widgets = {'hospede': HospedeAutocompleteWidget()}
 
     def clean(self):
         cleaned_data = super().clean()
@@ -72,4 +95,15 @@ class ReservaForm(forms.ModelForm):  # Novo form para Reserva
         return cleaned_data
 
     def save(self, commit=True):
-        return super().save(commit=commit)
\ No newline at end of file
+        return super().save(commit=commit)
+class ImportarHospedesForm(forms.Form):
+    arquivo = forms.FileField(
+        label="Planilha (CSV ou XLSX)",
+        help_text="Colunas reconhecidas: Nome, CPF (obrigatório), E-mail, Telefone, Endereço e Instituição.",
+    )
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data['arquivo']
+        if not arquivo.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError("Envie um arquivo .csv ou .xlsx.")
+        return arquivo
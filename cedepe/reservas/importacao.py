@@ -0,0 +1,247 @@
+# importacao.py
+"""
+Importação de hóspedes a partir das planilhas (CSV ou XLSX) enviadas pelas
+instituições.
+
+O arquivo é lido em lotes (read_csv com chunksize; XLSX pelo openpyxl em modo
+somente leitura), então a memória usada depende do tamanho do lote e não do
+arquivo. Cada lote custa duas consultas: uma para ler os hóspedes que já têm
+os CPFs do lote e um INSERT ... ON CONFLICT (cpf_numeros) DO UPDATE com todos
+os hóspedes do lote.
+
+Regras:
+- o CPF é obrigatório e precisa ter dígitos verificadores válidos;
+- célula vazia não apaga o valor já cadastrado;
+- se o mesmo CPF aparece mais de uma vez, a última linha prevalece.
+"""
+import codecs
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.utils import timezone
+
+from .busca import normalizar, somente_digitos
+from .models import Hospede
+from .painel import invalidar_estatisticas
+
+TAMANHO_LOTE = 1000
+
+CAMPOS = ('nome', 'cpf', 'email', 'telefone', 'endereco', 'instituicao')
+
+# Cabeçalho da planilha (normalizado: minúsculas, sem acentos) -> campo do Hospede
+COLUNAS = {
+    'nome': 'nome',
+    'nome completo': 'nome',
+    'cpf': 'cpf',
+    'email': 'email',
+    'e-mail': 'email',
+    'telefone': 'telefone',
+    'celular': 'telefone',
+    'fone': 'telefone',
+    'endereco': 'endereco',
+    'instituicao': 'instituicao',
+    'escola': 'instituicao',
+    'orgao': 'instituicao',
+}
+
+
+def cpf_valido(digitos):
+    """ Confere os dois dígitos verificadores de um CPF com 11 dígitos. """
+    if len(digitos) != 11 or len(set(digitos)) == 1:
+        return False
+    for posicao in (9, 10):
+        soma = sum(int(digitos[i]) * (posicao + 1 - i) for i in range(posicao))
+        if (soma * 10) % 11 % 10 != int(digitos[posicao]):
+            return False
+    return True
+
+
+def normalizar_cpf(valor):
+    """
+    Retorna o CPF no formato 000.000.000-00 ou levanta ValueError.
+    Completa com zeros à esquerda os CPFs que a planilha guardou como número.
+    """
+    digitos = somente_digitos(valor)
+    if not digitos:
+        raise ValueError("CPF não informado.")
+    if len(digitos) < 11:
+        digitos = digitos.zfill(11)
+    if not cpf_valido(digitos):
+        raise ValueError("CPF inválido.")
+    return f"{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}"
+
+
+def _texto_celula(valor):
+    """ Valor de uma célula do XLSX como texto (números inteiros sem o '.0'). """
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime('%d/%m/%Y')
+    return str(valor).strip()
+
+
+def _lotes_csv(arquivo, tamanho_lote):
+    amostra = arquivo.read(64 * 1024)
+    arquivo.seek(0)
+    try:
+        # Decodificador incremental: não falha por um caractere cortado no fim da amostra
+        texto = codecs.getincrementaldecoder('utf-8-sig')().decode(amostra)
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        texto = amostra.decode('latin-1')
+        encoding = 'latin-1'
+    try:
+        separador = csv.Sniffer().sniff(texto.split('\n', 1)[0], delimiters=',;\t').delimiter
+    except csv.Error:
+        separador = ','
+
+    # O pandas não reconhece arquivos enviados (UploadedFile) como binários; decodificamos aqui
+    texto = io.TextIOWrapper(arquivo, encoding=encoding, newline='')
+    try:
+        yield from pd.read_csv(texto, sep=separador, dtype=str, keep_default_na=False, chunksize=tamanho_lote)
+    finally:
+        texto.detach()
+
+
+def _lotes_xlsx(arquivo, tamanho_lote):
+    planilha = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = planilha.active.iter_rows(values_only=True)
+        cabecalho = [_texto_celula(valor) for valor in next(linhas, ())]
+        lote = []
+        for linha in linhas:
+            # Linhas com células vazias no fim podem vir mais curtas que o cabeçalho
+            linha = [_texto_celula(valor) for valor in linha[:len(cabecalho)]]
+            lote.append(linha + [''] * (len(cabecalho) - len(linha)))
+            if len(lote) >= tamanho_lote:
+                yield pd.DataFrame(lote, columns=cabecalho)
+                lote = []
+        if lote:
+            yield pd.DataFrame(lote, columns=cabecalho)
+    finally:
+        planilha.close()
+
+
+def ler_planilha(arquivo, nome_arquivo, tamanho_lote=TAMANHO_LOTE):
+    """ Gera DataFrames de até `tamanho_lote` linhas, com todas as células como texto. """
+    if nome_arquivo.lower().endswith('.xlsx'):
+        return _lotes_xlsx(arquivo, tamanho_lote)
+    if nome_arquivo.lower().endswith('.csv'):
+        return _lotes_csv(arquivo, tamanho_lote)
+    raise ValueError("Formato não suportado. Envie um arquivo .csv ou .xlsx.")
+
+
+def _mapear_colunas(colunas):
+    """ {coluna da planilha: campo}. Exige a coluna de CPF. """
+    mapa = {}
+    for coluna in colunas:
+        campo = COLUNAS.get(normalizar(str(coluna)))
+        if campo and campo not in mapa.values():
+            mapa[coluna] = campo
+    if 'cpf' not in mapa.values():
+        raise ValueError("A planilha precisa ter uma coluna 'CPF'.")
+    return mapa
+
+
+def _validar_linha(valores):
+    """ Normaliza os valores de uma linha; levanta ValueError com o motivo da rejeição. """
+    valores['cpf'] = normalizar_cpf(valores.get('cpf'))
+    if valores.get('email'):
+        try:
+            validate_email(valores['email'])
+        except ValidationError:
+            raise ValueError("E-mail inválido.")
+    for campo, valor in valores.items():
+        limite = Hospede._meta.get_field(campo).max_length
+        if limite and len(valor) > limite:
+            raise ValueError(f"Campo '{campo}' com mais de {limite} caracteres.")
+    return valores
+
+
+def _gravar_lote(linhas):
+    """
+    `linhas`: {cpf_numeros: valores}. Completa as células vazias com o que já
+    está cadastrado e grava tudo com um único upsert. Retorna (criados, atualizados).
+    """
+    existentes = {
+        valores[0]: dict(zip(CAMPOS, valores[1:]))
+        for valores in Hospede.objects.filter(cpf_numeros__in=linhas).values_list('cpf_numeros', *CAMPOS)
+    }
+    agora = timezone.now()
+    hospedes = []
+    for cpf_numeros, valores in linhas.items():
+        hospede = Hospede(**{**existentes.get(cpf_numeros, {}), **valores})
+        hospede.preparar_busca()
+        hospede.atualizado_em = agora
+        hospedes.append(hospede)
+
+    Hospede.objects.bulk_create(
+        hospedes,
+        update_conflicts=True,
+        unique_fields=['cpf_numeros'],
+        update_fields=[*CAMPOS, 'busca', 'atualizado_em'],
+    )
+    return len(linhas) - len(existentes), len(existentes)
+
+
+def importar_hospedes(arquivo, nome_arquivo, tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa a planilha, criando ou atualizando hóspedes pelo CPF.
+
+    Retorna {'linhas', 'criados', 'atualizados', 'erros'}, onde `erros` é uma
+    lista de {'linha', 'cpf', 'erro'} (linha como no Excel: o cabeçalho é a 1).
+    Levanta ValueError se o arquivo não puder ser lido.
+    """
+    resultado = {'linhas': 0, 'criados': 0, 'atualizados': 0, 'erros': []}
+    mapa = None
+    try:
+        for lote in ler_planilha(arquivo, nome_arquivo, tamanho_lote):
+            if mapa is None:
+                mapa = _mapear_colunas(lote.columns)
+            lote = lote[list(mapa)].rename(columns=mapa)
+
+            validas = {}
+            for numero, linha in enumerate(lote.itertuples(index=False), start=resultado['linhas'] + 2):
+                valores = {campo: ' '.join(str(valor).split()) for campo, valor in zip(lote.columns, linha)}
+                if not any(valores.values()):
+                    continue
+                try:
+                    valores = _validar_linha({campo: valor for campo, valor in valores.items() if valor})
+                except ValueError as e:
+                    resultado['erros'].append({'linha': numero, 'cpf': valores.get('cpf', ''), 'erro': str(e)})
+                    continue
+                validas[somente_digitos(valores['cpf'])] = valores
+            resultado['linhas'] += len(lote)
+
+            if validas:
+                criados, atualizados = _gravar_lote(validas)
+                resultado['criados'] += criados
+                resultado['atualizados'] += atualizados
+    except pd.errors.EmptyDataError:
+        pass
+    except (pd.errors.ParserError, UnicodeDecodeError, zipfile.BadZipFile, InvalidFileException) as e:
+        raise ValueError(f"Não foi possível ler a planilha: {e}")
+    finally:
+        if resultado['criados'] or resultado['atualizados']:
+            invalidar_estatisticas()
+
+    if mapa is None:
+        raise ValueError("A planilha está vazia.")
+    return resultado
+
+
+def escrever_relatorio_erros(erros, arquivo):
+    """ Grava o relatório de erros da importação em CSV (linha;cpf;erro). """
+    escritor = csv.writer(arquivo, delimiter=';')
+    escritor.writerow(['linha', 'cpf', 'erro'])
+    for erro in erros:
+        escritor.writerow([erro['linha'], erro['cpf'], erro['erro']])
@@ -0,0 +1,79 @@
+# benchmark_relatorios.py
+"""
+Mede tempo, consultas e pico de memória da geração dos relatórios em PDF
+para volumes crescentes de ocupações. Os dados são criados dentro de uma
+transação desfeita ao final, então pode rodar em qualquer banco.
+
+    python manage.py benchmark_relatorios
+    python manage.py benchmark_relatorios --linhas 100 1000 10000 100000
+"""
+import re
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from cedepe.pdf import arquivo_temporario
+from reservas.models import Cama, Hospede, Ocupacao, Quarto
+from reservas.views import criar_corpo_ocupacoes, gerar_relatorio_pdf
+
+
+class Command(BaseCommand):
+    help = "Mede memória e tempo do relatório de ocupações em PDF para vários volumes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', nargs='+', type=int, default=[100, 1000, 10000, 100000])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'linhas':>8} {'páginas':>8} {'consultas':>9} {'tempo (s)':>10} {'pico (KB)':>10} {'PDF (KB)':>9}")
+        for linhas in options['linhas']:
+            with transaction.atomic():
+                self.stdout.write(self.medir(linhas))
+                transaction.set_rollback(True)
+
+    def medir(self, linhas):
+        quarto = Quarto.objects.create(numero='BENCH', descricao='benchmark')
+        camas = Cama.objects.bulk_create([Cama(quarto=quarto, identificacao=f'B{i}') for i in range(20)])
+        hospedes = [Hospede(nome=f'Hóspede {i}', instituicao='Benchmark') for i in range(200)]
+        for hospede in hospedes:
+            hospede.preparar_busca()
+        hospedes = Hospede.objects.bulk_create(hospedes)
+
+        inicio_periodo = date(2000, 1, 1)
+        Ocupacao.objects.bulk_create(
+            (
+                Ocupacao(
+                    hospede=hospedes[i % len(hospedes)],
+                    cama=camas[i % len(camas)],
+                    data_checkin=inicio_periodo + timedelta(days=i % 300),
+                    data_checkout=inicio_periodo + timedelta(days=i % 300 + 2),
+                    status='FINALIZADA',
+                )
+                for i in range(linhas)
+            ),
+            batch_size=5000,
+        )
+        # Mesma consulta de ocupacoes_report_pdf
+        ocupacoes = Ocupacao.objects.filter(cama__quarto=quarto).select_related('hospede', 'cama').only(
+            'data_checkin', 'data_checkout', 'status', 'hospede__nome', 'hospede__instituicao', 'cama__identificacao'
+        ).order_by('data_checkin')
+
+        arquivo = arquivo_temporario()
+        tracemalloc.start()
+        inicio = time.monotonic()
+        with CaptureQueriesContext(connection) as consultas:
+            gerar_relatorio_pdf(
+                arquivo, "Benchmark", datetime(2000, 1, 1), datetime(2001, 1, 1), criar_corpo_ocupacoes, ocupacoes
+            )
+        duracao = time.monotonic() - inicio
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        tamanho = arquivo.tell()
+        arquivo.seek(0)
+        paginas = len(re.findall(rb'/Type /Page\b(?!s)', arquivo.read()))
+        arquivo.close()
+        return f"{linhas:>8} {paginas:>8} {len(consultas):>9} {duracao:>10.2f} {pico // 1024:>10} {tamanho // 1024:>9}"
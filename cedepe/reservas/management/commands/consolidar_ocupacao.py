@@ -0,0 +1,35 @@
+# consolidar_ocupacao.py
+"""
+Reconstrói o consolidado diário de ocupação (OcupacaoDiaria).
+
+    python manage.py consolidar_ocupacao                      # todo o histórico
+    python manage.py consolidar_ocupacao --inicio 2025-01-01 --fim 2025-12-31
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservas.consolidacao import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o consolidado diário de ocupação a partir das ocupações."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', help="Primeiro dia (AAAA-MM-DD). Padrão: primeiro check-in.")
+        parser.add_argument('--fim', help="Último dia (AAAA-MM-DD). Padrão: último check-out.")
+
+    def handle(self, *args, **options):
+        try:
+            inicio = date.fromisoformat(options['inicio']) if options['inicio'] else None
+            fim = date.fromisoformat(options['fim']) if options['fim'] else None
+        except ValueError:
+            raise CommandError("Data inválida. Use o formato AAAA-MM-DD.")
+        if inicio and fim and fim < inicio:
+            raise CommandError("A data final não pode ser anterior à inicial.")
+
+        comeco = time.monotonic()
+        total = reconstruir(inicio, fim)
+        duracao = (time.monotonic() - comeco) * 1000
+        self.stdout.write(self.style.SUCCESS(f"{total} linha(s) de consolidado gravada(s) em {duracao:.0f} ms."))
@@ -0,0 +1,52 @@
+# finalizar_ocupacoes.py
+"""
+Finaliza as ocupações cujo check-out já passou e libera as camas.
+
+Pensado para rodar todo dia (cron / Heroku Scheduler) ou na fase de release:
+
+    python manage.py finalizar_ocupacoes
+    python manage.py finalizar_ocupacoes --dry-run
+    python manage.py finalizar_ocupacoes --data 2025-03-01
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservas.alocacao import camas_a_liberar, finalizar_ocupacoes_vencidas, ocupacoes_vencidas
+
+
+class Command(BaseCommand):
+    help = "Finaliza em lote as ocupações ATIVAS com check-out vencido e libera as camas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data',
+            help="Data de referência (AAAA-MM-DD). Finaliza check-outs anteriores a ela. Padrão: hoje.",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Apenas informa quantos registros seriam alterados.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            data_referencia = date.fromisoformat(options['data']) if options['data'] else date.today()
+        except ValueError:
+            raise CommandError("Data inválida. Use o formato AAAA-MM-DD.")
+
+        inicio = time.monotonic()
+        if options['dry_run']:
+            ocupacoes = ocupacoes_vencidas(data_referencia).count()
+            camas = camas_a_liberar(data_referencia).count()
+            prefixo = "[simulação] seriam finalizadas"
+        else:
+            ocupacoes, camas = finalizar_ocupacoes_vencidas(data_referencia)
+            prefixo = "Finalizadas"
+        duracao = (time.monotonic() - inicio) * 1000
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixo} {ocupacoes} ocupação(ões) com check-out antes de "
+            f"{data_referencia.strftime('%d/%m/%Y')}; {camas} cama(s) liberada(s) em {duracao:.0f} ms."
+        ))
@@ -0,0 +1,47 @@
+# importar_hospedes.py
+"""
+Importa hóspedes de uma planilha CSV ou XLSX, criando ou atualizando pelo CPF.
+
+    python manage.py importar_hospedes inscritos.xlsx
+    python manage.py importar_hospedes inscritos.csv --erros erros.csv
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservas.importacao import TAMANHO_LOTE, escrever_relatorio_erros, importar_hospedes
+
+
+class Command(BaseCommand):
+    help = "Importa hóspedes de uma planilha (CSV ou XLSX), atualizando os que já têm o mesmo CPF."
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Linhas por lote.")
+        parser.add_argument('--erros', help="Grava o relatório de erros neste arquivo CSV.")
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        inicio = time.monotonic()
+        try:
+            with open(caminho, 'rb') as arquivo:
+                resultado = importar_hospedes(arquivo, os.path.basename(caminho), options['lote'])
+        except OSError as e:
+            raise CommandError(f"Não foi possível abrir {caminho}: {e}")
+        except ValueError as e:
+            raise CommandError(str(e))
+        duracao = time.monotonic() - inicio
+
+        erros = resultado['erros']
+        if options['erros']:
+            with open(options['erros'], 'w', newline='', encoding='utf-8') as arquivo:
+                escrever_relatorio_erros(erros, arquivo)
+        else:
+            for erro in erros:
+                self.stdout.write(self.style.WARNING(f"Linha {erro['linha']} ({erro['cpf'] or 'sem CPF'}): {erro['erro']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['linhas']} linha(s) lida(s) em {duracao:.1f} s: {resultado['criados']} hóspede(s) criado(s), "
+            f"{resultado['atualizados']} atualizado(s), {len(erros)} linha(s) com erro."
+        ))
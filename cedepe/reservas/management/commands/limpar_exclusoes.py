@@ -0,0 +1,26 @@
+# limpar_exclusoes.py
+"""
+Apaga as marcas de exclusão (RegistroExcluido) mais antigas que a retenção
+do feed de alterações (reservas/alteracoes.py: RETENCAO_EXCLUSOES).
+
+Pensado para rodar todo dia (cron / Heroku Scheduler) ou na fase de release:
+
+    python manage.py limpar_exclusoes
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from reservas.alteracoes import RETENCAO_EXCLUSOES, limpar_exclusoes
+
+
+class Command(BaseCommand):
+    help = "Apaga as marcas de exclusão mais antigas que a retenção do feed de alterações."
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        apagadas = limpar_exclusoes()
+        duracao = (time.monotonic() - inicio) * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f"{apagadas} marca(s) de exclusão com mais de {RETENCAO_EXCLUSOES.days} dias apagada(s) em {duracao:.0f} ms."
+        ))
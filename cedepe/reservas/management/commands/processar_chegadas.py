@@ -0,0 +1,39 @@
+# processar_chegadas.py
+"""
+Faz o check-in em lote das reservas CONFIRMADAS do dia.
+
+    python manage.py processar_chegadas
+    python manage.py processar_chegadas --data 2025-03-10
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservas.alocacao import processar_chegadas
+
+
+class Command(BaseCommand):
+    help = "Converte as reservas confirmadas com check-in no dia em ocupações, escolhendo as camas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', help="Dia do check-in (AAAA-MM-DD). Padrão: hoje.")
+
+    def handle(self, *args, **options):
+        try:
+            data = date.fromisoformat(options['data']) if options['data'] else date.today()
+        except ValueError:
+            raise CommandError("Data inválida. Use o formato AAAA-MM-DD.")
+
+        inicio = time.monotonic()
+        resultado = processar_chegadas(data)
+        duracao = (time.monotonic() - inicio) * 1000
+
+        for item in resultado['alocadas']:
+            self.stdout.write(f"{item['reserva'].hospede.nome}: quarto {item['quarto']}, cama {item['cama']}")
+        for item in resultado['nao_alocadas']:
+            self.stdout.write(self.style.WARNING(f"{item['reserva'].hospede.nome}: {item['motivo']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(resultado['alocadas'])} check-in(s) realizado(s), {len(resultado['nao_alocadas'])} "
+            f"reserva(s) sem alocação em {duracao:.0f} ms."
+        ))
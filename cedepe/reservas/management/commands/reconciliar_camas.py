@@ -0,0 +1,36 @@
+# reconciliar_camas.py
+"""
+Corrige Cama.status quando ele diverge das ocupações ativas.
+
+    python manage.py reconciliar_camas
+    python manage.py reconciliar_camas --dry-run
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from reservas.alocacao import reconciliar_status_camas
+
+
+class Command(BaseCommand):
+    help = "Corrige o status das camas a partir das ocupações ativas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Apenas lista as camas divergentes, sem alterar nada.",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        divergencias = reconciliar_status_camas(simular=options['dry_run'])
+        duracao = (time.monotonic() - inicio) * 1000
+
+        for item in divergencias:
+            self.stdout.write(
+                f"Quarto {item['quarto']} / cama {item['identificacao']} (id {item['id']}): "
+                f"{item['de']} -> {item['para']}"
+            )
+        acao = "divergente(s) encontrada(s)" if options['dry_run'] else "corrigida(s)"
+        self.stdout.write(self.style.SUCCESS(f"{len(divergencias)} cama(s) {acao} em {duracao:.0f} ms."))
@@ -0,0 +1,35 @@
+# transmitir_alteracoes.py
+"""
+Monitor do mapa em tempo real para o BrokerPostgres: lê o feed de alterações
+e publica via NOTIFY para todos os processos web.
+
+    TEMPO_REAL_BROKER=reservas.tempo_real.BrokerPostgres python manage.py transmitir_alteracoes
+
+Com o broker padrão (BrokerLocal) não é necessário: cada processo web roda o
+próprio monitor enquanto houver mapas abertos.
+"""
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reservas.tempo_real import INTERVALO_MONITOR, Monitor, obter_broker
+
+
+class Command(BaseCommand):
+    help = "Publica as alterações de camas, ocupações e hóspedes para o mapa em tempo real."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=INTERVALO_MONITOR, help="Segundos entre leituras do feed.")
+
+    def handle(self, *args, **options):
+        broker = obter_broker()
+        if broker.monitor_no_processo:
+            raise CommandError(
+                "O broker configurado roda o monitor nos próprios processos web; "
+                "defina TEMPO_REAL_BROKER=reservas.tempo_real.BrokerPostgres."
+            )
+        self.stdout.write(f"Transmitindo alterações com {type(broker).__name__} (Ctrl+C para sair).")
+        try:
+            asyncio.run(Monitor(broker, options['intervalo']).executar())
+        except KeyboardInterrupt:
+            pass
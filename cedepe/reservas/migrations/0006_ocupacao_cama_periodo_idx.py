@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0005_alter_hospede_cpf_alter_hospede_email_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ocupacao',
+            index=models.Index(fields=['cama', 'status', 'data_checkin', 'data_checkout'], name='ocupacao_cama_periodo_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:46
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Cópias de reservas/busca.py no momento desta migração: ela não deve mudar se
+# o código do app mudar depois.
+VALOR_PADRAO = 'Não informado'
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def somente_digitos(texto):
+    return re.sub(r'\D', '', texto or '')
+
+
+def texto_busca(*valores):
+    return normalizar(' '.join(v for v in valores if v and v != VALOR_PADRAO))
+
+
+def preencher_campos_busca(apps, schema_editor):
+    Hospede = apps.get_model('reservas', 'Hospede')
+    lote = []
+    for hospede in Hospede.objects.only('id', 'cpf', 'nome', 'instituicao', 'email').iterator(chunk_size=1000):
+        hospede.cpf_numeros = somente_digitos(hospede.cpf)[:11]
+        hospede.busca = texto_busca(hospede.nome, hospede.instituicao, hospede.email)
+        lote.append(hospede)
+        if len(lote) >= 1000:
+            Hospede.objects.bulk_update(lote, ['cpf_numeros', 'busca'])
+            lote = []
+    if lote:
+        Hospede.objects.bulk_update(lote, ['cpf_numeros', 'busca'])
+
+
+def criar_indice_trigramas(apps, schema_editor):
+    # Índice GIN de trigramas apenas no PostgreSQL; no SQLite a busca funciona sem ele
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS hospede_busca_trgm_idx '
+        'ON reservas_hospede USING gin (busca gin_trgm_ops)'
+    )
+
+
+def remover_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS hospede_busca_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0006_ocupacao_cama_periodo_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hospede',
+            name='busca',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='hospede',
+            name='cpf_numeros',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=11),
+        ),
+        migrations.RunPython(preencher_campos_busca, migrations.RunPython.noop),
+        migrations.RunPython(criar_indice_trigramas, remover_indice_trigramas),
+    ]
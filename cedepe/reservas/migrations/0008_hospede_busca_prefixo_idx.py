@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0007_hospede_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hospede',
+            index=models.Index(fields=['busca'], name='hospede_busca_prefixo_idx', opclasses=['text_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0008_hospede_busca_prefixo_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacaoDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('camas_ocupadas', models.PositiveIntegerField(default=0)),
+                ('hospedes', models.PositiveIntegerField(default=0)),
+                ('checkins', models.PositiveIntegerField(default=0)),
+                ('checkouts', models.PositiveIntegerField(default=0)),
+                ('quarto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacao_diaria', to='reservas.quarto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('data', 'quarto'), name='ocupacao_diaria_data_quarto_uniq')],
+            },
+        ),
+    ]
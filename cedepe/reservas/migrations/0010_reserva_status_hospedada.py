@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0009_ocupacao_diaria'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reserva',
+            name='status',
+            field=models.CharField(choices=[('PENDENTE', 'Pendente'), ('CONFIRMADA', 'Confirmada'), ('CANCELADA', 'Cancelada'), ('HOSPEDADA', 'Hospedada')], default='PENDENTE', max_length=10),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:10
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def limpar_cpfs(apps, schema_editor):
+    """
+    Prepara a restrição de unicidade: CPF vazio vira NULL e, quando mais de
+    um hóspede tem o mesmo CPF, só o atualizado por último mantém
+    cpf_numeros (os demais continuam com o CPF digitado, mas saem da chave).
+    """
+    Hospede = apps.get_model('reservas', 'Hospede')
+    Hospede.objects.filter(cpf_numeros='').update(cpf_numeros=None)
+    repetidos = (
+        Hospede.objects.exclude(cpf_numeros=None)
+        .values('cpf_numeros').annotate(n=Count('id')).filter(n__gt=1).values_list('cpf_numeros', flat=True)
+    )
+    for cpf in list(repetidos):
+        manter = Hospede.objects.filter(cpf_numeros=cpf).order_by('-atualizado_em', '-id').values_list('id', flat=True)[0]
+        Hospede.objects.filter(cpf_numeros=cpf).exclude(id=manter).update(cpf_numeros=None)
+
+
+def desfazer_limpeza(apps, schema_editor):
+    Hospede = apps.get_model('reservas', 'Hospede')
+    Hospede.objects.filter(cpf_numeros=None).update(cpf_numeros='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0010_reserva_status_hospedada'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hospede',
+            name='cpf_numeros',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=11, null=True),
+        ),
+        migrations.RunPython(limpar_cpfs, desfazer_limpeza),
+        migrations.AddConstraint(
+            model_name='hospede',
+            constraint=models.UniqueConstraint(fields=('cpf_numeros',), name='hospede_cpf_uniq'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0011_hospede_cpf_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroExcluido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=20)),
+                ('objeto_id', models.PositiveIntegerField()),
+                ('excluido_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='cama',
+            index=models.Index(fields=['atualizado_em', 'id'], name='cama_alteracao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hospede',
+            index=models.Index(fields=['atualizado_em', 'id'], name='hospede_alteracao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ocupacao',
+            index=models.Index(fields=['atualizado_em', 'id'], name='ocupacao_alteracao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['atualizado_em', 'id'], name='reserva_alteracao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroexcluido',
+            index=models.Index(fields=['excluido_em', 'id'], name='registro_excluido_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+def marcar_duplicados(apps, schema_editor):
+    """
+    Hóspedes que a 0011 tirou da chave única (CPF com dígitos, mas
+    cpf_numeros nulo) ficam marcados; assim Hospede.save não recalcula
+    cpf_numeros e não esbarra na restrição.
+    """
+    Hospede = apps.get_model('reservas', 'Hospede')
+    Hospede.objects.filter(cpf_numeros=None, cpf__regex=r'[0-9]').update(cpf_duplicado=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0012_feed_alteracoes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hospede',
+            name='cpf_duplicado',
+            field=models.BooleanField(default=False, verbose_name='CPF duplicado'),
+        ),
+        migrations.RunPython(marcar_duplicados, migrations.RunPython.noop),
+    ]
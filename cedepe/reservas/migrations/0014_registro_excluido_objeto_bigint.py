@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0013_hospede_cpf_duplicado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registroexcluido',
+            name='objeto_id',
+            field=models.PositiveBigIntegerField(),
+        ),
+    ]
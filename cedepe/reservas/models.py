@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 
 class Quarto(models.Model):
@@ -25,6 +26,12 @@ class Cama(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Feed de alterações (reservas/alteracoes.py)
+            models.Index(fields=['atualizado_em', 'id'], name='cama_alteracao_idx'),
+        ]
+
     def __str__(self):
         return f"{self.identificacao} - {self.quarto.numero} ({self.get_status_display()})"
 
@@ -38,9 +45,51 @@ class Hospede(models.Model):
     telefone = models.CharField(max_length=20, blank=True, default="Não informado")
     endereco = models.TextField(blank=True, default="Não informado")
     instituicao = models.CharField(max_length=150, blank=True, default="Não informado")
+    # Colunas derivadas para a busca indexada (ver reservas/busca.py)
+    # Nulo quando não há CPF; único quando preenchido (chave da importação de planilhas)
+    cpf_numeros = models.CharField(max_length=11, blank=True, null=True, db_index=True, editable=False)
+    # CPF repetido encontrado ao criar a restrição (migração 0011): o cadastro
+    # fica fora da chave (cpf_numeros nulo) até o CPF ser corrigido e a marca retirada
+    cpf_duplicado = models.BooleanField("CPF duplicado", default=False)
+    busca = models.TextField(blank=True, default='', editable=False)
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Busca por prefixo (autocomplete); text_pattern_ops permite LIKE 'x%' no PostgreSQL
+            models.Index(fields=['busca'], name='hospede_busca_prefixo_idx', opclasses=['text_pattern_ops']),
+            # Feed de alterações (reservas/alteracoes.py)
+            models.Index(fields=['atualizado_em', 'id'], name='hospede_alteracao_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['cpf_numeros'], name='hospede_cpf_uniq'),
+        ]
+
+    def preparar_busca(self):
+        """ Preenche cpf_numeros e busca. Chame antes de bulk_create/bulk_update. """
+        from .busca import somente_digitos, texto_busca
+        self.cpf_numeros = None if self.cpf_duplicado else somente_digitos(self.cpf)[:11] or None
+        self.busca = texto_busca(self.nome, self.instituicao, self.email)
+
+    @classmethod
+    def cpf_cadastrado(cls, cpf, excluir_pk=None):
+        """ True se outro hóspede já usa este CPF (comparando só os dígitos). """
+        from .busca import somente_digitos
+        digitos = somente_digitos(cpf)[:11]
+        return bool(digitos) and cls.objects.filter(cpf_numeros=digitos).exclude(pk=excluir_pk).exists()
+
+    def clean(self):
+        if not self.cpf_duplicado and Hospede.cpf_cadastrado(self.cpf, excluir_pk=self.pk):
+            raise ValidationError({'cpf': "Já existe um hóspede com este CPF."})
+
+    def save(self, *args, **kwargs):
+        self.preparar_busca()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'cpf_numeros', 'busca'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nome or "Hóspede sem nome"
 
@@ -61,23 +110,62 @@ class Ocupacao(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Atende a consulta de sobreposição de períodos por cama (disponibilidade)
+            models.Index(
+                fields=['cama', 'status', 'data_checkin', 'data_checkout'],
+                name='ocupacao_cama_periodo_idx',
+            ),
+            # Feed de alterações (reservas/alteracoes.py)
+            models.Index(fields=['atualizado_em', 'id'], name='ocupacao_alteracao_idx'),
+        ]
+
+    def clean(self):
+        from .alocacao import ConflitoAlocacao, verificar_conflito
+        if self.cama_id and self.data_checkin and self.data_checkout:
+            try:
+                verificar_conflito(self)
+            except ConflitoAlocacao as e:
+                raise ValidationError({'cama': e.messages})
+
     def save(self, *args, **kwargs):
-        if self.status == 'ATIVA':
-            self.cama.status = 'OCUPADA'
-        else:
-            self.cama.status = 'DISPONIVEL'
-        self.cama.save()
-        super().save(*args, **kwargs)
+        # Trava a cama, impede sobreposição de períodos e sincroniza Cama.status
+        from .alocacao import alocar
+        with alocar(self):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Ocupação {self.id} - {self.hospede.nome} ({self.cama})"
 
+class OcupacaoDiaria(models.Model):
+    """
+    Consolidado diário da hospedagem por quarto, mantido por reservas/consolidacao.py.
+    Só existem linhas para dias com movimento; não editar manualmente.
+    """
+    data = models.DateField()
+    quarto = models.ForeignKey(Quarto, on_delete=models.CASCADE, related_name="ocupacao_diaria")
+    camas_ocupadas = models.PositiveIntegerField(default=0)
+    hospedes = models.PositiveIntegerField(default=0)
+    checkins = models.PositiveIntegerField(default=0)
+    checkouts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['data', 'quarto'], name='ocupacao_diaria_data_quarto_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} - Quarto {self.quarto_id}: {self.camas_ocupadas} cama(s)"
+
 class Reserva(models.Model):
     """ Nova tabela para intenções de reserva sem ocupar cama. """
     STATUS = (
         ('PENDENTE', 'Pendente'),
         ('CONFIRMADA', 'Confirmada'),
         ('CANCELADA', 'Cancelada'),
+        # Convertida em Ocupacao no check-in (reservas/alocacao.py: processar_chegadas)
+        ('HOSPEDADA', 'Hospedada'),
     )
     hospede = models.ForeignKey(Hospede, on_delete=models.CASCADE)    
     data_checkin = models.DateField()
@@ -86,5 +174,29 @@ class Reserva(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Feed de alterações (reservas/alteracoes.py)
+            models.Index(fields=['atualizado_em', 'id'], name='reserva_alteracao_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reserva {self.id} - {self.hospede.nome} ({self.data_checkin:%d/%m/%Y})"
+
+class RegistroExcluido(models.Model):
+    """
+    Marca de exclusão (tombstone) de Cama, Ocupacao, Reserva e Hospede, gravada
+    pelo sinal post_delete para que o feed de alterações informe as exclusões.
+    Apagada depois de RETENCAO_EXCLUSOES (comando limpar_exclusoes).
+    """
+    modelo = models.CharField(max_length=20)
+    objeto_id = models.PositiveBigIntegerField()
+    excluido_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['excluido_em', 'id'], name='registro_excluido_idx'),
+        ]
+
     def __str__(self):
-        return f"Reserva {self.id} - {self.hospede.nome} ({self.quarto.numero})"
\ No newline at end of file
+        return f"{self.modelo} {self.objeto_id} excluído em {self.excluido_em:%d/%m/%Y %H:%M}"
@@ -0,0 +1,63 @@
+# painel.py
+"""
+Estatísticas do dashboard de hospedagem.
+
+Os números vêm de quatro consultas com agregação condicional e ficam no cache
+compartilhado (CACHES['default']) até alguma alteração em Quarto, Cama,
+Hospede, Reserva ou Ocupacao. As gravações individuais invalidam pelo
+signals.py; as atualizações em lote (reservas/alocacao.py) chamam
+`invalidar_estatisticas` diretamente.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Cama, Hospede, Quarto, Reserva
+
+CHAVE_CACHE = 'reservas:dashboard:v2'
+# Limite de segurança caso alguma alteração escape da invalidação
+TEMPO_CACHE = 10 * 60
+
+
+def calcular_estatisticas():
+    camas = Quarto.objects.aggregate(
+        total_quartos=Count('id', distinct=True),
+        total_camas=Count('camas'),
+        camas_disponiveis=Count('camas', filter=Q(camas__status='DISPONIVEL')),
+        camas_ocupadas=Count('camas', filter=Q(camas__status='OCUPADA')),
+    )
+    reservas = Reserva.objects.aggregate(**{
+        status.lower(): Count('id', filter=Q(status=status)) for status, _ in Reserva.STATUS
+    })
+    return {
+        **camas,
+        'total_hospedes': Hospede.objects.count(),
+        'reservas_por_status': reservas,
+        'recent_reservations': reservas_recentes(),
+    }
+
+
+def reservas_recentes(quantidade=5):
+    """ Últimas reservas como dicionários simples: o cache não guarda instâncias de modelo. """
+    status = dict(Reserva.STATUS)
+    return [
+        {
+            'hospede': {'nome': nome, 'instituicao': instituicao},
+            'data_checkin': data_checkin,
+            'data_checkout': data_checkout,
+            'status': situacao,
+            'status_display': status.get(situacao, situacao),
+        }
+        for nome, instituicao, data_checkin, data_checkout, situacao in Reserva.objects.order_by('-criado_em').values_list(
+            'hospede__nome', 'hospede__instituicao', 'data_checkin', 'data_checkout', 'status'
+        )[:quantidade]
+    ]
+
+
+def estatisticas():
+    return cache.get_or_set(CHAVE_CACHE, calcular_estatisticas, TEMPO_CACHE)
+
+
+def invalidar_estatisticas(**kwargs):
+    # Só depois do commit: antes disso outra requisição recalcularia com dados antigos
+    transaction.on_commit(lambda: cache.delete(CHAVE_CACHE))
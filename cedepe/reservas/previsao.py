@@ -0,0 +1,92 @@
+# previsao.py
+"""
+Previsão de demanda por camas.
+
+Soma, para cada dia do horizonte, as ocupações ATIVAS e as reservas
+PENDENTES/CONFIRMADAS e compara com o total de camas. Cada período vira um
++1 no dia de entrada e um -1 no dia de saída de um vetor NumPy; a soma
+acumulada dá a demanda de todos os dias de uma vez, com três consultas ao
+banco independentemente do horizonte. As consultas já agrupam os períodos
+iguais (mesmas datas), então o volume lido é pequeno mesmo com muitas reservas.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Count, Exists, OuterRef
+
+from .models import Cama, Ocupacao, Reserva
+
+
+def _demanda_diaria(periodos, inicio, dias):
+    """
+    `periodos`: lista de (data_checkin, data_checkout, quantidade). Retorna um
+    vetor com quantos períodos cobrem cada dia de `inicio` a `inicio + dias - 1`
+    (o dia do check-out não conta, como em toda a alocação).
+    """
+    variacao = np.zeros(dias + 1, dtype=np.int64)
+    if periodos:
+        base = inicio.toordinal()
+        dados = np.array([(entrada.toordinal(), saida.toordinal(), n) for entrada, saida, n in periodos], dtype=np.int64)
+        entradas = np.clip(dados[:, 0] - base, 0, dias)
+        saidas = np.clip(dados[:, 1] - base, 0, dias)
+        np.add.at(variacao, entradas, dados[:, 2])
+        np.add.at(variacao, saidas, -dados[:, 2])
+    return np.cumsum(variacao[:-1])
+
+
+def _periodos(queryset):
+    """ (data_checkin, data_checkout, status, quantidade) agrupados no banco. """
+    return list(
+        queryset.order_by().values_list('data_checkin', 'data_checkout', 'status').annotate(n=Count('id'))
+    )
+
+
+def prever_capacidade(inicio, dias):
+    """
+    Demanda prevista por dia de `inicio` a `inicio + dias - 1`.
+
+    Reservas cujo hóspede já tem ocupação ativa no mesmo período não entram,
+    para não contar duas vezes quem já fez check-in.
+    """
+    fim = inicio + timedelta(days=dias)
+
+    ocupacoes = Ocupacao.objects.filter(status='ATIVA', data_checkin__lt=fim, data_checkout__gt=inicio)
+    ja_hospedado = ocupacoes.filter(
+        hospede=OuterRef('hospede'),
+        data_checkin__lt=OuterRef('data_checkout'),
+        data_checkout__gt=OuterRef('data_checkin'),
+    )
+    reservas = Reserva.objects.filter(
+        status__in=['PENDENTE', 'CONFIRMADA'], data_checkin__lt=fim, data_checkout__gt=inicio
+    ).filter(~Exists(ja_hospedado))
+
+    periodos_reservas = _periodos(reservas)
+    ocupadas = _demanda_diaria([(e, s, n) for e, s, _, n in _periodos(ocupacoes)], inicio, dias)
+    confirmadas = _demanda_diaria(
+        [(e, s, n) for e, s, status, n in periodos_reservas if status == 'CONFIRMADA'], inicio, dias
+    )
+    pendentes = _demanda_diaria(
+        [(e, s, n) for e, s, status, n in periodos_reservas if status == 'PENDENTE'], inicio, dias
+    )
+    capacidade = Cama.objects.count()
+
+    firme = ocupadas + confirmadas
+    total = firme + pendentes
+    datas = np.arange(np.datetime64(inicio, 'D'), np.datetime64(fim, 'D'))
+    excedidos = np.flatnonzero(total > capacidade)
+
+    return {
+        'inicio': inicio,
+        'fim': fim - timedelta(days=1),
+        'capacidade': capacidade,
+        'pico_demanda': int(total.max()) if dias else 0,
+        'dias_excedidos': [str(datas[i]) for i in excedidos],
+        'dias_excedidos_confirmados': [str(datas[i]) for i in np.flatnonzero(firme > capacidade)],
+        'serie': {
+            'datas': [str(data) for data in datas],
+            'ocupadas': ocupadas.tolist(),
+            'confirmadas': confirmadas.tolist(),
+            'pendentes': pendentes.tolist(),
+            'livres': np.maximum(capacidade - total, 0).tolist(),
+        },
+    }
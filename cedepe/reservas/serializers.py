@@ -1,7 +1,12 @@
 # serializers.py
+from django.db import transaction
 from rest_framework import serializers
 from .models import Quarto, Cama, Hospede, Ocupacao, Reserva  # Alterado a importação
 from datetime import date  # Adicione esta linha
+from .disponibilidade import cama_livre
+from .alocacao import alocar_grupo
+from .painel import invalidar_estatisticas
+from .busca import somente_digitos
 class QuartoSerializer(serializers.ModelSerializer):
     camas_disponiveis = serializers.SerializerMethodField()
 
@@ -65,6 +70,14 @@ class HospedeSerializer(serializers.ModelSerializer):
             'atualizado_em'
         ]
 
+    def validate_cpf(self, value):
+        instancia = self.instance if isinstance(self.instance, Hospede) else None
+        if instancia is not None and instancia.cpf_duplicado:
+            return value
+        if Hospede.cpf_cadastrado(value, excluir_pk=instancia.pk if instancia else None):
+            raise serializers.ValidationError("Já existe um hóspede com este CPF.")
+        return value
+
 class OcupacaoSerializer(serializers.ModelSerializer):  # Novo serializer para Ocupacao
     class Meta:
         model = Ocupacao
@@ -90,7 +103,9 @@ class OcupacaoSerializer(serializers.ModelSerializer):  # Novo serializer para O
 
         if data.get('status', instance.status if instance else 'ATIVA') == 'ATIVA':
             cama = data.get('cama', instance.cama if instance else None)
-            if cama and cama.status != 'DISPONIVEL':
+            if cama and data_checkin and data_checkout and not cama_livre(
+                cama, data_checkin, data_checkout, excluir_ocupacao=instance.id if instance else None
+            ):
                 raise serializers.ValidationError("A cama selecionada não está disponível para reserva.")
 
             hospede = data.get('hospede', instance.hospede if instance else None)
@@ -102,10 +117,12 @@ class OcupacaoSerializer(serializers.ModelSerializer):  # Novo serializer para O
     def update(self, instance, validated_data):
         if validated_data.get('status') == 'FINALIZADA':
             validated_data['data_checkout'] = date.today()
-            # Liberar a cama associada
-            instance.cama.status = 'DISPONIVEL'
-            instance.cama.save()
-        return super().update(instance, validated_data)
+
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        # Grava apenas as colunas enviadas; a cama é liberada/ocupada em Ocupacao.save()
+        instance.save(update_fields=[*validated_data, 'atualizado_em'])
+        return instance
 
 class ReservaSerializer(serializers.ModelSerializer):  # Novo serializer para Reserva
     class Meta:
@@ -113,7 +130,6 @@ class ReservaSerializer(serializers.ModelSerializer):  # Novo serializer para Re
         fields = [
             'id',
             'hospede',
-            'quarto',
             'data_checkin',
             'data_checkout',
             'status',
@@ -135,4 +151,94 @@ class ReservaSerializer(serializers.ModelSerializer):  # Novo serializer para Re
             if hospede and Reserva.objects.filter(hospede=hospede, status='CONFIRMADA').exclude(id=instance.id if instance else None).exists():
                 raise serializers.ValidationError("Este hóspede já possui uma reserva confirmada.")
 
-        return data
\ No newline at end of file
+        return data
+
+class MapaCamaSerializer(serializers.ModelSerializer):
+    """ Cama do mapa interativo; lê a ocupação ativa já pré-carregada (ocupacoes_ativas). """
+    reserva_atual = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Cama
+        fields = ['id', 'quarto', 'identificacao', 'status', 'reserva_atual']
+
+    def get_reserva_atual(self, obj):
+        ocupacoes = getattr(obj, 'ocupacoes_ativas', [])
+        if not ocupacoes:
+            return None
+        ocupacao = ocupacoes[0]
+        return {
+            'id': ocupacao.id,
+            'hospede': {
+                'id': ocupacao.hospede.id,
+                'nome': ocupacao.hospede.nome,
+                'cpf': ocupacao.hospede.cpf
+            },
+            'data_checkin': ocupacao.data_checkin,
+            'data_checkout': ocupacao.data_checkout
+        }
+
+
+class MapaQuartoSerializer(serializers.ModelSerializer):
+    """ Quarto do mapa interativo com as camas aninhadas e a contagem anotada. """
+    camas_disponiveis = serializers.IntegerField(source='total_camas_disponiveis', read_only=True)
+    camas = MapaCamaSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Quarto
+        fields = ['id', 'numero', 'descricao', 'camas_disponiveis', 'camas']
+
+
+class CheckinGrupoSerializer(serializers.Serializer):
+    """
+    Check-in de uma delegação inteira: hóspedes já cadastrados (ids) e/ou
+    novos hóspedes, todos com o mesmo período. `quartos` restringe opcionalmente
+    os quartos considerados na distribuição.
+    """
+    data_checkin = serializers.DateField()
+    data_checkout = serializers.DateField()
+    hospedes = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    novos_hospedes = HospedeSerializer(many=True, required=False, default=list)
+    quartos = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, data):
+        if data['data_checkin'] >= data['data_checkout']:
+            raise serializers.ValidationError("Data de check-in deve ser anterior à data de check-out.")
+
+        ids = list(dict.fromkeys(data['hospedes']))  # remove repetidos, mantendo a ordem
+        if not ids and not data['novos_hospedes']:
+            raise serializers.ValidationError("Informe ao menos um hóspede.")
+
+        # Um único SELECT para todos os hóspedes informados
+        encontrados = Hospede.objects.in_bulk(ids)
+        faltando = [pk for pk in ids if pk not in encontrados]
+        if faltando:
+            raise serializers.ValidationError({'hospedes': f"Hóspedes inexistentes: {faltando}."})
+
+        com_ocupacao = Ocupacao.objects.filter(hospede_id__in=ids, status='ATIVA').values_list('hospede__nome', flat=True)
+        if com_ocupacao:
+            raise serializers.ValidationError({
+                'hospedes': f"Já possuem ocupação ativa: {', '.join(com_ocupacao)}."
+            })
+
+        cpfs = [somente_digitos(dados.get('cpf'))[:11] for dados in data['novos_hospedes']]
+        repetidos = {cpf for cpf in cpfs if cpf and cpfs.count(cpf) > 1}
+        if repetidos:
+            raise serializers.ValidationError({'novos_hospedes': f"CPF repetido na lista: {', '.join(sorted(repetidos))}."})
+
+        data['hospedes'] = [encontrados[pk] for pk in ids]
+        return data
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            novos = [Hospede(**dados) for dados in validated_data['novos_hospedes']]
+            for hospede in novos:
+                hospede.preparar_busca()
+            novos = Hospede.objects.bulk_create(novos)
+            if novos:
+                invalidar_estatisticas()
+            return alocar_grupo(
+                validated_data['hospedes'] + novos,
+                validated_data['data_checkin'],
+                validated_data['data_checkout'],
+                quartos=validated_data['quartos'],
+            )
@@ -0,0 +1,23 @@
+# signals.py
+from django.db.models.signals import post_delete, post_save
+
+from .alocacao import ocupacao_excluida
+from .alteracoes import registrar_exclusao
+from .models import Cama, Hospede, Ocupacao, Quarto, Reserva
+from .painel import invalidar_estatisticas
+from .tempo_real import avisar_alteracao
+
+
+def conectar():
+    for modelo in (Quarto, Cama, Hospede, Reserva, Ocupacao):
+        post_save.connect(invalidar_estatisticas, sender=modelo, dispatch_uid=f'painel_{modelo.__name__}_save')
+        post_delete.connect(invalidar_estatisticas, sender=modelo, dispatch_uid=f'painel_{modelo.__name__}_delete')
+    # Libera as camas também em QuerySet.delete() e nas exclusões em cascata
+    post_delete.connect(ocupacao_excluida, sender=Ocupacao, dispatch_uid='alocacao_ocupacao_delete')
+    # Marcas de exclusão para o feed de alterações
+    for modelo in (Cama, Hospede, Reserva, Ocupacao):
+        post_delete.connect(registrar_exclusao, sender=modelo, dispatch_uid=f'alteracoes_{modelo.__name__}_delete')
+    # Atualização em tempo real do mapa
+    for modelo in (Cama, Hospede, Ocupacao):
+        post_save.connect(avisar_alteracao, sender=modelo, dispatch_uid=f'tempo_real_{modelo.__name__}_save')
+        post_delete.connect(avisar_alteracao, sender=modelo, dispatch_uid=f'tempo_real_{modelo.__name__}_delete')
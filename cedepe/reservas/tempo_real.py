@@ -0,0 +1,271 @@
+# tempo_real.py
+"""
+Atualização em tempo real do mapa de camas (Server-Sent Events via ASGI).
+
+Cada processo web tem um único monitor que lê o feed de alterações
+(reservas/alteracoes.py) e publica o resultado em um broker; as conexões SSE
+(views.eventos_mapa) só assinam o broker. Assim a carga no banco é a de um
+leitor do feed por processo, qualquer que seja o número de telas abertas.
+
+O monitor consulta o feed a cada INTERVALO_MONITOR segundos e é acordado na
+hora pelos sinais de Cama/Ocupacao/Hospede deste processo (acordar_monitor,
+chamado no commit). Alterações feitas por outros processos aparecem no
+intervalo seguinte.
+
+O broker é configurável por TEMPO_REAL_BROKER (caminho da classe):
+
+- BrokerLocal (padrão): distribui as mensagens dentro do processo e roda o
+  monitor junto com as conexões;
+- BrokerPostgres: usa LISTEN/NOTIFY. O monitor roda uma única vez, no comando
+  `transmitir_alteracoes`, e os processos web apenas escutam o canal.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from .alteracoes import MARGEM_TRANSACOES, alteracoes, cursor_atual
+
+logger = logging.getLogger(__name__)
+
+# Tabelas acompanhadas pelo mapa
+TABELAS_TEMPO_REAL = ['camas', 'ocupacoes', 'hospedes']
+
+# Segundos entre leituras do feed quando ninguém acorda o monitor
+INTERVALO_MONITOR = 2
+
+# Mensagens acumuladas por conexão; uma tela que não consome é desconectada
+TAMANHO_FILA = 100
+
+
+def ler_alteracoes(cursor):
+    """ Versão síncrona para sync_to_async: fecha conexões vencidas antes de consultar. """
+    close_old_connections()
+    try:
+        return alteracoes(cursor, TABELAS_TEMPO_REAL)
+    finally:
+        close_old_connections()
+
+
+def mensagem_alteracoes(dados):
+    """ Mensagem publicada: alterações, exclusões e o cursor (id do evento SSE). """
+    return {'alteracoes': dados['alteracoes'], 'exclusoes': dados['exclusoes'], 'cursor': dados['cursor']}
+
+
+def tem_alteracoes(dados):
+    return any(dados['alteracoes'].values()) or any(dados['exclusoes'].values())
+
+
+class Assinatura:
+    """ Fila de mensagens de uma conexão SSE. """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+        self.transbordou = False
+
+    def entregar(self, mensagem):
+        try:
+            self.fila.put_nowait(mensagem)
+        except asyncio.QueueFull:
+            self.transbordou = True
+
+    async def proxima(self, timeout):
+        """ Próxima mensagem ou None após `timeout` segundos sem mensagens. """
+        try:
+            return await asyncio.wait_for(self.fila.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def cancelar(self):
+        self.broker.assinaturas.discard(self)
+
+
+class BrokerLocal:
+    """ Distribui mensagens entre as conexões de um único processo. """
+    monitor_no_processo = True
+
+    def __init__(self):
+        self.assinaturas = set()
+
+    def publicar(self, mensagem):
+        """ Pode ser chamado de qualquer thread. """
+        for assinatura in list(self.assinaturas):
+            assinatura.loop.call_soon_threadsafe(assinatura.entregar, mensagem)
+
+    def assinar(self):
+        """ Registra uma conexão; chame dentro do loop de eventos e cancele ao terminar. """
+        assinatura = Assinatura(self)
+        self.assinaturas.add(assinatura)
+        return assinatura
+
+
+class BrokerPostgres(BrokerLocal):
+    """
+    Mensagens via LISTEN/NOTIFY do PostgreSQL, para vários processos web.
+    Uma thread por processo escuta o canal e repassa às conexões locais.
+    """
+    monitor_no_processo = False
+    CANAL = 'cedepe_mapa'
+    # O NOTIFY aceita até 8000 bytes por mensagem
+    TAMANHO_MAXIMO = 7500
+
+    def __init__(self):
+        super().__init__()
+        self._ouvinte = None
+
+    def publicar(self, mensagem):
+        from django.db import connection
+        with connection.cursor() as cursor:
+            for parte in self._partes(mensagem):
+                cursor.execute('SELECT pg_notify(%s, %s)', [self.CANAL, parte])
+
+    def _partes(self, mensagem):
+        """ Divide as alterações em mensagens que cabem no NOTIFY (o cursor vai na última). """
+        def vazia():
+            return {
+                'alteracoes': {nome: [] for nome in mensagem['alteracoes']},
+                'exclusoes': {nome: [] for nome in mensagem['exclusoes']},
+                'cursor': None,
+            }
+
+        atual, tamanho = vazia(), len(mensagem['cursor']) + 200
+        for grupo in ('alteracoes', 'exclusoes'):
+            for nome, itens in mensagem[grupo].items():
+                for item in itens:
+                    texto = json.dumps(item, cls=DjangoJSONEncoder)
+                    if tamanho + len(texto) > self.TAMANHO_MAXIMO:
+                        yield json.dumps(atual, cls=DjangoJSONEncoder)
+                        atual, tamanho = vazia(), len(mensagem['cursor']) + 200
+                    atual[grupo][nome].append(item)
+                    tamanho += len(texto) + 2
+        atual['cursor'] = mensagem['cursor']
+        yield json.dumps(atual, cls=DjangoJSONEncoder)
+
+    def _escutar(self):
+        import psycopg2
+
+        conexao = psycopg2.connect(**self._parametros())
+        conexao.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        conexao.cursor().execute(f'LISTEN {self.CANAL}')
+        while True:
+            if select.select([conexao], [], [], 60) == ([], [], []):
+                continue
+            conexao.poll()
+            while conexao.notifies:
+                BrokerLocal.publicar(self, json.loads(conexao.notifies.pop(0).payload))
+
+    def _parametros(self):
+        banco = settings.DATABASES['default']
+        return {
+            'dbname': banco['NAME'], 'user': banco.get('USER'), 'password': banco.get('PASSWORD'),
+            'host': banco.get('HOST'), 'port': banco.get('PORT') or None, **banco.get('OPTIONS', {}),
+        }
+
+    def assinar(self):
+        if self._ouvinte is None or not self._ouvinte.is_alive():
+            self._ouvinte = threading.Thread(target=self._escutar, name='tempo-real-listen', daemon=True)
+            self._ouvinte.start()
+        return super().assinar()
+
+
+_broker = None
+
+
+def obter_broker():
+    global _broker
+    if _broker is None:
+        caminho = getattr(settings, 'TEMPO_REAL_BROKER', 'reservas.tempo_real.BrokerLocal')
+        _broker = import_string(caminho)()
+    return _broker
+
+
+class Monitor:
+    """ Lê o feed de alterações e publica no broker; um por processo (ou no comando). """
+
+    def __init__(self, broker, intervalo=INTERVALO_MONITOR):
+        self.broker = broker
+        self.intervalo = intervalo
+        self.acordar = asyncio.Event()
+        self.loop = None
+        # (tabela, id, versão) -> instante da publicação; o feed repete a janela de MARGEM_TRANSACOES
+        self.publicadas = {}
+
+    def _sem_repetidas(self, dados):
+        agora = time.monotonic()
+        validade = 2 * MARGEM_TRANSACOES.total_seconds()
+        self.publicadas = {chave: t for chave, t in self.publicadas.items() if agora - t < validade}
+
+        def novas(chaves_e_itens):
+            resultado = []
+            for chave, item in chaves_e_itens:
+                if chave not in self.publicadas:
+                    self.publicadas[chave] = agora
+                    resultado.append(item)
+            return resultado
+
+        for nome, linhas in dados['alteracoes'].items():
+            dados['alteracoes'][nome] = novas(((nome, linha['id'], linha['atualizado_em']), linha) for linha in linhas)
+        for nome, ids in dados['exclusoes'].items():
+            dados['exclusoes'][nome] = novas(((nome, pk, None), pk) for pk in ids)
+        return dados
+
+    async def executar(self, parar=lambda: False):
+        self.loop = asyncio.get_running_loop()
+        cursor = await sync_to_async(cursor_atual)(TABELAS_TEMPO_REAL)
+        while not parar():
+            # Limpa antes de ler: um aviso que chegue durante a leitura provoca outra leitura
+            self.acordar.clear()
+            try:
+                dados = await sync_to_async(ler_alteracoes)(cursor)
+            except Exception:
+                logger.exception("Falha ao ler o feed de alterações")
+                await asyncio.sleep(self.intervalo)
+                continue
+            cursor = dados['cursor']
+            dados = self._sem_repetidas(dados)
+            if tem_alteracoes(dados):
+                await sync_to_async(self.broker.publicar)(mensagem_alteracoes(dados))
+            if dados['mais']:
+                continue
+            try:
+                await asyncio.wait_for(self.acordar.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+
+
+_monitor = None
+_tarefa_monitor = None
+
+
+def garantir_monitor():
+    """ Inicia o monitor do processo na primeira conexão (só com broker local). """
+    global _monitor, _tarefa_monitor
+    broker = obter_broker()
+    if not broker.monitor_no_processo:
+        return
+    if _tarefa_monitor is None or _tarefa_monitor.done():
+        _monitor = Monitor(broker)
+        _tarefa_monitor = asyncio.get_running_loop().create_task(
+            _monitor.executar(parar=lambda: not broker.assinaturas)
+        )
+
+
+def acordar_monitor(**kwargs):
+    """ Faz o monitor deste processo ler o feed agora. Seguro em qualquer thread. """
+    if _monitor is not None and _monitor.loop is not None and not _monitor.loop.is_closed():
+        _monitor.loop.call_soon_threadsafe(_monitor.acordar.set)
+
+
+def avisar_alteracao(**kwargs):
+    """ Receptor de sinais: acorda o monitor depois do commit. """
+    transaction.on_commit(acordar_monitor)
@@ -1,3 +1,263 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cedepe.paginacao import KeysetPaginator, OrdenacaoInvalida
+
+from .alocacao import ConflitoAlocacao
+from .alteracoes import (
+    RETENCAO_EXCLUSOES, CursorExpirado, CursorInvalido, alteracoes, codificar_cursor,
+)
+from .models import Cama, Hospede, Ocupacao, OcupacaoDiaria, Quarto, RegistroExcluido, Reserva
+from .previsao import _demanda_diaria
+
+
+class AlocacaoTests(TestCase):
+    def setUp(self):
+        self.quarto = Quarto.objects.create(numero='101')
+        self.cama = Cama.objects.create(quarto=self.quarto, identificacao='A')
+        self.outra = Cama.objects.create(quarto=self.quarto, identificacao='B')
+        self.ana = Hospede.objects.create(nome='Ana', cpf='111.444.777-35')
+        self.bruno = Hospede.objects.create(nome='Bruno', cpf='529.982.247-25')
+        self.hoje = date.today()
+
+    def ocupar(self, hospede, checkin, checkout, cama=None):
+        return Ocupacao.objects.create(
+            hospede=hospede, cama=cama or self.cama, data_checkin=checkin, data_checkout=checkout
+        )
+
+    def test_ocupacao_marca_cama_ocupada(self):
+        self.ocupar(self.ana, self.hoje, self.hoje + timedelta(days=3))
+        self.cama.refresh_from_db()
+        self.assertEqual(self.cama.status, 'OCUPADA')
+
+    def test_periodo_sobreposto_levanta_conflito(self):
+        self.ocupar(self.ana, self.hoje, self.hoje + timedelta(days=3))
+        with self.assertRaises(ConflitoAlocacao):
+            self.ocupar(self.bruno, self.hoje + timedelta(days=2), self.hoje + timedelta(days=5))
+        self.assertEqual(Ocupacao.objects.count(), 1)
+
+    def test_checkout_libera_a_cama_no_mesmo_dia(self):
+        self.ocupar(self.ana, self.hoje, self.hoje + timedelta(days=3))
+        self.ocupar(self.bruno, self.hoje + timedelta(days=3), self.hoje + timedelta(days=5))
+        self.assertEqual(Ocupacao.objects.count(), 2)
+
+    def test_api_responde_409_quando_outra_requisicao_aloca_antes(self):
+        self.ocupar(self.ana, self.hoje, self.hoje + timedelta(days=3))
+        dados = {
+            'hospede': self.bruno.pk, 'cama': self.cama.pk,
+            'data_checkin': self.hoje.isoformat(), 'data_checkout': (self.hoje + timedelta(days=2)).isoformat(),
+        }
+        # A validação do serializer viu a cama livre; a alocação, já sob trava, encontra o conflito
+        with mock.patch('reservas.serializers.cama_livre', return_value=True):
+            resposta = self.client.post('/reservas/api/ocupacoes/', dados, content_type='application/json')
+        self.assertEqual(resposta.status_code, 409)
+        self.assertEqual(Ocupacao.objects.filter(hospede=self.bruno).count(), 0)
+
+    def test_exclusao_em_cascata_libera_a_cama(self):
+        self.ocupar(self.ana, self.hoje, self.hoje + timedelta(days=3))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ana.delete()
+        self.cama.refresh_from_db()
+        self.assertEqual(self.cama.status, 'DISPONIVEL')
+
+    def test_exclusao_em_lote_libera_as_camas_e_o_consolidado(self):
+        self.ocupar(self.ana, self.hoje, self.hoje + timedelta(days=3))
+        self.ocupar(self.bruno, self.hoje, self.hoje + timedelta(days=2), cama=self.outra)
+        self.assertTrue(OcupacaoDiaria.objects.filter(quarto=self.quarto).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Ocupacao.objects.all().delete()
+        self.assertEqual(set(Cama.objects.values_list('status', flat=True)), {'DISPONIVEL'})
+        self.assertFalse(OcupacaoDiaria.objects.exists())
+
+    def test_exclusao_da_cama_recalcula_o_consolidado(self):
+        self.ocupar(self.ana, self.hoje, self.hoje + timedelta(days=3))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cama.delete()
+        self.assertFalse(OcupacaoDiaria.objects.exists())
+
+    def test_exclusao_desfeita_nao_e_processada(self):
+        self.ocupar(self.ana, self.hoje, self.hoje + timedelta(days=3))
+        self.ocupar(self.bruno, self.hoje, self.hoje + timedelta(days=3), cama=self.outra)
+        with mock.patch('reservas.alocacao.liberar_camas') as liberar, self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                self.ana.delete()
+                1 / 0
+            self.bruno.delete()
+        liberar.assert_called_once()
+        self.assertEqual(set(liberar.call_args.args[0]), {self.outra.pk})
+
+
+class DemandaDiariaTests(TestCase):
+    def test_conta_periodos_sem_o_dia_do_checkout(self):
+        periodos = [
+            (date(2024, 12, 30), date(2025, 1, 3), 2),  # começa antes da janela
+            (date(2025, 1, 2), date(2025, 1, 10), 1),   # termina depois da janela
+            (date(2025, 1, 5), date(2025, 1, 6), 4),
+        ]
+        demanda = _demanda_diaria(periodos, date(2025, 1, 1), 5)
+        self.assertEqual(demanda.tolist(), [2, 3, 1, 1, 5])
+
+    def test_sem_periodos(self):
+        self.assertEqual(_demanda_diaria([], date(2025, 1, 1), 3).tolist(), [0, 0, 0])
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        for numero in ['101', '102', '103', '104', '105']:
+            Quarto.objects.create(numero=numero)
+        self.paginador = KeysetPaginator(Quarto.objects.all(), 2, ['numero'])
+
+    def numeros(self, pagina):
+        return [quarto.numero for quarto in pagina]
+
+    def test_avanca_e_volta(self):
+        primeira = self.paginador.page()
+        self.assertEqual(self.numeros(primeira), ['101', '102'])
+        self.assertIsNone(primeira.cursor_anterior)
+
+        segunda = self.paginador.page(primeira.cursor_proximo)
+        self.assertEqual(self.numeros(segunda), ['103', '104'])
+
+        terceira = self.paginador.page(segunda.cursor_proximo)
+        self.assertEqual(self.numeros(terceira), ['105'])
+        self.assertFalse(terceira.has_next)
+
+        self.assertEqual(self.numeros(self.paginador.page(terceira.cursor_anterior)), ['103', '104'])
+        voltando = self.paginador.page(segunda.cursor_anterior)
+        self.assertEqual(self.numeros(voltando), ['101', '102'])
+        self.assertFalse(voltando.has_previous)
+
+    def test_ordenacao_termina_na_chave_primaria(self):
+        self.assertEqual(self.paginador.ordenacao, ['numero', 'pk'])
+
+    def test_cursor_invalido_volta_ao_inicio(self):
+        self.assertIsNone(self.paginador.decodificar('nao-e-cursor'))
+        self.assertEqual(self.numeros(self.paginador.page('nao-e-cursor')), ['101', '102'])
+
+    def test_chave_estrangeira_ordena_pela_coluna(self):
+        paginador = KeysetPaginator(Cama.objects.all(), 2, ['-quarto'])
+        self.assertEqual(paginador.ordenacao, ['-quarto_id', '-pk'])
+
+    def test_recusa_campo_nulo_ou_de_outro_modelo(self):
+        for ordenacao in (['cpf'], ['cama__identificacao'], ['inexistente']):
+            with self.subTest(ordenacao=ordenacao), self.assertRaises(OrdenacaoInvalida):
+                KeysetPaginator(Hospede.objects.all(), 2, ordenacao)
+
+    def test_api_pagina_por_chave_estrangeira(self):
+        # Duas ocupações por cama: o empate na cama é desfeito pelo id, inclusive entre páginas
+        hoje = date.today()
+        for n, quarto in enumerate(Quarto.objects.order_by('numero')):
+            cama = Cama.objects.create(quarto=quarto, identificacao=f'C{n}')
+            for semana in (1, 0):
+                Ocupacao.objects.create(
+                    hospede=Hospede.objects.create(nome=f'Hóspede {n}.{semana}', cpf=f'{n:09d}{semana:02d}'),
+                    cama=cama,
+                    data_checkin=hoje + timedelta(weeks=semana),
+                    data_checkout=hoje + timedelta(weeks=semana, days=2),
+                )
+        vistas = []
+        url = '/reservas/api/ocupacoes/?ordering=cama&page_size=3'
+        while url:
+            resposta = self.client.get(url)
+            self.assertEqual(resposta.status_code, 200)
+            vistas += [ocupacao['id'] for ocupacao in resposta.json()['results']]
+            url = resposta.json()['next']
+        self.assertEqual(vistas, list(Ocupacao.objects.order_by('cama_id', 'pk').values_list('id', flat=True)))
+
+    def test_api_recusa_ordenacao_que_nao_consegue_seguir(self):
+        for ordenacao in ('hospede__nome', 'cama,inexistente'):
+            with self.subTest(ordenacao=ordenacao):
+                resposta = self.client.get('/reservas/api/ocupacoes/', {'ordering': ordenacao})
+                self.assertEqual(resposta.status_code, 400)
+                self.assertIn('ordering', resposta.json())
+
+
+
+class AlteracoesTests(TestCase):
+    def setUp(self):
+        self.agora = timezone.now()
+        self.antiga = Hospede.objects.create(nome='Antiga')
+        self.nova = Hospede.objects.create(nome='Nova')
+        Hospede.objects.filter(pk=self.antiga.pk).update(atualizado_em=self.agora - timedelta(hours=2))
+
+    def cursor(self, momento, exclusoes=None):
+        return codificar_cursor({'hospedes': (momento, 0), 'exclusoes': (exclusoes or momento, 0)})
+
+    def test_sem_cursor_traz_tudo(self):
+        resultado = alteracoes(nomes=['hospedes'])
+        self.assertEqual([linha['id'] for linha in resultado['alteracoes']['hospedes']], [self.antiga.pk, self.nova.pk])
+        self.assertFalse(resultado['mais'])
+
+    def test_desde_o_cursor(self):
+        resultado = alteracoes(self.cursor(self.agora - timedelta(hours=1)), nomes=['hospedes'])
+        self.assertEqual([linha['id'] for linha in resultado['alteracoes']['hospedes']], [self.nova.pk])
+
+    def test_data_iso_como_cursor(self):
+        desde = (self.agora - timedelta(hours=1)).isoformat()
+        resultado = alteracoes(desde, nomes=['hospedes'])
+        self.assertEqual([linha['id'] for linha in resultado['alteracoes']['hospedes']], [self.nova.pk])
+
+    def test_limite_continua_do_ultimo_lido(self):
+        resultado = alteracoes(nomes=['hospedes'], limite=1)
+        self.assertTrue(resultado['mais'])
+        self.assertEqual([linha['id'] for linha in resultado['alteracoes']['hospedes']], [self.antiga.pk])
+        resultado = alteracoes(resultado['cursor'], nomes=['hospedes'], limite=1)
+        self.assertEqual([linha['id'] for linha in resultado['alteracoes']['hospedes']], [self.nova.pk])
+
+    def test_fim_da_tabela_recua_a_margem(self):
+        # A linha recém-gravada volta na consulta seguinte, por causa de transações ainda abertas
+        resultado = alteracoes(nomes=['hospedes'])
+        resultado = alteracoes(resultado['cursor'], nomes=['hospedes'])
+        self.assertEqual([linha['id'] for linha in resultado['alteracoes']['hospedes']], [self.nova.pk])
+
+    def test_exclusoes(self):
+        cursor = self.cursor(self.agora - timedelta(hours=1))
+        pk = self.nova.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.nova.delete()
+        resultado = alteracoes(cursor, nomes=['hospedes'])
+        self.assertEqual(resultado['exclusoes']['hospedes'], [pk])
+
+    def test_cursor_expirado(self):
+        antigo = self.agora - RETENCAO_EXCLUSOES - timedelta(days=1)
+        with self.assertRaises(CursorExpirado):
+            alteracoes(self.cursor(antigo), nomes=['hospedes'])
+
+    def test_cursor_invalido(self):
+        with self.assertRaises(CursorInvalido):
+            alteracoes('nao-e-cursor', nomes=['hospedes'])
+
+    def test_api_responde_410_com_cursor_expirado(self):
+        antigo = self.agora - RETENCAO_EXCLUSOES - timedelta(days=1)
+        resposta = self.client.get('/reservas/api/alteracoes/', {'since': self.cursor(antigo), 'tabelas': 'hospedes'})
+        self.assertEqual(resposta.status_code, 410)
+
+    def test_exclusoes_gravadas_em_lote_no_commit(self):
+        quarto = Quarto.objects.create(numero='201')
+        for identificacao in 'ABC':
+            Cama.objects.create(quarto=quarto, identificacao=identificacao)
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            Cama.objects.filter(quarto=quarto).delete()
+            self.assertFalse(RegistroExcluido.objects.exists())
+        insercoes = [
+            consulta for consulta in consultas.captured_queries
+            if consulta['sql'].startswith('INSERT INTO "reservas_registroexcluido"')
+        ]
+        self.assertEqual(len(insercoes), 1)
+        self.assertEqual(RegistroExcluido.objects.filter(modelo='Cama').count(), 3)
+
 
-# Create your tests here.
+class ReservaApiTests(TestCase):
+    def test_lista_com_etag(self):
+        hospede = Hospede.objects.create(nome='Ana')
+        Reserva.objects.create(hospede=hospede, data_checkin=date.today(), data_checkout=date.today() + timedelta(days=2))
+        resposta = self.client.get('/reservas/api/reservas/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['results'][0]['hospede'], hospede.pk)
+        resposta = self.client.get('/reservas/api/reservas/', HTTP_IF_NONE_MATCH=resposta['ETag'])
+        self.assertEqual(resposta.status_code, 304)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import QuartoViewSet, CamaViewSet, HospedeViewSet, ReservaViewSet, OcupacaoViewSet
+from .views import QuartoViewSet, CamaViewSet, HospedeViewSet, ReservaViewSet, OcupacaoViewSet, CheckinGrupoViewSet
 from . import views
 
 router = DefaultRouter()
@@ -9,10 +9,17 @@ router.register(r'camas', CamaViewSet, basename='cama')
 router.register(r'hospedes', HospedeViewSet, basename='hospede')
 router.register(r'reservas', ReservaViewSet, basename='reserva')
 router.register(r'ocupacoes', OcupacaoViewSet, basename='ocupacao')  # endpoint da ocupação
+router.register(r'checkin-grupo', CheckinGrupoViewSet, basename='checkin-grupo')
 
 urlpatterns = [
     # Endpoints da API com prefixo /api/
     path('api/', include(router.urls)),
+    path('api/disponibilidade/', views.DisponibilidadeView.as_view(), name='disponibilidade'),
+    path('api/mapa/', views.mapa_api, name='mapa_api'),
+    path('api/alteracoes/', views.AlteracoesView.as_view(), name='alteracoes'),
+    path('api/mapa/eventos/', views.eventos_mapa, name='eventos_mapa'),
+    path('api/ocupacao-historica/', views.OcupacaoHistoricaView.as_view(), name='ocupacao_historica'),
+    path('api/previsao-capacidade/', views.PrevisaoCapacidadeView.as_view(), name='previsao_capacidade'),
     
     
     # Páginas HTML para gerenciamento
@@ -32,11 +39,14 @@ urlpatterns = [
 
     path('reservas/', views.gerenciar_reservas, name='gerenciar_reservas'),
     path('reservas/form/', views.reserva_form, name='reserva_form'),
+    path('reservas/chegadas/', views.processar_chegadas_view, name='processar_chegadas'),
+    path('reservas/exportar/', views.exportar_reservas, name='exportar_reservas'),
     path('reservas/form/<int:pk>/', views.reserva_form, name='editar_reserva'),
     
     # Páginas HTML para gerenciamento de Ocupações
     path('ocupacoes/', views.gerenciar_ocupacoes, name='gerenciar_ocupacoes'),
     path('ocupacoes/form/', views.ocupacao_form, name='ocupacao_form'),
+    path('ocupacoes/exportar/', views.exportar_ocupacoes, name='exportar_ocupacoes'),
     path('ocupacoes/form/<int:pk>/', views.ocupacao_form, name='editar_ocupacao'),
 
     path('relatorio/reservas/', views.reservas_report_pdf, name='reservas_report_pdf'),
@@ -2,9 +2,11 @@ from rest_framework import viewsets, filters
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Quarto, Cama, Hospede, Reserva
 from .serializers import QuartoSerializer, CamaSerializer, HospedeSerializer, ReservaSerializer
+from .busca import BuscaHospedeFilter, buscar_hospedes
+from cedepe.condicional import RespostaCondicionalMixin
 
 
-class QuartoViewSet(viewsets.ModelViewSet):
+class QuartoViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para o CRUD de Quartos.
     Permite criar, listar, atualizar e excluir quartos.
@@ -12,13 +14,17 @@ class QuartoViewSet(viewsets.ModelViewSet):
     """
     queryset = Quarto.objects.all()
     serializer_class = QuartoSerializer
+    # camas_disponiveis depende do status das camas
+    campos_versao = ['atualizado_em', 'camas__atualizado_em']
     filter_backends = [filters.SearchFilter]
     search_fields = ['numero', 'descricao']
 
 
-class CamaViewSet(viewsets.ModelViewSet):
+class CamaViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     queryset = Cama.objects.all()
     serializer_class = CamaSerializer
+    # reserva_atual traz a ocupação e o hóspede
+    campos_versao = ['atualizado_em', 'ocupacao__atualizado_em', 'ocupacao__hospede__atualizado_em']
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['quarto']
     search_fields = ['identificacao']
@@ -29,24 +35,31 @@ class CamaViewSet(viewsets.ModelViewSet):
         return context
 
 
-class HospedeViewSet(viewsets.ModelViewSet):
+class HospedeViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para o CRUD de Hóspedes.
     Permite criar, listar, atualizar e excluir hóspedes.
-    Possui busca por nome, CPF ou e-mail.
+    Possui busca (?search=) por nome, instituição, e-mail ou CPF, ordenada por relevância.
     """
     queryset = Hospede.objects.all()
     serializer_class = HospedeSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['nome', 'cpf', 'email']
+    filter_backends = [BuscaHospedeFilter]
 
 
 from rest_framework import viewsets, filters
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Quarto, Cama, Hospede, Reserva, Ocupacao
 from .serializers import QuartoSerializer, CamaSerializer, HospedeSerializer, ReservaSerializer, OcupacaoSerializer
+from rest_framework.exceptions import APIException
+from .alocacao import ConflitoAlocacao
+
+class ConflitoOcupacao(APIException):
+    """ 409: outra ocupação ativa já ocupa a cama no período. """
+    status_code = 409
+    default_detail = 'A cama já está ocupada no período informado.'
+    default_code = 'conflito'
 
-class ReservaViewSet(viewsets.ModelViewSet):
+class ReservaViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para o CRUD de Reservas.
     Agora a reserva envolve apenas informações do hóspede, datas e status.
@@ -60,7 +73,7 @@ class ReservaViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         instance.delete()
 
-class OcupacaoViewSet(viewsets.ModelViewSet):
+class OcupacaoViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     """
     ViewSet para o CRUD de Ocupações.
     Gerencia o controle de quartos e camas ocupadas.
@@ -72,15 +85,47 @@ class OcupacaoViewSet(viewsets.ModelViewSet):
     search_fields = ['hospede__nome', 'cama__identificacao', 'status']
     
     def perform_create(self, serializer):
-        # Ao criar uma ocupação ATIVA, atualiza o status da cama
-        ocupacao = serializer.save()
-        if ocupacao.status == 'ATIVA':
-            ocupacao.cama.status = 'OCUPADA'
-            ocupacao.cama.save()
+        # O status da cama é atualizado em Ocupacao.save(), sob trava da cama
+        try:
+            serializer.save()
+        except ConflitoAlocacao as e:
+            raise ConflitoOcupacao(e.messages[0])
+
+    def perform_update(self, serializer):
+        try:
+            serializer.save()
+        except ConflitoAlocacao as e:
+            raise ConflitoOcupacao(e.messages[0])
+
+from rest_framework import status
+from rest_framework.response import Response
+from .serializers import CheckinGrupoSerializer
+
+class CheckinGrupoViewSet(viewsets.ViewSet):
+    """
+    Check-in em grupo (delegações de eventos).
+    POST cria todas as ocupações do grupo em uma única transação,
+    concentrando o grupo no menor número possível de quartos.
+    """
+
+    def create(self, request):
+        serializer = CheckinGrupoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            ocupacoes = serializer.save()
+        except ConflitoAlocacao as e:
+            raise ConflitoOcupacao(e.messages[0])
+
+        return Response({
+            'total': len(ocupacoes),
+            'quartos': sorted({ocupacao.cama.quarto_id for ocupacao in ocupacoes}),
+            'ocupacoes': OcupacaoSerializer(ocupacoes, many=True).data,
+        }, status=status.HTTP_201_CREATED)
 
 # reservas/views.py
 from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from cedepe.paginacao import KeysetPaginator, PaginadorContagemRapida
 from .models import Quarto, Cama, Hospede, Reserva
 from .forms import QuartoForm, CamaForm, HospedeForm, ReservaForm
 
@@ -99,7 +144,7 @@ def gerenciar_quartos(request):
         quartos_list = quartos_list.filter(numero__icontains=query)
     
     # Paginação
-    paginator = Paginator(quartos_list, ITENS_POR_PAGINA)
+    paginator = PaginadorContagemRapida(quartos_list, ITENS_POR_PAGINA)
     
     try:
         quartos = paginator.page(page_number)
@@ -135,7 +180,7 @@ def gerenciar_camas(request):
         elif filter_by == 'status':
             camas_list = camas_list.filter(status=query)
 
-    paginator = Paginator(camas_list, 10)  
+    paginator = PaginadorContagemRapida(camas_list, 10)  
     camas = paginator.get_page(page_number)
 
     return render(request, 'reservas/gerenciar_camas.html', {
@@ -153,13 +198,10 @@ def gerenciar_hospedes(request):
     hospedes_list = Hospede.objects.all()
     
     if query:
-        hospedes_list = hospedes_list.filter(
-            Q(nome__icontains=query) |
-            Q(cpf__icontains=query) |
-            Q(email__icontains=query)
-        )
+        # Nome/instituição/e-mail sem acentos ou CPF com ou sem pontuação, ordenado por relevância
+        hospedes_list = buscar_hospedes(hospedes_list, query)
     
-    paginator = Paginator(hospedes_list, ITENS_POR_PAGINA)
+    paginator = PaginadorContagemRapida(hospedes_list, ITENS_POR_PAGINA)
     
     try:
         hospedes = paginator.page(page_number)
@@ -184,17 +226,30 @@ from .forms import QuartoForm, CamaForm, HospedeForm, ReservaForm, OcupacaoForm
 ITENS_POR_PAGINA = 20
 
 
-def gerenciar_reservas(request):
-    # Parâmetros de consulta
-    search = request.GET.get('search', '').strip()
-    status_filter = request.GET.get('status', '').strip()
-    filter_by = request.GET.get('filter_by', 'all')
-    page_number = request.GET.get('page')
+from datetime import date
+from .alocacao import processar_chegadas
 
-    # Base do queryset
-    reservas_list = Reserva.objects.all()
 
-    # Aplicar filtros antes da paginação
+def processar_chegadas_view(request):
+    """
+    Check-in em lote das reservas confirmadas do dia. GET mostra quantas
+    reservas serão processadas; POST cria as ocupações e mostra o resultado.
+    """
+    hoje = date.today()
+    if request.method == 'POST':
+        resultado = processar_chegadas(hoje)
+        return render(request, 'reservas/processar_chegadas.html', {'hoje': hoje, 'resultado': resultado})
+
+    reservas = Reserva.objects.select_related('hospede').filter(status='CONFIRMADA', data_checkin=hoje).order_by('hospede__nome')
+    return render(request, 'reservas/processar_chegadas.html', {'hoje': hoje, 'reservas': reservas})
+
+
+def filtrar_reservas(reservas_list, params):
+    """ Filtros da listagem de reservas (também usados na exportação em CSV). """
+    search = params.get('search', '').strip()
+    status_filter = params.get('status', '').strip()
+    filter_by = params.get('filter_by', 'all')
+
     if filter_by == 'hospede' and search:
         reservas_list = reservas_list.filter(hospede__nome__icontains=search)
     elif filter_by == 'status' and status_filter:
@@ -203,18 +258,21 @@ def gerenciar_reservas(request):
         reservas_list = reservas_list.filter(
             Q(hospede__nome__icontains=search) | Q(status__icontains=search)
         )
+    return reservas_list
 
-    # Ordenar do mais recente para o mais antigo
-    reservas_list = reservas_list.order_by('-criado_em')
 
-    # Paginação
-    paginator = Paginator(reservas_list, ITENS_POR_PAGINA)
-    try:
-        reservas = paginator.page(page_number)
-    except PageNotAnInteger:
-        reservas = paginator.page(1)
-    except EmptyPage:
-        reservas = paginator.page(paginator.num_pages)
+def gerenciar_reservas(request):
+    # Parâmetros de consulta
+    search = request.GET.get('search', '').strip()
+    status_filter = request.GET.get('status', '').strip()
+    filter_by = request.GET.get('filter_by', 'all')
+
+    # Aplicar filtros antes da paginação
+    reservas_list = filtrar_reservas(Reserva.objects.select_related('hospede'), request.GET)
+
+    # Paginação por chave, do mais recente para o mais antigo
+    paginator = KeysetPaginator(reservas_list, ITENS_POR_PAGINA, ['-criado_em', 'id'])
+    reservas = paginator.page(request.GET.get('cursor'))
 
     # Contexto para o template
     context = {
@@ -327,34 +385,58 @@ def hospede_form(request, pk=None):
     })
 
 
+import hashlib
+from django.core.cache import caches
+from .busca import autocompletar_hospedes, normalizar
+
+LIMITE_AUTOCOMPLETE = 20
+
 def listar_hospedes_json(request):
-    hospedes = Hospede.objects.all().values('id', 'nome')
-    return JsonResponse(list(hospedes), safe=False)
+    """
+    Autocomplete de hóspedes: ?q=<prefixo>&limite=<n> (máx. 50).
+    Cada prefixo fica em cache (na memória do processo) por alguns segundos
+    para aliviar a digitação.
+    """
+    prefixo = normalizar(request.GET.get('q', ''))
+    try:
+        limite = max(1, min(int(request.GET.get('limite', LIMITE_AUTOCOMPLETE)), 50))
+    except ValueError:
+        limite = LIMITE_AUTOCOMPLETE
+
+    chave = 'hospedes_autocomplete:%s:%d' % (hashlib.md5(prefixo.encode(), usedforsecurity=False).hexdigest(), limite)
+    hospedes = caches['local'].get(chave)
+    if hospedes is None:
+        hospedes = list(
+            autocompletar_hospedes(Hospede.objects.all(), prefixo).values('id', 'nome', 'instituicao')[:limite]
+        )
+        caches['local'].set(chave, hospedes, 30)
+    return JsonResponse(hospedes, safe=False)
 
-def gerenciar_ocupacoes(request):
-    query = request.GET.get('q', '')
-    filter_by = request.GET.get('filter_by', 'all')
-    page_number = request.GET.get('page')
+def filtrar_ocupacoes(ocupacoes_list, params):
+    """ Filtros da listagem de ocupações (também usados na exportação em CSV). """
+    query = params.get('q', '')
+    filter_by = params.get('filter_by', 'all')
 
-    ocupacoes_list = Ocupacao.objects.select_related('hospede', 'cama').all()
-    
     if query:
         ocupacoes_list = ocupacoes_list.filter(
             Q(hospede__nome__icontains=query) |
             Q(cama__identificacao__icontains=query)
         )
-    
+
     if filter_by != 'all':
         ocupacoes_list = ocupacoes_list.filter(status=filter_by)
-    
-    paginator = Paginator(ocupacoes_list, ITENS_POR_PAGINA)
-    
-    try:
-        ocupacoes = paginator.page(page_number)
-    except PageNotAnInteger:
-        ocupacoes = paginator.page(1)
-    except EmptyPage:
-        ocupacoes = paginator.page(paginator.num_pages)
+    return ocupacoes_list
+
+
+def gerenciar_ocupacoes(request):
+    query = request.GET.get('q', '')
+    filter_by = request.GET.get('filter_by', 'all')
+
+    ocupacoes_list = filtrar_ocupacoes(Ocupacao.objects.select_related('hospede', 'cama').all(), request.GET)
+
+    # Paginação por chave: páginas profundas custam o mesmo que a primeira
+    paginator = KeysetPaginator(ocupacoes_list, ITENS_POR_PAGINA, ['-criado_em', 'id'])
+    ocupacoes = paginator.page(request.GET.get('cursor'))
 
     context = {
         'ocupacoes': ocupacoes,
@@ -389,8 +471,12 @@ def ocupacao_form(request, pk=None):
     if request.method == 'POST':
         form = OcupacaoForm(request.POST, instance=ocupacao)
         if form.is_valid():
-            form.save()
-            return redirect('gerenciar_ocupacoes')
+            try:
+                form.save()
+                return redirect('gerenciar_ocupacoes')
+            except ConflitoAlocacao as e:
+                # Outra recepção alocou a cama entre a validação e a gravação
+                form.add_error('cama', e)
     else:
         form = OcupacaoForm(instance=ocupacao, initial=initial)
     
@@ -429,67 +515,256 @@ def camas_disponiveis(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from .disponibilidade import camas_livres_por_quarto, validar_periodo
+
+class DisponibilidadeView(APIView):
+    """
+    Camas livres em um período, agrupadas por quarto.
+    GET /reservas/api/disponibilidade/?inicio=AAAA-MM-DD&fim=AAAA-MM-DD[&quarto=<id>][&ocupacao=<id>]
+    """
+
+    def get(self, request, format=None):
+        try:
+            inicio, fim = validar_periodo(
+                request.query_params.get('inicio'),
+                request.query_params.get('fim'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        quarto = request.query_params.get('quarto') or None
+        ocupacao = request.query_params.get('ocupacao') or None
+        if (quarto and not quarto.isdigit()) or (ocupacao and not ocupacao.isdigit()):
+            return Response({'error': "Parâmetros 'quarto' e 'ocupacao' devem ser numéricos."}, status=400)
+
+        quartos = camas_livres_por_quarto(inicio, fim, quarto=quarto, excluir_ocupacao=ocupacao)
+        return Response({
+            'inicio': inicio,
+            'fim': fim,
+            'total_camas_livres': sum(len(q['camas']) for q in quartos),
+            'quartos': quartos,
+        })
+
+from .alteracoes import TABELAS, CursorExpirado, CursorInvalido, alteracoes
+
+class AlteracoesView(APIView):
+    """
+    Feed incremental de camas, ocupações, reservas e hóspedes.
+    GET /reservas/api/alteracoes/?since=<cursor ou data ISO>[&tabelas=camas,ocupacoes]
+
+    Sem `since` começa do início (sincronização completa, em páginas). Enquanto
+    `mais` for true há alterações pendentes: repita com o novo `cursor`.
+    Cursor mais antigo que a retenção das exclusões: 410, refaça a sincronização.
+    """
+
+    def get(self, request, format=None):
+        tabelas = request.query_params.get('tabelas')
+        nomes = None
+        if tabelas:
+            nomes = [nome.strip() for nome in tabelas.split(',') if nome.strip()]
+            desconhecidas = [nome for nome in nomes if nome not in TABELAS]
+            if desconhecidas:
+                return Response({'error': f"Tabelas desconhecidas: {', '.join(desconhecidas)}."}, status=400)
+        try:
+            dados = alteracoes(request.query_params.get('since') or None, nomes)
+        except CursorExpirado as e:
+            return Response({'error': str(e)}, status=410)
+        except CursorInvalido as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(dados)
+
+import calendar
+from django.db.models import Sum
+from django.db.models.functions import ExtractDay, ExtractMonth
+from .models import OcupacaoDiaria
+
+class OcupacaoHistoricaView(APIView):
+    """
+    Taxa de ocupação por mês de um ano ou por dia de um mês, lida apenas do
+    consolidado diário (OcupacaoDiaria), sem percorrer as ocupações.
+    GET /reservas/api/ocupacao-historica/?ano=AAAA[&mes=M][&quarto=<id>]
+    """
+
+    def get(self, request, format=None):
+        ano = request.query_params.get('ano', '')
+        mes = request.query_params.get('mes', '')
+        quarto = request.query_params.get('quarto', '')
+        if not ano.isdigit() or (mes and not (mes.isdigit() and 1 <= int(mes) <= 12)) or (quarto and not quarto.isdigit()):
+            return Response({'error': "Informe 'ano' (AAAA) e, opcionalmente, 'mes' (1-12) e 'quarto' (id)."}, status=400)
+        ano, mes = int(ano), int(mes) if mes else None
+
+        linhas = OcupacaoDiaria.objects.filter(data__year=ano)
+        camas = Cama.objects.all()
+        if mes:
+            linhas = linhas.filter(data__month=mes)
+        if quarto:
+            linhas = linhas.filter(quarto_id=quarto)
+            camas = camas.filter(quarto_id=quarto)
+        total_camas = camas.count()
+
+        agrupamento = ExtractDay('data') if mes else ExtractMonth('data')
+        totais = {
+            linha['periodo']: linha
+            for linha in linhas.annotate(periodo=agrupamento).values('periodo').annotate(
+                diarias_camas=Sum('camas_ocupadas'),
+                diarias_hospedes=Sum('hospedes'),
+                checkins=Sum('checkins'),
+                checkouts=Sum('checkouts'),
+            ).order_by('periodo')
+        }
+
+        if mes:
+            periodos = [(dia, 1) for dia in range(1, calendar.monthrange(ano, mes)[1] + 1)]
+        else:
+            periodos = [(m, calendar.monthrange(ano, m)[1]) for m in range(1, 13)]
+
+        serie = []
+        for periodo, dias in periodos:
+            linha = totais.get(periodo, {})
+            capacidade = total_camas * dias
+            diarias_camas = linha.get('diarias_camas') or 0
+            serie.append({
+                'periodo': f"{ano}-{mes:02d}-{periodo:02d}" if mes else f"{ano}-{periodo:02d}",
+                'diarias_camas': diarias_camas,
+                'diarias_hospedes': linha.get('diarias_hospedes') or 0,
+                'checkins': linha.get('checkins') or 0,
+                'checkouts': linha.get('checkouts') or 0,
+                'capacidade': capacidade,
+                'taxa_ocupacao': round(100 * diarias_camas / capacidade, 1) if capacidade else 0,
+            })
+
+        return Response({'ano': ano, 'mes': mes, 'quarto': int(quarto) if quarto else None, 'total_camas': total_camas, 'serie': serie})
+
+from datetime import date
+from .previsao import prever_capacidade
+
+MAXIMO_MESES_PREVISAO = 24
+
+class PrevisaoCapacidadeView(APIView):
+    """
+    Demanda prevista por dia (ocupações ativas + reservas pendentes/confirmadas)
+    contra o total de camas, sinalizando os dias com excesso de demanda.
+    GET /reservas/api/previsao-capacidade/?meses=N[&inicio=AAAA-MM-DD]
+    """
+
+    def get(self, request, format=None):
+        meses = request.query_params.get('meses', '3')
+        if not meses.isdigit() or not 1 <= int(meses) <= MAXIMO_MESES_PREVISAO:
+            return Response({'error': f"'meses' deve ser um número de 1 a {MAXIMO_MESES_PREVISAO}."}, status=400)
+        try:
+            inicio = date.fromisoformat(request.query_params['inicio']) if request.query_params.get('inicio') else date.today()
+        except ValueError:
+            return Response({'error': "Data inválida. Use o formato AAAA-MM-DD."}, status=400)
+
+        ano, mes = divmod(inicio.month - 1 + int(meses), 12)
+        ano += inicio.year
+        fim = date(ano, mes + 1, min(inicio.day, calendar.monthrange(ano, mes + 1)[1]))
+        return Response(prever_capacidade(inicio, (fim - inicio).days))
+
 from django.shortcuts import render
 from django.db.models import Count, Q
 from .models import Quarto, Cama, Hospede, Reserva
+from .painel import estatisticas
+from .alteracoes import cursor_atual
 from datetime import date
 
+# Tabelas do feed de alterações acompanhadas pelo mapa interativo
+TABELAS_MAPA = ['camas', 'ocupacoes', 'hospedes']
+
 def dashboard(request):
-    # Estatísticas básicas
-    total_quartos = Quarto.objects.count()
-    total_camas = Cama.objects.count()
-    total_hospedes = Hospede.objects.count()
-    # Para reservas, consideramos "confirmadas" como ativas
-    reservas_ativas = Reserva.objects.filter(status='CONFIRMADA').count()
-    
-    # Status das camas: considere que o primeiro item (DISPONIVEL) e o segundo (OCUPADA)
-    status_camas = Cama.objects.values('status').annotate(total=Count('id'))
-    # Ordena de forma que 'DISPONIVEL' venha primeiro (ajuste conforme necessidade)
-    status_camas = sorted(status_camas, key=lambda x: x['status'])
-    
-    # Reservas recentes: sem relação com quarto ou cama
-    recent_reservations = Reserva.objects.select_related('hospede').order_by('-criado_em')[:5]
-    
-    # Reservas por status
-    reservas_status = Reserva.objects.values('status').annotate(total=Count('id'))
-    
-    # Conversão dos dados para gráficos
-    camas_labels = [item['status'] for item in status_camas]
-    camas_data = [item['total'] for item in status_camas]
-    
-    reservas_labels = [item['status'] for item in reservas_status]
-    reservas_data = [item['total'] for item in reservas_status]
-    
+    # Estatísticas em cache, invalidadas a cada alteração (reservas/painel.py)
+    dados = estatisticas()
+    reservas_status = dados['reservas_por_status']
+
     context = {
-        'total_quartos': total_quartos,
-        'total_camas': total_camas,
-        'total_hospedes': total_hospedes,
-        'reservas_ativas': reservas_ativas,
-        'recent_reservations': recent_reservations,
-        'camas_labels': camas_labels,
-        'camas_data': camas_data,
-        'reservas_labels': reservas_labels,
-        'reservas_data': reservas_data,
+        'total_quartos': dados['total_quartos'],
+        'total_camas': dados['total_camas'],
+        'total_hospedes': dados['total_hospedes'],
+        # Para reservas, consideramos "confirmadas" como ativas
+        'reservas_ativas': reservas_status['confirmada'],
+        'recent_reservations': dados['recent_reservations'],
+        # Gráfico das camas: DISPONIVEL primeiro, depois OCUPADA
+        'camas_labels': ['DISPONIVEL', 'OCUPADA'],
+        'camas_data': [dados['camas_disponiveis'], dados['camas_ocupadas']],
+        'reservas_labels': [status for status, _ in Reserva.STATUS],
+        'reservas_data': [reservas_status[status.lower()] for status, _ in Reserva.STATUS],
     }
-    
+
     return render(request, 'reservas/dashboard.html', context)
 
+from django.conf import settings
+from django.urls import reverse
+
 def mapa_interativo(request):
-    hospedes = Hospede.objects.all()
-    context = {
-        'hospedes': hospedes
-    }
-    return render(request, 'reservas/mapa_interativo.html', context)
+    # O mapa carrega tudo por mapa_api e depois acompanha o feed de alterações a partir daqui
+    return render(request, 'reservas/mapa_interativo.html', {
+        'cursor_alteracoes': cursor_atual(TABELAS_MAPA),
+        # O stream é servido pelo processo ASGI (Procfile: tempo_real), talvez em outro domínio
+        'url_eventos_mapa': settings.TEMPO_REAL_URL.rstrip('/') + reverse('eventos_mapa'),
+    })
+
+from django.db.models import Max, Prefetch
+from django.views.decorators.http import condition, require_GET
+from cedepe.condicional import versao_consultas
+from .serializers import MapaQuartoSerializer
+
+def mapa_queryset():
+    """
+    Quartos com camas e ocupação ativa em número constante de consultas:
+    uma para os quartos (com a contagem anotada), uma para as camas e
+    uma para as ocupações ativas com o hóspede.
+    """
+    # Só as colunas que o mapa mostra; cama_id é usado pelo prefetch para ligar cada ocupação à cama
+    ocupacoes_ativas = Ocupacao.objects.filter(status='ATIVA').select_related('hospede').only(
+        'cama_id', 'data_checkin', 'data_checkout', 'status', 'hospede__nome', 'hospede__cpf',
+    ).order_by('data_checkin')
+    camas = Cama.objects.order_by('identificacao').prefetch_related(
+        Prefetch('ocupacao_set', queryset=ocupacoes_ativas, to_attr='ocupacoes_ativas')
+    )
+    return Quarto.objects.annotate(
+        total_camas_disponiveis=Count('camas', filter=Q(camas__status='DISPONIVEL'))
+    ).prefetch_related(
+        Prefetch('camas', queryset=camas)
+    ).order_by('numero')
+
+def versao_mapa(request):
+    """
+    (última modificação, etag) do mapa, calculados a partir de atualizado_em
+    e da quantidade de registros (para perceber exclusões). Memorizado no
+    request para que etag e last_modified não repitam as consultas.
+    """
+    if not hasattr(request, '_versao_mapa'):
+        request._versao_mapa = versao_consultas(
+            (Quarto.objects.all(), ['atualizado_em']),
+            (Cama.objects.all(), ['atualizado_em']),
+            (Ocupacao.objects.all(), ['atualizado_em', Max('hospede__atualizado_em', filter=Q(status='ATIVA'))]),
+        )
+    return request._versao_mapa
+
+@require_GET
+@condition(
+    etag_func=lambda request: versao_mapa(request)[1],
+    last_modified_func=lambda request: versao_mapa(request)[0],
+)
+def mapa_api(request):
+    """ Payload único do mapa interativo: quartos, camas e ocupante atual. """
+    quartos = MapaQuartoSerializer(mapa_queryset(), many=True).data
+    return JsonResponse({'quartos': quartos})
 
 from django.db.models.functions import ExtractYear, ExtractMonth
 from django.shortcuts import render
-from django.http import HttpResponse
 from datetime import datetime
-from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
+from cedepe.pdf import CanvasStreaming
+from cedepe.relatorios import pagina_relatorio, versao_dados
 from .models import Reserva, Ocupacao
 
+# Linhas lidas do banco por vez ao gerar os relatórios
+TAMANHO_LOTE_RELATORIO = 2000
+
 def gerar_contexto_comum():
     meses = [
         'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
@@ -502,81 +777,66 @@ def gerar_contexto_comum():
         'now': datetime.now()
     }
 
+def consulta_reservas(data_inicio, data_fim):
+    return Reserva.objects.filter(
+        data_checkin__gte=data_inicio,
+        data_checkout__lte=data_fim
+    )
+
+def consulta_ocupacoes(data_inicio, data_fim):
+    return Ocupacao.objects.filter(
+        data_checkin__gte=data_inicio,
+        data_checkout__lte=data_fim
+    )
+
+def versao_reservas(data_inicio, data_fim):
+    return versao_dados(consulta_reservas(data_inicio, data_fim), 'atualizado_em', 'hospede__atualizado_em')
+
+def versao_ocupacoes(data_inicio, data_fim):
+    return versao_dados(
+        consulta_ocupacoes(data_inicio, data_fim), 'atualizado_em', 'hospede__atualizado_em', 'cama__atualizado_em'
+    )
+
+def gerar_pdf_reservas(arquivo, data_inicio, data_fim):
+    reservas = consulta_reservas(data_inicio, data_fim).select_related('hospede').only(
+        'data_checkin', 'data_checkout', 'status', 'hospede__nome', 'hospede__instituicao'
+    ).order_by('data_checkin')
+    gerar_relatorio_pdf(
+        arquivo, "Relatório de Reservas - CEDEPE GRE Floresta", data_inicio, data_fim, criar_corpo_reservas, reservas
+    )
+
+def gerar_pdf_ocupacoes(arquivo, data_inicio, data_fim):
+    ocupacoes = consulta_ocupacoes(data_inicio, data_fim).select_related('hospede', 'cama').only(
+        'data_checkin', 'data_checkout', 'status', 'hospede__nome', 'hospede__instituicao', 'cama__identificacao'
+    ).order_by('data_checkin')
+    gerar_relatorio_pdf(
+        arquivo, "Relatório de Ocupações - CEDEPE GRE Floresta", data_inicio, data_fim, criar_corpo_ocupacoes, ocupacoes
+    )
+
+# Os PDFs são gerados pelo worker (cedepe/relatorios.py); a página acompanha o pedido
 def reservas_report_pdf(request):
-    if request.method == 'POST':
-        tipo_filtro = request.POST.get('tipo_filtro')
-        data_inicio = data_fim = None
-
-        if tipo_filtro == 'mes':
-            mes = int(request.POST.get('mes'))
-            ano = int(request.POST.get('ano'))
-            data_inicio = datetime(ano, mes, 1)
-            data_fim = datetime(ano + (1 if mes == 12 else 0), (mes % 12) + 1, 1)
-        elif tipo_filtro == 'periodo':
-            data_inicio = datetime.strptime(request.POST.get('data_inicio'), '%Y-%m-%d')
-            data_fim = datetime.strptime(request.POST.get('data_fim'), '%Y-%m-%d')
-
-        reservas = Reserva.objects.filter(
-            data_checkin__gte=data_inicio, 
-            data_checkout__lte=data_fim
-        ).order_by('data_checkin')
-
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="relatorio_reservas_{datetime.now().date()}.pdf"'
-
-        p = canvas.Canvas(response, pagesize=A4)
-        width, height = A4
-
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(2 * cm, height - 2 * cm, "Relatório de Reservas - CEDEPE GRE Floresta")
-        
-        criar_cabecalho(p, height, data_inicio, data_fim)
-        criar_corpo_reservas(p, reservas, height)
-        
-        p.save()
-        return response
-
-    context = gerar_contexto_comum()
-    return render(request, 'relatorios/filtro_reservas.html', context)
+    return pagina_relatorio(request, 'RESERVAS', 'relatorios/filtro_reservas.html', gerar_contexto_comum())
 
 
 def ocupacoes_report_pdf(request):
-    if request.method == 'POST':
-        tipo_filtro = request.POST.get('tipo_filtro')
-        data_inicio = data_fim = None
-
-        if tipo_filtro == 'mes':
-            mes = int(request.POST.get('mes'))
-            ano = int(request.POST.get('ano'))
-            data_inicio = datetime(ano, mes, 1)
-            data_fim = datetime(ano + (1 if mes == 12 else 0), (mes % 12) + 1, 1)
-        elif tipo_filtro == 'periodo':
-            data_inicio = datetime.strptime(request.POST.get('data_inicio'), '%Y-%m-%d')
-            data_fim = datetime.strptime(request.POST.get('data_fim'), '%Y-%m-%d')
-
-        ocupacoes = Ocupacao.objects.filter(
-            data_checkin__gte=data_inicio, 
-            data_checkout__lte=data_fim
-        ).order_by('data_checkin')
-
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="relatorio_ocupacoes_{datetime.now().date()}.pdf"'
-
-        p = canvas.Canvas(response, pagesize=A4)
-        width, height = A4
-
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(2 * cm, height - 2 * cm, "Relatório de Ocupações - CEDEPE GRE Floresta")
-        
-        criar_cabecalho(p, height, data_inicio, data_fim)
-        criar_corpo_ocupacoes(p, ocupacoes, height)
-        
-        p.save()
-        return response
+    return pagina_relatorio(request, 'OCUPACOES', 'relatorios/filtro_ocupacoes.html', gerar_contexto_comum())
 
-    context = gerar_contexto_comum()
-    return render(request, 'relatorios/filtro_ocupacoes.html', context)
 
+def gerar_relatorio_pdf(arquivo, titulo, data_inicio, data_fim, criar_corpo, queryset):
+    """
+    Escreve o relatório em `arquivo` página a página (CanvasStreaming), lendo
+    o queryset em lotes com iterator(): a memória não cresce com o período.
+    """
+    p = CanvasStreaming(arquivo, pagesize=A4)
+    width, height = A4
+
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(2 * cm, height - 2 * cm, titulo)
+
+    criar_cabecalho(p, height, data_inicio, data_fim)
+    criar_corpo(p, queryset.iterator(chunk_size=TAMANHO_LOTE_RELATORIO), height, data_inicio, data_fim)
+
+    p.save()
 
 def criar_cabecalho(p, height, data_inicio, data_fim):
     p.setFont("Helvetica-Bold", 12)
@@ -585,7 +845,7 @@ def criar_cabecalho(p, height, data_inicio, data_fim):
     p.setLineWidth(0.5)
     p.line(2 * cm, height - 2.9 * cm, 19 * cm, height - 2.9 * cm)
 
-def criar_corpo_reservas(p, reservas, height):
+def criar_corpo_reservas(p, reservas, height, data_inicio, data_fim):
     y = height - 4 * cm
     page_num = 1
     for i, reserva in enumerate(reservas, start=1):
@@ -594,7 +854,7 @@ def criar_corpo_reservas(p, reservas, height):
             p.drawString(2 * cm, 2 * cm, f"Página {page_num}")
             p.showPage()
             page_num += 1
-            criar_cabecalho(p, height, reserva.data_checkin, reserva.data_checkout)
+            criar_cabecalho(p, height, data_inicio, data_fim)
             y = height - 4 * cm
 
         p.setFont("Helvetica-Bold", 10)
@@ -620,7 +880,7 @@ def criar_corpo_reservas(p, reservas, height):
     p.drawString(2 * cm, 2 * cm, f"Página {page_num}")
 
 
-def criar_corpo_ocupacoes(p, ocupacoes, height):
+def criar_corpo_ocupacoes(p, ocupacoes, height, data_inicio, data_fim):
     y = height - 4 * cm
     page_num = 1
     for i, ocupacao in enumerate(ocupacoes, start=1):
@@ -629,7 +889,7 @@ def criar_corpo_ocupacoes(p, ocupacoes, height):
             p.drawString(2 * cm, 2 * cm, f"Página {page_num}")
             p.showPage()
             page_num += 1
-            criar_cabecalho(p, height, ocupacao.data_checkin, ocupacao.data_checkout)
+            criar_cabecalho(p, height, data_inicio, data_fim)
             y = height - 4 * cm
 
         p.setFont("Helvetica-Bold", 10)
@@ -655,3 +915,129 @@ def criar_corpo_ocupacoes(p, ocupacoes, height):
 
     p.setFont("Helvetica", 9)
     p.drawString(2 * cm, 2 * cm, f"Página {page_num}")
+
+
+# Exportação em CSV: mesmos filtros das listagens e, opcionalmente, o período
+# dos relatórios (tipo_filtro=mes&mes=&ano= ou tipo_filtro=periodo&data_inicio=&data_fim=)
+from django.http import HttpResponseBadRequest
+from cedepe.exportacao import TAMANHO_LOTE_EXPORTACAO, resposta_csv
+from cedepe.relatorios import periodo_do_formulario
+
+
+def _base_exportacao(request, consulta, modelo):
+    """ Queryset do período pedido (ou de todos os registros) ou levanta ValueError. """
+    if request.GET.get('tipo_filtro'):
+        return consulta(*periodo_do_formulario(request.GET))
+    return modelo.objects.all()
+
+
+def exportar_reservas(request):
+    try:
+        reservas = _base_exportacao(request, consulta_reservas, Reserva)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    status = dict(Reserva.STATUS)
+    linhas = filtrar_reservas(reservas, request.GET).order_by('data_checkin', 'id').values_list(
+        'id', 'hospede__nome', 'hospede__cpf', 'hospede__instituicao',
+        'data_checkin', 'data_checkout', 'status', 'criado_em',
+    ).iterator(chunk_size=TAMANHO_LOTE_EXPORTACAO)
+    return resposta_csv(
+        request,
+        'reservas',
+        ['ID', 'Hóspede', 'CPF', 'Instituição', 'Check-in', 'Check-out', 'Status', 'Criada em'],
+        ((*linha[:6], status.get(linha[6], linha[6]), linha[7]) for linha in linhas),
+    )
+
+
+def exportar_ocupacoes(request):
+    try:
+        ocupacoes = _base_exportacao(request, consulta_ocupacoes, Ocupacao)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    status = dict(Ocupacao.STATUS)
+    linhas = filtrar_ocupacoes(ocupacoes, request.GET).order_by('data_checkin', 'id').values_list(
+        'id', 'hospede__nome', 'hospede__cpf', 'hospede__instituicao', 'cama__quarto__numero',
+        'cama__identificacao', 'data_checkin', 'data_checkout', 'status',
+    ).iterator(chunk_size=TAMANHO_LOTE_EXPORTACAO)
+    return resposta_csv(
+        request,
+        'ocupacoes',
+        ['ID', 'Hóspede', 'CPF', 'Instituição', 'Quarto', 'Cama', 'Check-in', 'Check-out', 'Status'],
+        ((*linha[:8], status.get(linha[8], linha[8])) for linha in linhas),
+    )
+
+
+# Mapa em tempo real: Server-Sent Events (só sob ASGI). Cada conexão assina o
+# broker de reservas/tempo_real.py; quem lê o banco é o monitor do processo.
+import json
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from .alteracoes import CursorInvalido
+from .tempo_real import garantir_monitor, ler_alteracoes, mensagem_alteracoes, obter_broker, tem_alteracoes
+
+# Segundos sem mensagens até enviar um comentário, para proxies não fecharem a conexão
+INTERVALO_PING = 20
+
+
+def _evento_sse(mensagem):
+    dados = json.dumps(
+        {'alteracoes': mensagem['alteracoes'], 'exclusoes': mensagem['exclusoes'], 'cursor': mensagem['cursor']},
+        cls=DjangoJSONEncoder,
+    )
+    return f"id: {mensagem['cursor']}\nevent: alteracoes\ndata: {dados}\n\n"
+
+
+async def _fluxo_mapa(cursor):
+    broker = obter_broker()
+    # Assina antes de recuperar o atraso: nada publicado nesse meio tempo se perde
+    assinatura = broker.assinar()
+    try:
+        garantir_monitor()
+        yield 'retry: 5000\n\n'
+        # Alterações entre o carregamento do mapa (ou a queda da conexão) e agora
+        while cursor:
+            try:
+                dados = await sync_to_async(ler_alteracoes)(cursor)
+            except CursorInvalido:
+                break
+            if tem_alteracoes(dados):
+                yield _evento_sse(mensagem_alteracoes(dados))
+            cursor = dados['cursor'] if dados['mais'] else None
+        while not assinatura.transbordou:
+            mensagem = await assinatura.proxima(INTERVALO_PING)
+            yield _evento_sse(mensagem) if mensagem else ': ping\n\n'
+        # Fila cheia (cliente lento): encerra; o navegador reconecta com Last-Event-ID
+    finally:
+        assinatura.cancelar()
+
+
+def _cabecalhos_cors(request):
+    # Com TEMPO_REAL_URL o stream vem de outro domínio; só as origens do próprio site podem lê-lo
+    origem = request.headers.get('Origin')
+    if origem and origem in settings.CSRF_TRUSTED_ORIGINS:
+        return {'Access-Control-Allow-Origin': origem, 'Vary': 'Origin'}
+    return {}
+
+
+async def eventos_mapa(request):
+    """
+    Stream de alterações do mapa de camas, servido pelo processo ASGI
+    (cedepe/asgi.py). Sob WSGI responde 204, o que faz o EventSource desistir e
+    o mapa continuar consultando api/alteracoes/.
+    """
+    if 'wsgi.version' in request.META:
+        return HttpResponse(status=204)
+    cors = _cabecalhos_cors(request)
+    if request.method == 'OPTIONS':
+        # Pré-verificação da reconexão, que envia Last-Event-ID
+        return HttpResponse(status=204, headers={
+            **cors, 'Access-Control-Allow-Methods': 'GET', 'Access-Control-Allow-Headers': 'Last-Event-ID',
+        })
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    return StreamingHttpResponse(
+        _fluxo_mapa(cursor),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', **cors},
+    )